@@ -0,0 +1,301 @@
+# crawler.py
+
+import asyncio
+import hashlib
+import re
+import time
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+import httpx
+from bs4 import BeautifulSoup
+
+DEFAULT_USER_AGENT = "InventursChatbotCrawler/1.0"
+# Query parameters that never change page content
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|_ga)$", re.IGNORECASE)
+# Links to files that are not HTML pages
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+    ".zip", ".gz", ".mp4", ".mp3", ".avi", ".mov", ".woff", ".woff2", ".ttf", ".xml",
+)
+
+# Crawl result statuses
+FETCHED = "fetched"
+UNCHANGED = "unchanged"  # 304, or same content hash as the last crawl
+DUPLICATE = "duplicate"  # same content as another URL of this crawl
+GONE = "gone"  # 404 / 410: previously indexed content should be removed
+SKIPPED = "skipped"  # not HTML, disallowed by robots.txt, or an HTTP/network error
+
+
+def canonicalize_url(url, base=None):
+    """
+    Absolute URL with the fragment, default port, tracking parameters and parameter
+    order normalized away, so equivalent links map to one crawl entry.
+    """
+    url = urldefrag(urljoin(base, url) if base else url)[0]
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def site_key(url):
+    """
+    Host without a leading "www.", used for the same-site check.
+    """
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def html_to_text(soup):
+    for tag in soup(["script", "style", "noscript", "template"]):
+        tag.decompose()
+    text = soup.get_text(separator="\n")
+    return re.sub(r"\n\s*\n+", "\n\n", text).strip()
+
+
+def extract_links(soup, base_url):
+    """
+    Returns (canonical links found in the page, the page's <link rel=canonical> or None).
+    """
+    base_tag = soup.find("base", href=True)
+    base_url = urljoin(base_url, base_tag["href"]) if base_tag else base_url
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        href = anchor["href"].strip()
+        if not href or href.startswith(("mailto:", "tel:", "javascript:", "#")):
+            continue
+        if "nofollow" in (anchor.get("rel") or []):
+            continue
+        url = canonicalize_url(href, base_url)
+        if url.startswith(("http://", "https://")) and not urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            links.append(url)
+    canonical = soup.find("link", rel="canonical", href=True)
+    return list(dict.fromkeys(links)), canonicalize_url(canonical["href"], base_url) if canonical else None
+
+
+class SiteCrawler:
+    def __init__(
+        self,
+        max_depth=2,
+        max_pages=100,
+        per_host_concurrency=2,
+        max_concurrency=8,
+        timeout=15.0,
+        user_agent=DEFAULT_USER_AGENT,
+        respect_robots=True,
+        previous=None,
+        client=None,
+    ):
+        """
+        Async breadth-first crawler for one site.
+        max_depth: Link hops followed from the start URL (0 fetches only the start page)
+        max_pages: Maximum number of URLs fetched per crawl
+        per_host_concurrency / max_concurrency: Simultaneous requests per host / overall
+        respect_robots: Obey robots.txt rules and Crawl-delay
+        previous: Callable url -> manifest entry of the last crawl (etag, last_modified,
+            hash, links) or None; used for conditional GETs and to keep following the
+            links of pages that answer 304
+        client: Optional httpx.AsyncClient (e.g. with a MockTransport in tests)
+        """
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.per_host_concurrency = per_host_concurrency
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.previous = previous or (lambda url: None)
+        self.client = client
+        self._robots = {}
+        self._host_limits = {}
+        self._host_next_fetch = {}
+
+    async def _load_robots(self, client, origin):
+        robots = RobotFileParser()
+        try:
+            response = await client.get(f"{origin}/robots.txt")
+            if response.status_code >= 500:
+                robots.disallow_all = True  # RFC 9309: server errors mean "crawl nothing"
+            elif response.status_code >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(response.text.splitlines())
+        except httpx.HTTPError:
+            robots.disallow_all = True
+        return robots
+
+    async def _robots_for(self, client, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        # One shared fetch per origin, even when many workers ask at once
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(client, origin))
+        return await self._robots[origin]
+
+    async def _allowed(self, client, url):
+        if not self.respect_robots:
+            return True
+        return (await self._robots_for(client, url)).can_fetch(self.user_agent, url)
+
+    async def _polite_wait(self, client, host, url):
+        """
+        Spaces requests to a host by its robots.txt Crawl-delay.
+        """
+        if not self.respect_robots:
+            return
+        delay = (await self._robots_for(client, url)).crawl_delay(self.user_agent)
+        if not delay:
+            return
+        now = time.monotonic()
+        next_fetch = max(self._host_next_fetch.get(host, now), now)
+        self._host_next_fetch[host] = next_fetch + float(delay)
+        await asyncio.sleep(next_fetch - now)
+
+    async def _fetch(self, client, url, depth):
+        """
+        Fetches one URL. Returns (result dict, outgoing links).
+        """
+        result = {"url": url, "depth": depth, "status": SKIPPED, "text": None}
+        if not await self._allowed(client, url):
+            result["reason"] = "robots.txt"
+            return result, []
+        host = urlsplit(url).netloc
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        previous = self.previous(url) or {}
+        headers = {}
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+        async with limit:
+            await self._polite_wait(client, host, url)
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                result["reason"] = f"{type(e).__name__}: {e}"
+                return result, []
+        result["http_status"] = response.status_code
+        result["etag"] = response.headers.get("ETag") or previous.get("etag")
+        result["last_modified"] = response.headers.get("Last-Modified") or previous.get("last_modified")
+        if response.status_code == 304:
+            result["status"] = UNCHANGED
+            result["hash"] = previous.get("hash")
+            result["links"] = previous.get("links", [])
+            return result, result["links"]
+        if response.status_code in (404, 410):
+            result["status"] = GONE
+            return result, []
+        if response.status_code >= 400:
+            result["reason"] = f"HTTP {response.status_code}"
+            return result, []
+        if "html" not in response.headers.get("Content-Type", "text/html"):
+            result["reason"] = f"content type {response.headers.get('Content-Type')}"
+            return result, []
+
+        final_url = canonicalize_url(str(response.url))
+        soup = BeautifulSoup(response.text, "html.parser")
+        links, canonical = extract_links(soup, final_url)
+        text = html_to_text(soup)
+        result.update(
+            final_url=final_url,
+            canonical=canonical,
+            links=links,
+            hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        )
+        if result["hash"] == previous.get("hash"):
+            # The server sent the page again but its content did not change
+            result["status"] = UNCHANGED
+        else:
+            result["status"] = FETCHED
+            result["text"] = text
+        return result, links
+
+    async def crawl(self, start_url):
+        """
+        Crawls the site of start_url. Returns one result dict per URL visited, with
+        status fetched / unchanged / duplicate / gone / skipped; fetched pages carry their text.
+        """
+        start_url = canonicalize_url(start_url)
+        site = site_key(start_url)
+        seen = {start_url}
+        content_owner = {}
+        results = []
+        queue = asyncio.Queue()
+        queue.put_nowait((start_url, 0))
+        scheduled = 1
+
+        client = self.client or httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": self.user_agent},
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+        )
+
+        async def worker():
+            nonlocal scheduled
+            while True:
+                url, depth = await queue.get()
+                try:
+                    result, links = await self._fetch(client, url, depth)
+                    if result["status"] in (FETCHED, UNCHANGED):
+                        # The page names another URL as its real address (canonical tag, redirect)
+                        alias = result.get("canonical") or result.get("final_url")
+                        if alias and alias != url and site_key(alias) == site:
+                            if alias not in seen and scheduled < self.max_pages:
+                                seen.add(alias)
+                                scheduled += 1
+                                queue.put_nowait((alias, depth))
+                            if alias in seen:
+                                result.update(status=DUPLICATE, text=None, duplicate_of=alias)
+                    if result["status"] in (FETCHED, UNCHANGED) and result.get("hash"):
+                        # Same content under another URL (index.html, trailing slashes, mirrors)
+                        owner = content_owner.setdefault(result["hash"], url)
+                        if owner != url:
+                            result.update(status=DUPLICATE, text=None, duplicate_of=owner)
+                    results.append(result)
+                    if depth < self.max_depth:
+                        for link in links:
+                            if link in seen or site_key(link) != site or scheduled >= self.max_pages:
+                                continue
+                            seen.add(link)
+                            scheduled += 1
+                            queue.put_nowait((link, depth + 1))
+                except Exception as e:
+                    results.append({"url": url, "depth": depth, "status": SKIPPED, "text": None, "reason": str(e)})
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.client is None:
+                await client.aclose()
+        return results
+
+    def crawl_sync(self, start_url):
+        """
+        Blocking crawl() for scripts and worker processes. Inside a running event loop
+        (FastAPI handlers, notebooks) await crawl() instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.crawl(start_url))
+        raise RuntimeError("crawl_sync() cannot run inside a running event loop; await crawl() instead.")
+
+
+# Example usage against a local fixture site:
+# if __name__ == "__main__":
+#     # Serve a folder of HTML pages (plus an optional robots.txt): python -m http.server 8000
+#     crawler = SiteCrawler(max_depth=3, max_pages=50)
+#     for page in crawler.crawl_sync("http://127.0.0.1:8000/"):
+#         print(page["status"], page["url"])
@@ -1,10 +1,84 @@
 # extractor.py
 
+import multiprocessing
+import os
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.document_loaders import PyPDFLoader  # Official LangChain PDF loader
 
+try:
+    import fitz  # PyMuPDF: C-based parser, much faster than pypdf
+except ImportError:  # optional: fall back to PyPDFLoader
+    fitz = None
+
+PARSER_AUTO = "auto"
+PARSER_PYMUPDF = "pymupdf"
+PARSER_PYPDF = "pypdf"
+
+
+def extract_pdf_pages(pdf_path, parser=PARSER_AUTO):
+    """
+    Returns the text of every page of a PDF.
+    parser: "pymupdf", "pypdf", or "auto" (PyMuPDF when installed, else pypdf)
+    """
+    if parser == PARSER_PYMUPDF or (parser == PARSER_AUTO and fitz is not None):
+        if fitz is None:
+            raise ImportError("PyMuPDF is not installed; use parser='pypdf'.")
+        with fitz.open(str(pdf_path)) as document:
+            return [page.get_text("text") for page in document]
+    return [doc.page_content for doc in PyPDFLoader(str(pdf_path)).lazy_load()]
+
+
+def _extract_pdf_job(pdf_path, parser):
+    """
+    Process-pool task. Errors are returned, not raised, so one bad PDF cannot fail the batch.
+    """
+    try:
+        return str(pdf_path), extract_pdf_pages(pdf_path, parser), None
+    except Exception as e:
+        return str(pdf_path), None, f"{type(e).__name__}: {e}"
+
+
+def iter_extracted_pdfs(pdf_paths, max_workers=None, parser=PARSER_AUTO):
+    """
+    Parses PDFs in a pool of worker processes and yields (pdf_path, pages, error) as each
+    file finishes; exactly one of pages/error is None. At most 2 * max_workers files are in
+    flight, so extraction runs ahead of the consumer (embedding) without buffering the folder.
+    A worker that dies outright (e.g. a crash inside the parser) breaks the pool: the files
+    it held are retried once in a fresh pool, then reported as failed.
+    """
+    queue = deque((Path(p), 0) for p in pdf_paths)
+    if not queue:
+        return
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(queue)))
+    # spawn: the parent (Streamlit, the HTTP server) runs threads, which fork does not copy safely
+    context = multiprocessing.get_context("spawn")
+    while queue:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            in_flight = {}
+            broken = False
+            while (queue and not broken) or in_flight:
+                while queue and not broken and len(in_flight) < 2 * max_workers:
+                    path, attempts = queue.popleft()
+                    in_flight[pool.submit(_extract_pdf_job, path, parser)] = (path, attempts)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, attempts = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        if attempts == 0:
+                            queue.append((path, 1))
+                            continue
+                        result = (str(path), None, "BrokenProcessPool: worker process died")
+                    yield result
+
+
 class ContentExtractor:
     def __init__(self, output_dir="extracted_content"):
         self.output_dir = (Path(__file__).parent / output_dir).absolute()
@@ -15,19 +89,46 @@ class ContentExtractor:
 
     def extract_from_pdf(self, pdf_path):
         """
-        Extracts text from a PDF using LangChain's PyPDFLoader and saves it to a timestamped .txt file.
-        Returns the absolute path to the saved file.
+        Extracts text from a PDF (PyMuPDF if installed, else PyPDFLoader) and saves it to a timestamped .txt file.
+        Returns the absolute path to the saved file. Ingestion does not use these files;
+        see iter_pdf_pages / iter_pdfs.
         """
         pdf_path = Path(pdf_path)
-        loader = PyPDFLoader(str(pdf_path))
-        docs = loader.load()
         # Concatenate all page contents
-        content = "\n".join(doc.page_content for doc in docs)
+        content = "\n".join(extract_pdf_pages(pdf_path))
         out_name = f"{pdf_path.stem}_{self._get_timestamp()}.txt"
         out_path = self.output_dir / out_name
         out_path.write_text(content, encoding="utf-8")
         return str(out_path.resolve())
 
+    def iter_pdf_pages(self, pdf_path, parser=PARSER_AUTO):
+        """
+        Lazily yields the text of each page of a PDF, one page at a time.
+        """
+        if parser == PARSER_PYPDF or (parser == PARSER_AUTO and fitz is None):
+            for doc in PyPDFLoader(str(pdf_path)).lazy_load():
+                yield doc.page_content
+            return
+        if fitz is None:
+            raise ImportError("PyMuPDF is not installed; use parser='pypdf'.")
+        with fitz.open(str(pdf_path)) as document:
+            for page in document:
+                yield page.get_text("text")
+
+    def iter_pdfs(self, pdf_paths, max_workers=None, parser=PARSER_AUTO):
+        """
+        Parses many PDFs across CPU cores; yields (pdf_path, pages, error) per file.
+        """
+        return iter_extracted_pdfs(pdf_paths, max_workers=max_workers, parser=parser)
+
+    def iter_url_pages(self, url):
+        """
+        Lazily yields the text of each document loaded from a URL.
+        """
+        loader = WebBaseLoader(url)
+        for doc in loader.lazy_load():
+            yield doc.page_content
+
     def extract_from_url(self, url):
         """
         Extracts text from a URL using LangChain's WebBaseLoader and saves it to a timestamped .txt file.
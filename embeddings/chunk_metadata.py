@@ -0,0 +1,95 @@
+# chunk_metadata.py
+
+import re
+from collections import Counter
+from itertools import chain, islice
+from datetime import datetime, timezone
+from pathlib import Path
+
+# ISO code -> how the currency shows up in price lists, rate cards and questions.
+# Codes with their own "$" prefix come before the bare "$", which is read as USD.
+CURRENCY_PATTERNS = {
+    "AED": re.compile(r"\bAED\b|\bDhs?\b\.?|د\.إ|(?i:\bdirhams?\b)"),
+    "SAR": re.compile(r"\bSAR\b|ر\.س"),
+    "EUR": re.compile(r"\bEUR\b|€"),
+    "GBP": re.compile(r"\bGBP\b|£"),
+    "INR": re.compile(r"\bINR\b|₹|\bRs\b\.?|(?i:\brupees?\b)"),
+    "PKR": re.compile(r"\bPKR\b"),
+    "CAD": re.compile(r"\bCAD\b|\bC\$"),
+    "AUD": re.compile(r"\bAUD\b|\bA\$"),
+    "USD": re.compile(r"\bUSD\b|\bUS\$|(?<![A-Z])\$|(?i:\b(?:us )?dollars?\b)"),
+}
+
+# (document type, pattern) checked against the file name, then the first page
+DOC_TYPE_PATTERNS = [
+    ("rate_card", re.compile(r"rate[\s_-]*cards?", re.IGNORECASE)),
+    ("price_list", re.compile(r"price[\s_-]*lists?|pricing|tariff", re.IGNORECASE)),
+    ("invoice", re.compile(r"\binvoice\b", re.IGNORECASE)),
+    ("quotation", re.compile(r"\bquot(e|ation)\b", re.IGNORECASE)),
+]
+DOC_TYPE_PDF = "pdf"
+DOC_TYPE_WEB_PAGE = "web_page"
+# Leading pages a source's type and main currency are detected from
+METADATA_PAGES = 5
+
+
+def detect_currency(text):
+    """
+    ISO code of the currency mentioned most often in text, or None.
+    """
+    counts = Counter({code: len(pattern.findall(text)) for code, pattern in CURRENCY_PATTERNS.items()})
+    code, count = counts.most_common(1)[0]
+    return code if count else None
+
+
+def is_web_source(source):
+    return source.startswith(("http://", "https://"))
+
+
+def detect_doc_type(source, first_page=""):
+    name = source if is_web_source(source) else Path(source).stem
+    for text in (name, first_page[:2000]):
+        for doc_type, pattern in DOC_TYPE_PATTERNS:
+            if pattern.search(text):
+                return doc_type
+    return DOC_TYPE_PDF if source.lower().endswith(".pdf") else DOC_TYPE_WEB_PAGE
+
+
+def ingestion_timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class SourceMetadata:
+    def __init__(self, source, pages, ingested_at=None):
+        """
+        Metadata shared by every chunk of one source (a PDF or a web page).
+        pages: Leading page texts of the source, used to detect its type and main currency
+        """
+        self.source = source
+        self.doc_type = detect_doc_type(source, next((page for page in pages if page and page.strip()), ""))
+        self.currency = detect_currency("\n".join(page or "" for page in pages))
+        self.ingested_at = ingested_at or ingestion_timestamp()
+
+    @classmethod
+    def from_stream(cls, source, pages):
+        """
+        Detects the metadata from the first METADATA_PAGES of a page iterable.
+        Returns (metadata, pages), where pages yields every page again: the first ones
+        from memory, the rest straight from the original iterable.
+        """
+        pages = iter(pages)
+        head = list(islice(pages, METADATA_PAGES))
+        return cls(source, head), chain(head, pages)
+
+    def for_chunk(self, chunk, page):
+        """
+        Chunk metadata: the chunk's own currency wins over the source's main one.
+        """
+        metadata = {
+            "source": self.source,
+            "page": None if is_web_source(self.source) else page,
+            "currency": detect_currency(chunk) or self.currency,
+            "doc_type": self.doc_type,
+            "ingested_at": self.ingested_at,
+        }
+        return {key: value for key, value in metadata.items() if value is not None}
@@ -0,0 +1,91 @@
+# chunking.py
+
+import time
+from itertools import islice
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+class TextChunker:
+    def __init__(self, chunk_size=1000, chunk_overlap=150):
+        """
+        chunk_size: Maximum characters per chunk
+        chunk_overlap: Characters shared between consecutive chunks of a page
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+
+    def iter_chunks(self, pages):
+        """
+        Lazily splits an iterable of page texts into overlapping chunks.
+        Only one page is held in memory at a time.
+        """
+        for _, chunk in self.iter_page_chunks(pages):
+            yield chunk
+
+    def iter_page_chunks(self, pages):
+        """
+        Like iter_chunks, but yields (1-based page number, chunk).
+        """
+        for page_number, page_text in enumerate(pages, start=1):
+            if not page_text or not page_text.strip():
+                continue
+            for chunk in self.splitter.split_text(page_text):
+                yield page_number, chunk
+
+
+def batched(iterable, batch_size):
+    """
+    Yields lists of at most batch_size items from iterable.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class ThroughputCounter:
+    def __init__(self, label="ingest"):
+        self.label = label
+        self.chunks = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    def update(self, chunks, nbytes):
+        self.chunks += chunks
+        self.bytes += nbytes
+
+    def elapsed(self):
+        return max(time.perf_counter() - self.started, 1e-9)
+
+    def chunks_per_sec(self):
+        return self.chunks / self.elapsed()
+
+    def bytes_per_sec(self):
+        return self.bytes / self.elapsed()
+
+    def report(self):
+        """
+        Prints and returns the current throughput numbers.
+        """
+        stats = {
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "seconds": round(self.elapsed(), 3),
+            "chunks_per_sec": round(self.chunks_per_sec(), 2),
+            "bytes_per_sec": round(self.bytes_per_sec(), 2),
+        }
+        print(
+            f"[{self.label}] {stats['chunks']} chunks, {stats['bytes']} bytes in {stats['seconds']}s "
+            f"({stats['chunks_per_sec']} chunks/sec, {stats['bytes_per_sec']} bytes/sec)"
+        )
+        return stats
@@ -1,11 +1,16 @@
 # embedder.py
 
 from pathlib import Path
-from Search.extractor import ContentExtractor
-from retrieval.faiss_retriever import LangChainFAISSManager
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from pathlib import Path
-from Search.extractor import ContentExtractor
+from Search.crawler import DUPLICATE, FETCHED, GONE, UNCHANGED, SiteCrawler
+from Search.extractor import PARSER_AUTO, ContentExtractor
+from retrieval.faiss_retriever import LOAD_MEMORY, LangChainFAISSManager
+from retrieval.pricing_tables import PRICING_DOC_TYPES, PricingTables
+from retrieval.quantized_index import STORAGE_FLOAT32
+from retrieval.sharded_faiss import SHARD_BY_SOURCE, WORKERS_THREAD, ShardedFAISSManager
+from embeddings.chunking import TextChunker, ThroughputCounter, batched
+from embeddings.chunk_metadata import SourceMetadata
+from embeddings.source_manifest import SourceManifest, chunk_id, file_sha256
+from monitoring.metrics import span
 
 # Get the root directory of your project (where this script is located)
 FAISS_ROOT = (Path(__file__).parent.parent / "faissDB").absolute()
@@ -27,71 +32,299 @@ class EmbedderPipeline:
         docstore_file=FAISS_DOCSTORE_PATH,
         dimension=1024,  # Set according to your embedding model
         initialize_new=False,
-        output_dir="extracted_content"
+        output_dir="extracted_content",
+        chunk_size=1000,
+        chunk_overlap=150,
+        batch_size=32,
+        manifest_file=None,
+        load_mode=LOAD_MEMORY,
+        pdf_workers=None,
+        pdf_parser=PARSER_AUTO,
+        vector_storage=STORAGE_FLOAT32,
+        shards=1,
+        shard_by=SHARD_BY_SOURCE,
+        shard_workers=WORKERS_THREAD,
+        pricing_db=None,
     ):
+        """
+        chunk_size / chunk_overlap: Character size and overlap of the chunks that get embedded
+        batch_size: Number of chunks sent to the embedding model per call
+        manifest_file: JSON manifest of ingested sources (defaults to <faiss_file>_manifest.json)
+        load_mode: "memory", or "mmap" to share a read-only index between serving processes
+        pdf_workers: Processes parsing price lists and rate cards for the pricing tables (default: CPU count)
+        pdf_parser: "auto" (PyMuPDF if installed), "pymupdf" or "pypdf"
+        vector_storage: "float32", or "fp16" / "int8" / "binary" codes rescored against vectors on disk
+        shards: Split the index over this many shards searched in parallel (1 keeps a single index)
+        shard_by / shard_workers: Partitioning ("source" or "hash") and where shards run ("thread" or "process")
+        pricing_db: SQLite database that price lists and rate cards are also parsed into as
+            indexed tables (see retrieval/pricing_tables.py); None skips that stage
+        """
         # print("Initializing EmbedderPipeline...")
         self.extractor = ContentExtractor(output_dir=output_dir)
-        self.faiss_manager = LangChainFAISSManager(
-            embedding_model=embedding_model,
-            faiss_file=faiss_file,
-            docstore_file=docstore_file,
-            dimension=dimension,
-            initialize_new=initialize_new
-        )
+        self.chunker = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.batch_size = batch_size
+        self.pdf_workers = pdf_workers
+        self.pdf_parser = pdf_parser
+        if shards > 1:
+            self.faiss_manager = ShardedFAISSManager(
+                embedding_model=embedding_model,
+                num_shards=shards,
+                shard_by=shard_by,
+                workers=shard_workers,
+                faiss_file=faiss_file,
+                docstore_file=docstore_file,
+                dimension=dimension,
+                initialize_new=initialize_new,
+                load_mode=load_mode,
+                vector_storage=vector_storage,
+            )
+        else:
+            self.faiss_manager = LangChainFAISSManager(
+                embedding_model=embedding_model,
+                faiss_file=faiss_file,
+                docstore_file=docstore_file,
+                dimension=dimension,
+                initialize_new=initialize_new,
+                load_mode=load_mode,
+                vector_storage=vector_storage,
+            )
+        if manifest_file is None:
+            faiss_path = Path(faiss_file)
+            manifest_file = faiss_path.with_name(f"{faiss_path.stem}_manifest.json")
+        # A fresh index holds none of the manifest's chunks, so the manifest starts over too
+        self.manifest = SourceManifest(manifest_file, reset=initialize_new)
+        self.pricing_tables = PricingTables(pricing_db) if pricing_db else None
 
-    def ingest_pdf(self,pdf_folder):
+    def _ingest_pages(self, source, pages, counter, source_metadata=None):
+        """
+        Streams pages -> overlapping chunks -> fixed-size embedding batches -> FAISS.
+        Only one batch of chunks is embedded at a time, and pages are read from the
+        iterable as chunking reaches them. Every chunk is stored with its source, page,
+        currency, document type and ingestion time.
+        Chunks already in the index are skipped, and chunks the source no longer
+        produces are deleted, so re-ingesting a source upserts it in place.
+        source_metadata: From SourceMetadata.from_stream, if the caller already built it
+        Returns (chunk ids of the source, number of chunks added, number removed).
+        """
+        previous_ids = set(self.manifest.chunk_ids(source))
+        if source_metadata is None:
+            source_metadata, pages = SourceMetadata.from_stream(source, pages)
+        source_ids = []
+        seen = set()
+
+        def new_chunks():
+            for page, chunk in self.chunker.iter_page_chunks(pages):
+                doc_id = chunk_id(source, chunk)
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                source_ids.append(doc_id)
+                if not self.faiss_manager.has_id(doc_id):
+                    yield doc_id, chunk, source_metadata.for_chunk(chunk, page)
+
+        added = 0
+        for batch in batched(new_chunks(), self.batch_size):
+            texts = [chunk for _, chunk, _ in batch]
+            self.faiss_manager.add_texts(
+                texts,
+                ids=[doc_id for doc_id, _, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch],
+            )
+            counter.update(len(texts), sum(len(chunk.encode("utf-8")) for chunk in texts))
+            added += len(texts)
+
+        stale_ids = previous_ids - seen
+        removed = self.faiss_manager.delete(list(stale_ids)) if stale_ids else 0
+        return source_ids, added, removed
+
+    def _save(self):
+        self.faiss_manager.persist()
+        self.manifest.save()
+
+    def ingest_pdf(self, pdf_folder):
         """
         Extracts and ingests all PDFs in a folder.
+        PDFs whose size/mtime (or content hash) match the manifest are skipped entirely,
+        and the chunks of PDFs deleted or renamed since the last run are removed.
+        Changed PDFs are read one page at a time, each page going straight to
+        chunking/embedding, so a large PDF is never held in memory whole. A PDF that
+        fails to parse is reported and skipped without affecting the others.
+        With pricing_db set, price lists and rate cards are also loaded into the pricing
+        tables, including unchanged ones whose tables are missing or out of date; those
+        (small) documents are parsed whole in parallel worker processes.
+        Returns the number of chunks added to FAISS.
         """
         pdf_folder = Path(pdf_folder)
         if not pdf_folder.exists():
             print(f"PDF folder {pdf_folder} does not exist.")
-            return
-        pdf_files = list(pdf_folder.glob("*.pdf"))  # Only top-level PDFs
-        extractor = ContentExtractor()
-        
-        texts=[]
-        
+            return 0
+        pdf_files = sorted(pdf_folder.glob("*.pdf"))  # Only top-level PDFs
+        counter = ThroughputCounter(label="pdf")
+        ingested_files = 0
+        skipped_files = 0
+        failed_files = 0
+        removed_files = 0
+        total_chunks = 0
+
+        # Manifest sources of this folder that are no longer on disk (deleted or renamed)
+        folder = pdf_folder.resolve()
+        current = {str(pdf_path.resolve()) for pdf_path in pdf_files}
+        missing = [
+            source for source in self.manifest.sources
+            if Path(source).parent == folder and Path(source).suffix == ".pdf" and source not in current
+        ]
+        for source in missing:
+            removed = self.faiss_manager.delete(self.manifest.chunk_ids(source))
+            self.manifest.remove(source)
+            removed_files += 1
+            print(f"{Path(source).name} no longer exists; removed {removed} chunks.")
+
+        changed_files = []
+        pricing_files = []
         for pdf_path in pdf_files:
+            if self.manifest.file_unchanged(str(pdf_path.resolve()), pdf_path):
+                skipped_files += 1
+                if self.pricing_tables is not None and self.pricing_tables.is_stale(pdf_path):
+                    pricing_files.append(pdf_path.resolve())
+            else:
+                changed_files.append(pdf_path.resolve())
+
+        for pdf_path in changed_files:
             try:
-                print(f"Processing {pdf_path} ...")
-                txt_path = extractor.extract_from_pdf(pdf_path)
-                with open(pdf_path, encoding="utf-8") as f:
-                    text = f.read()
-                    texts.append(text)
+                content_hash = file_sha256(pdf_path)
+                stat = pdf_path.stat()
+                source_metadata, pages = SourceMetadata.from_stream(
+                    str(pdf_path), self.extractor.iter_pdf_pages(pdf_path, parser=self.pdf_parser)
+                )
+                source_ids, added, removed = self._ingest_pages(str(pdf_path), pages, counter, source_metadata)
+                self.manifest.update(
+                    str(pdf_path),
+                    source_ids,
+                    hash=content_hash,
+                    mtime=stat.st_mtime,
+                    size=stat.st_size,
+                )
+                total_chunks += added
+                ingested_files += 1
+                print(f"{pdf_path.name}: {added} chunks added, {removed} stale chunks removed.")
+                counter.report()
+                if self.pricing_tables is not None and source_metadata.doc_type in PRICING_DOC_TYPES:
+                    pricing_files.append(pdf_path)
             except Exception as e:
-                print(f"Failed to process {pdf_path}: {e}")
-        
-        if texts:
-            self.faiss_manager.add_texts(texts)
-            self.faiss_manager.persist()
-        print(f"Ingested {len(texts)} PDFs into FAISS and persisted.")
-        return txt_path
-
-        
-        
-
-    def ingest_url(self, url):
-        """
-        Extracts text from URL, embeds, and stores in FAISS.
-        """
-        
-        extractor = ContentExtractor()
-        txt_path = extractor.extract_from_url(url)
-        with open(txt_path, encoding="utf-8") as f:
-            text = f.read()
-        self.faiss_manager.add_texts([text])
-        self.faiss_manager.persist()
-        return txt_path
-    
-    
+                failed_files += 1
+                print(f"Failed to ingest {pdf_path}: {e}")
+
+        for pdf_path, pages, error in self.extractor.iter_pdfs(
+            pricing_files, max_workers=self.pdf_workers, parser=self.pdf_parser
+        ):
+            if error is not None:
+                print(f"Failed to parse {pdf_path} for the pricing tables: {error}")
+                continue
+            try:
+                rows = self.pricing_tables.load_document(str(pdf_path), pages, content_hash=file_sha256(pdf_path))
+            except Exception as e:
+                print(f"Failed to load pricing rows from {pdf_path}: {e}")
+                continue
+            if rows:
+                print(f"{Path(pdf_path).name}: {rows} pricing rows loaded.")
 
-    def search(self, query, k=5):
+        if ingested_files or removed_files:
+            self._save()
+        print(
+            f"Ingested {ingested_files} PDFs ({total_chunks} chunks) into FAISS, "
+            f"skipped {skipped_files} unchanged, removed {removed_files} deleted, {failed_files} failed."
+        )
+        return total_chunks
+
+    def ingest_url(self, url, max_depth=2, max_pages=100, crawler=None):
+        """
+        Crawls the site of url (same-domain links up to max_depth hops, at most max_pages
+        pages) and ingests every page as its own source.
+        Recrawls send conditional GETs with the stored ETag/Last-Modified, so only changed
+        pages are downloaded and embedded; pages that are gone or now duplicate another
+        URL have their chunks removed.
+        crawler: Optional preconfigured SiteCrawler (e.g. pointed at a fixture server)
+        Returns the number of chunks added to FAISS.
+        """
+        crawler = crawler or SiteCrawler(max_depth=max_depth, max_pages=max_pages)
+        crawler.previous = self.manifest.get
+        counter = ThroughputCounter(label="url")
+        statuses = {}
+        total_chunks = 0
+        changed = False
+
+        for page in crawler.crawl_sync(url):
+            page_url = page["url"]
+            statuses[page["status"]] = statuses.get(page["status"], 0) + 1
+            if page["status"] == FETCHED:
+                source_ids, added, removed = self._ingest_pages(page_url, [page["text"]], counter)
+                self.manifest.update(
+                    page_url,
+                    source_ids,
+                    hash=page["hash"],
+                    etag=page.get("etag"),
+                    last_modified=page.get("last_modified"),
+                    links=page.get("links"),
+                )
+                total_chunks += added
+                changed = True
+                print(f"{page_url}: {added} chunks added, {removed} stale chunks removed.")
+            elif page["status"] == UNCHANGED:
+                entry = self.manifest.get(page_url)
+                if entry is not None:
+                    # Keep validators and outgoing links current for the next conditional GET
+                    entry.update({k: page[k] for k in ("etag", "last_modified", "links") if page.get(k)})
+                    changed = True
+            elif page["status"] in (GONE, DUPLICATE) and self.manifest.get(page_url):
+                stale_ids = self.manifest.chunk_ids(page_url)
+                self.faiss_manager.delete(stale_ids)
+                self.manifest.remove(page_url)
+                changed = True
+                print(f"{page_url} is {page['status']}; removed {len(stale_ids)} chunks.")
+
+        if changed:
+            self._save()
+        print(f"Crawled {url}: {statuses}")
+        counter.report()
+        return total_chunks
+
+    def refresh(self):
+        """
+        Picks up an index persisted by another process (see LangChainFAISSManager.refresh).
+        """
+        return self.faiss_manager.refresh()
+
+    def search(self, query, k=5, filter=None):
         """
         Semantic search over the FAISS index.
         Returns the top-k most relevant texts.
+        filter: Optional metadata filter, e.g. {"currency": "AED", "doc_type": "rate_card"};
+            fields are source, page, currency and doc_type, a list means any of its values
+        """
+        with span("faiss_search", k=k):
+            return self.faiss_manager.similarity_search(query, k=k, filter=filter)
+
+    def search_with_scores(self, query, k=5, filter=None):
+        """
+        Semantic search returning (Document, L2 distance) pairs, best first.
+        """
+        with span("faiss_search", k=k):
+            return self.faiss_manager.similarity_search_with_score(query, k=k, filter=filter)
+
+    def hybrid_search(self, query, k=5, mode="auto", filter=None):
+        """
+        BM25 + semantic search fused with reciprocal rank fusion.
+        Returns the top-k Documents, best first. Keyword queries (codes, currencies,
+        exact role names) are answered from the lexical index without embedding.
+        """
+        with span("faiss_search", k=k, mode=mode):
+            return self.faiss_manager.hybrid_search(query, k=k, mode=mode, filter=filter)
+
+    def as_retriever(self, k=4, filter=None):
+        """
+        LangChain retriever over the index, optionally restricted by a metadata filter.
         """
-        return self.faiss_manager.similarity_search(query, k=k)
+        return self.faiss_manager.as_retriever(k=k, filter=filter)
 
 
 
@@ -0,0 +1,98 @@
+# source_manifest.py
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Streams a file through sha256 without loading it into memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source, chunk):
+    """
+    Deterministic docstore id of a chunk: the same text from the same source always
+    maps to the same id, so re-ingestion can tell unchanged chunks from new ones.
+    """
+    source_key = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    text_key = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:24]
+    return f"{source_key}:{text_key}"
+
+
+class SourceManifest:
+    def __init__(self, manifest_file, reset=False):
+        """
+        JSON record of every ingested source (PDF path or URL):
+        content hash, mtime/size or ETag/Last-Modified, and the chunk ids it produced.
+        reset: Start from an empty manifest (used when the FAISS index is recreated)
+        """
+        self.manifest_file = Path(manifest_file)
+        self.sources = {}
+        if not reset and self.manifest_file.exists():
+            with open(self.manifest_file, encoding="utf-8") as f:
+                self.sources = json.load(f)
+
+    def get(self, source):
+        return self.sources.get(source)
+
+    def chunk_ids(self, source):
+        entry = self.get(source)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def file_unchanged(self, source, path):
+        """
+        True if a file's mtime and size match the manifest; falls back to the content hash
+        when only the mtime moved (e.g. the file was copied or touched).
+        """
+        entry = self.get(source)
+        if not entry:
+            return False
+        stat = Path(path).stat()
+        if entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            return True
+        if entry.get("size") == stat.st_size and entry.get("hash") == file_sha256(path):
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def validators_unchanged(self, source, etag=None, last_modified=None):
+        """
+        True if the HTTP validators of a URL match the manifest.
+        """
+        entry = self.get(source)
+        if not entry or not (etag or last_modified):
+            return False
+        if etag and entry.get("etag") != etag:
+            return False
+        if last_modified and entry.get("last_modified") != last_modified:
+            return False
+        return True
+
+    def update(self, source, chunk_ids, **fingerprint):
+        """
+        Records the chunk ids and fingerprint (hash, mtime, size, etag, last_modified) of a source.
+        """
+        self.sources[source] = {
+            **{key: value for key, value in fingerprint.items() if value is not None},
+            "chunk_ids": list(chunk_ids),
+            "ingested_at": time.time(),
+        }
+
+    def remove(self, source):
+        return self.sources.pop(source, None)
+
+    def save(self):
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_suffix(self.manifest_file.suffix + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.sources, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
@@ -0,0 +1,225 @@
+# async_llm_client.py
+
+import asyncio
+import hashlib
+import random
+import time
+import httpx
+from llm.llm_client import GroqLLMClient
+from monitoring.metrics import METRICS, span
+
+# HTTP statuses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    """
+    Seconds requested by a Retry-After header, if the error carries one.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+class AsyncGroqLLMClient(GroqLLMClient):
+    def __init__(
+        self,
+        groq_api_key,
+        model_name="Llama3-8b-8192",
+        base_url=None,
+        max_in_flight=8,
+        max_retries=5,
+        backoff_base=0.5,
+        backoff_max=20.0,
+        timeout=60.0,
+        http_client=None,
+    ):
+        """
+        Async Groq client for serving many concurrent questions.
+        base_url: Groq API base URL (point it at a local stub server in tests)
+        max_in_flight: Maximum concurrent requests to the API
+        max_retries / backoff_base / backoff_max: Jittered exponential backoff on 429/5xx
+        timeout: Per-request HTTP timeout in seconds
+        http_client: Optional shared httpx.AsyncClient; by default one pooled client is
+            created and reused for every request
+        """
+        self.http_client = http_client or httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_in_flight * 2, max_keepalive_connections=max_in_flight),
+        )
+        llm_kwargs = {"http_async_client": self.http_client, "max_retries": 0}
+        if base_url:
+            llm_kwargs["base_url"] = base_url
+        # Retries are handled here, with jitter, instead of inside the Groq SDK
+        super().__init__(groq_api_key=groq_api_key, model_name=model_name, **llm_kwargs)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = None
+        self._inflight = {}
+        # Streams in progress: request key -> future of the leader's full answer
+        self._streaming = {}
+        self.retries = 0
+        self.coalesced = 0
+
+    def _limiter(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def _backoff(self, attempt, error):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        # Full jitter: spreads retries of a burst instead of re-synchronizing them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _request_key(self, retriever, context, query):
+        return (id(retriever), query, hashlib.sha256(str(context).encode("utf-8")).hexdigest())
+
+    async def _retry_delay(self, attempt, error):
+        delay = self._backoff(attempt, error)
+        self.retries += 1
+        METRICS.inc("llm_retries_total", status=_status_code(error))
+        print(
+            f"Groq request failed ({type(error).__name__}, status {_status_code(error)}); "
+            f"retry {attempt + 1} in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+    async def _invoke_with_retry(self, retriever, context, query):
+        chain = self._build_chain(retriever)
+        attempt = 0
+        while True:
+            try:
+                async with self._limiter():
+                    with span("llm_generate", attempt=attempt):
+                        result = await chain.ainvoke({"input": query, "context": context}, config=self.run_config)
+                return result["answer"] if "answer" in result else result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await self._retry_delay(attempt, e)
+                attempt += 1
+
+    async def _stream_with_retry(self, retriever, context, query):
+        """
+        Streams answer tokens, holding an in-flight slot for the whole stream.
+        Failures before the first token are retried; once tokens went out they are raised.
+        """
+        chain = self._build_chain(retriever)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            first_token = True
+            try:
+                async with self._limiter():
+                    async for chunk in chain.astream({"input": query, "context": context}, config=self.run_config):
+                        token = chunk.get("answer")
+                        if token:
+                            if first_token:
+                                self._record_ttft(started)
+                                first_token = False
+                            yield token
+                METRICS.observe("stage_duration_seconds", time.perf_counter() - started, stage="llm_stream")
+                return
+            except Exception as e:
+                if not first_token or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await self._retry_delay(attempt, e)
+                attempt += 1
+
+    async def aget_response(self, retriever, context, query, system_message=None):
+        """
+        Async get_response. Identical concurrent requests share one upstream call.
+        """
+        key = self._request_key(retriever, context, query)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            METRICS.inc("llm_coalesced_total")
+            return await asyncio.shield(pending)
+        task = asyncio.ensure_future(self._invoke_with_retry(retriever, context, query))
+        self._inflight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def astream_response(self, retriever, context, query, system_message=None):
+        """
+        Async stream_response under the same in-flight cap and retries. Identical
+        concurrent requests stream once; the others get the leader's full answer in one
+        piece when it completes.
+        """
+        key = self._request_key(retriever, context, query)
+        leader = self._streaming.get(key)
+        if leader is not None:
+            self.coalesced += 1
+            METRICS.inc("llm_coalesced_total")
+            try:
+                yield await asyncio.shield(leader)
+                return
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+                # The leader's client went away mid-answer: stream it here instead
+        answer = asyncio.get_running_loop().create_future()
+        self._streaming[key] = answer
+        stream = self._stream_with_retry(retriever, context, query)
+        tokens = []
+        try:
+            async for token in stream:
+                tokens.append(token)
+                yield token
+            answer.set_result("".join(tokens))
+        except Exception as e:
+            answer.set_exception(e)
+            # Marks the exception retrieved when no follower is waiting on it
+            answer.exception()
+            raise
+        finally:
+            # Frees the in-flight slot now, not when the stream is garbage-collected
+            await stream.aclose()
+            if not answer.done():
+                answer.cancel()
+            if self._streaming.get(key) is answer:
+                del self._streaming[key]
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+# Example usage against a local stub of the OpenAI-compatible Groq API:
+# if __name__ == "__main__":
+#     async def main():
+#         client = AsyncGroqLLMClient(groq_api_key="test", base_url="http://127.0.0.1:8080", max_in_flight=4)
+#         answers = await asyncio.gather(*[
+#             client.aget_response(retriever, "context", "What services do you offer?") for _ in range(20)
+#         ])
+#         print(answers[0], client.coalesced, client.retries)
+#         await client.aclose()
+#     asyncio.run(main())
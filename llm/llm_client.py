@@ -1,27 +1,122 @@
 # llmclients.py
 
+import time
+from collections import OrderedDict, deque
 from langchain_groq import ChatGroq
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableParallel
+from monitoring.callbacks import MetricsCallbackHandler
+from monitoring.metrics import METRICS, span
+
+SYSTEM_PROMPT = "You are assistant inventers company. Answer Queries in info and sql data.\n\nContext:\n{context}"
+
 
 class GroqLLMClient:
-    def __init__(self, groq_api_key, model_name="Llama3-8b-8192", streaming=False):
-        self.llm = ChatGroq(groq_api_key=groq_api_key, model_name=model_name, streaming=streaming)
+    # Retrieval chains kept per retriever object
+    MAX_CACHED_CHAINS = 16
 
-    def get_response(self, retriever, context, query, system_message=None):
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are assistant inventers company. Answer Queries in info and sql data.\n\nContext:\n{context}"),
+    def __init__(self, groq_api_key, model_name="Llama3-8b-8192", streaming=False, **llm_kwargs):
+        """
+        llm_kwargs: Extra ChatGroq settings (base_url, http_client, max_retries, ...)
+        """
+        self.llm = ChatGroq(groq_api_key=groq_api_key, model_name=model_name, streaming=streaming, **llm_kwargs)
+        # Prompt and stuff-documents chain do not depend on the request, so build them once
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
             ("user", "{input}")
         ])
-        combine_docs_chain = create_stuff_documents_chain(self.llm, prompt)
-        retrieval_chain = create_retrieval_chain(retriever, combine_docs_chain)
-        result = retrieval_chain.invoke({
-            "input": query,
-            "context": context
-        })
+        self.combine_docs_chain = create_stuff_documents_chain(self.llm, self.prompt)
+        # Used when the caller already packed the context: no second retrieval pass
+        self.context_chain = RunnableParallel(answer=self.prompt | self.llm | StrOutputParser())
+        self._chains = OrderedDict()
+        # Time-to-first-token of recent streamed responses, in seconds
+        self.ttft_seconds = deque(maxlen=1000)
+        # Latency and token usage of every answer-generation call
+        self.run_config = {"callbacks": [MetricsCallbackHandler("answer")]}
+
+    def _build_chain(self, retriever):
+        """
+        Returns the retrieval chain for retriever, creating it on first use.
+        With retriever=None the given context is used as-is.
+        """
+        if retriever is None:
+            return self.context_chain
+        key = id(retriever)
+        cached = self._chains.get(key)
+        if cached is not None and cached[0] is retriever:
+            self._chains.move_to_end(key)
+            return cached[1]
+        chain = create_retrieval_chain(retriever, self.combine_docs_chain)
+        # The retriever is kept alongside its chain so its id cannot be reused while cached
+        self._chains[key] = (retriever, chain)
+        while len(self._chains) > self.MAX_CACHED_CHAINS:
+            self._chains.popitem(last=False)
+        return chain
+
+    def get_response(self, retriever, context, query, system_message=None):
+        retrieval_chain = self._build_chain(retriever)
+        with span("llm_generate"):
+            result = retrieval_chain.invoke({
+                "input": query,
+                "context": context
+            }, config=self.run_config)
         return result["answer"] if "answer" in result else result
 
+    def _record_ttft(self, started):
+        ttft = time.perf_counter() - started
+        self.ttft_seconds.append(ttft)
+        METRICS.observe("llm_ttft_seconds", ttft)
+
+    def stream_response(self, retriever, context, query, system_message=None):
+        """
+        Yields answer tokens as the LLM produces them.
+        """
+        retrieval_chain = self._build_chain(retriever)
+        started = time.perf_counter()
+        first_token = True
+        for chunk in retrieval_chain.stream({"input": query, "context": context}, config=self.run_config):
+            token = chunk.get("answer")
+            if token:
+                if first_token:
+                    self._record_ttft(started)
+                    first_token = False
+                yield token
+        # Not a span: a generator cannot hold the caller's trace context across yields
+        METRICS.observe("stage_duration_seconds", time.perf_counter() - started, stage="llm_stream")
+
+    async def astream_response(self, retriever, context, query, system_message=None):
+        """
+        Async variant of stream_response.
+        """
+        retrieval_chain = self._build_chain(retriever)
+        started = time.perf_counter()
+        first_token = True
+        async for chunk in retrieval_chain.astream({"input": query, "context": context}, config=self.run_config):
+            token = chunk.get("answer")
+            if token:
+                if first_token:
+                    self._record_ttft(started)
+                    first_token = False
+                yield token
+        METRICS.observe("stage_duration_seconds", time.perf_counter() - started, stage="llm_stream")
+
+    def ttft_stats(self):
+        """
+        Returns last/p50/p95 time-to-first-token in milliseconds.
+        """
+        if not self.ttft_seconds:
+            return {"count": 0}
+        ordered = sorted(self.ttft_seconds)
+        return {
+            "count": len(ordered),
+            "last_ms": round(self.ttft_seconds[-1] * 1000, 1),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        }
+
 
 
 
@@ -1,9 +1,18 @@
+import os
 import streamlit as st
 from pathlib import Path
 from embeddings.extractor_faiss_manager import EmbedderPipeline
 from llm.llm_client import GroqLLMClient
 from retrieval.sql_retriever import LangChainSQLManager
 from langchain_ollama import OllamaEmbeddings
+from orchestration.parallel_retrieval import ParallelRetriever
+from orchestration.answer_cache import AnswerCache
+from orchestration.context_packer import ContextPacker
+from orchestration.query_router import QueryRouter, ROUTE_DOCS, ROUTE_SQL
+from retrieval.neo4j_retriever import GraphRetriever
+from retrieval.pricing_retriever import PricingRetriever
+from retrieval.pricing_tables import PRICING_DB_PATH
+from monitoring.metrics import METRICS, TRACER, span, start_metrics_server
 
 
 PDF_Traning_DATA = Path("./WithoutBranding").absolute()
@@ -30,19 +39,46 @@ def load_resources():
     embedder = EmbedderPipeline(
         embedding_model=embedding_model,
         dimension=1024,
-        initialize_new=False
+        initialize_new=False,
+        pricing_db=PRICING_DB_PATH,
     )
     
     
     llm = GroqLLMClient(groq_api_key=api_key)
-    agent = db_manager.get_sql_agent(llm.llm, verbose=True)
-    return embedder, agent, llm
+    agent = db_manager.get_cached_sql_agent(llm.llm, verbose=True)
+    retriever = ParallelRetriever(
+        faiss_search=lambda query, k: embedder.hybrid_search(query=query, k=k),
+        sql_query=agent.invoke,
+        faiss_timeout=10.0,
+        sql_timeout=45.0,
+        total_budget=50.0,
+    )
+    faiss_manager = embedder.faiss_manager
+    answer_cache = AnswerCache(
+        embed_fn=faiss_manager.embed_query,
+        similarity_threshold=0.92,
+        version_fn=lambda: (faiss_manager.data_version(), db_manager.data_version()),
+    )
+    packer = ContextPacker(max_tokens=3000)
+    router = QueryRouter.from_sql_manager(db_manager, confidence_threshold=0.75)
+    graph = GraphRetriever(db_manager)
+    pricing = PricingRetriever(db_manager)
+    # Prometheus text at http://localhost:9100/metrics, recent request traces at /traces
+    METRICS.register_collector("answer_cache", answer_cache.stats)
+    METRICS.register_collector("query_embedding_cache", faiss_manager.query_cache_stats)
+    METRICS.register_collector("sql_plan_cache", agent.plan_cache.stats)
+    METRICS.register_collector("route", router.stats)
+    METRICS.register_collector("relationship_graph", graph.stats)
+    METRICS.register_collector("vector_index", faiss_manager.memory_stats)
+    # Loopback only unless METRICS_HOST says otherwise (the container sets 0.0.0.0 for scraping)
+    start_metrics_server(port=9100, host=os.environ.get("METRICS_HOST", "127.0.0.1"))
+    return embedder, agent, llm, retriever, answer_cache, packer, router, graph, pricing
 
 
 
 
 
-embedder, agent, llm = load_resources()
+embedder, agent, llm, retriever, answer_cache, packer, router, graph, pricing = load_resources()
     
 
 
@@ -79,22 +115,53 @@ if st.button("Ask") or (user_query and st.session_state.get("last_query") != use
     if user_query.lower() in {"exit", "quit"}:
         st.session_state["messages"].append({"role": "assistant", "content": "Goodbye!"})
     else:
-        with st.spinner("Thinking..."):
-            faiss_docs = embedder.search(query=user_query, k=5)
-            faiss_context = "\n".join([doc.page_content for doc in faiss_docs])
-
-            try:
-                sql_answer = agent.invoke(user_query)
-            except Exception as e:
-                sql_answer = f"(SQL Agent Error: {e})"
-
-            combined_context = f"SQL Agent Answer: {sql_answer}\n\nFAISS Context:\n{faiss_context}"
-
-            response = llm.get_response(
-                retriever=embedder.faiss_manager.as_retriever(),
+        response = answer_cache.get(user_query)
+        if response is None:
+            with st.spinner("Thinking..."):
+                # The question itself stays off the trace: /traces is readable by anyone who can reach it
+                with span("chat_retrieval"):
+                    # Doc-only questions skip the SQL agent (and SQL-only ones the FAISS search)
+                    route = router.route(user_query)["route"]
+                    TRACER.annotate(route=route)
+                    # Prices and rates are looked up in the pricing tables
+                    price_result = pricing.retrieve(user_query) if route != ROUTE_DOCS else None
+                    # Multi-hop entity questions are answered from the foreign-key graph
+                    graph_result = (
+                        graph.retrieve(user_query)
+                        if route != ROUTE_DOCS and not price_result["covered"]
+                        else None
+                    )
+                    # FAISS search and the SQL agent run concurrently
+                    retrieved = retriever.retrieve(
+                        user_query,
+                        k=5,
+                        search_docs=route != ROUTE_SQL,
+                        query_sql=route != ROUTE_DOCS
+                        and not any(result and result["covered"] for result in (price_result, graph_result)),
+                    )
+                    # Dedup, rank and trim the SQL answer + FAISS passages to the token budget
+                    with span("context_packing"):
+                        combined_context, packing = packer.pack(
+                            retrieved["sql_answer"],
+                            retrieved["faiss_docs"],
+                            graph_facts=graph_result["facts"] if graph_result else None,
+                            price_facts=price_result["facts"] if price_result else None,
+                        )
+                    METRICS.inc("context_tokens_total", packing["used_tokens"])
+
+            # Render the answer token by token; the chat history below shows the final text
+            placeholder = st.empty()
+            response = ""
+            for token in llm.stream_response(
+                retriever=None,
                 context=combined_context,
                 query=user_query
-            )
+            ):
+                response += token
+                placeholder.markdown(f"**Assistant:** {response}")
+            placeholder.empty()
+            if not retrieved["degraded"]:
+                answer_cache.put(user_query, response)
         st.session_state["messages"].append({"role": "user", "content": user_query})
         st.session_state["messages"].append({"role": "assistant", "content": response})
 
@@ -0,0 +1,76 @@
+# callbacks.py
+
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from monitoring.metrics import METRICS
+
+
+def _token_usage(response):
+    """
+    Prompt/completion token counts from an LLMResult, wherever the provider put them.
+    """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += metadata.get("input_tokens", 0)
+            completion_tokens += metadata.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    def __init__(self, component, registry=METRICS):
+        """
+        Records LLM call latency, token usage and tool step latency for one component
+        ("sql_agent", "answer", ...). Pass it in a chain's callbacks.
+        """
+        self.component = component
+        self.registry = registry
+        self._started = {}
+        registry.describe("llm_call_duration_seconds", "Latency of individual LLM calls")
+        registry.describe("llm_tokens_total", "Tokens sent to and generated by the LLM")
+        registry.describe("agent_step_duration_seconds", "Latency of individual agent tool calls")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = ("llm", None, time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = ("llm", None, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.registry.observe("llm_call_duration_seconds", time.perf_counter() - started[2], component=self.component)
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens:
+            self.registry.inc("llm_tokens_total", prompt_tokens, component=self.component, kind="prompt")
+        if completion_tokens:
+            self.registry.inc("llm_tokens_total", completion_tokens, component=self.component, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+        self.registry.inc("llm_errors_total", component=self.component, error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        tool = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._started[run_id] = ("tool", tool, time.perf_counter())
+
+    def _end_tool(self, run_id, status):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            self.registry.observe(
+                "agent_step_duration_seconds",
+                time.perf_counter() - started[2],
+                component=self.component,
+                tool=started[1],
+                status=status,
+            )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, "error")
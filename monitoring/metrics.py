@@ -0,0 +1,289 @@
+# metrics.py
+
+import bisect
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Latency buckets in seconds: sub-millisecond cache hits up to minute-long agent runs
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=2048):
+        """
+        Cumulative Prometheus buckets plus a window of recent samples for exact p50/p99.
+        """
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Process-wide counters, gauges and latency histograms, keyed by name and labels.
+        """
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def register_collector(self, prefix, stats_fn):
+        """
+        stats_fn: Callable returning a flat dict of numbers (e.g. a cache's stats()),
+            exported as <prefix>_<key> gauges each time metrics are rendered
+        """
+        self._collectors.append((prefix, stats_fn))
+
+    def _collect(self):
+        for prefix, stats_fn in self._collectors:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.set_gauge(f"{prefix}_{key}", value)
+
+    def render_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        self._collect()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, key), value in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), value in sorted(self._gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{name}{_format_labels(key)} {value}")
+            for (name, key), histogram in sorted(self._histograms.items()):
+                header(name, "histogram")
+                cumulative = 0
+                bounds = [f"{bound:g}" for bound in histogram.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        JSON-friendly view: counters, gauges, and count/mean/p50/p99 per histogram.
+        """
+        self._collect()
+        with self._lock:
+            return {
+                "counters": {f"{name}{_format_labels(key)}": v for (name, key), v in self._counters.items()},
+                "gauges": {f"{name}{_format_labels(key)}": v for (name, key), v in self._gauges.items()},
+                "histograms": {
+                    f"{name}{_format_labels(key)}": {
+                        "count": h.count,
+                        "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else None,
+                        "p50_ms": round(h.quantile(0.5) * 1000, 2) if h.count else None,
+                        "p99_ms": round(h.quantile(0.99) * 1000, 2) if h.count else None,
+                    }
+                    for (name, key), h in self._histograms.items()
+                },
+            }
+
+
+class Tracer:
+    def __init__(self, registry, max_traces=200, trace_file=None):
+        """
+        Nested timing spans per request. Every span also feeds the
+        stage_duration_seconds{stage=...} histogram.
+        max_traces: Finished request traces kept in memory for dump()/the /traces endpoint
+        trace_file: Optional JSON-lines file that every finished trace is appended to
+        """
+        self.registry = registry
+        self.traces = deque(maxlen=max_traces)
+        self.trace_file = Path(trace_file) if trace_file else None
+        self._current = contextvars.ContextVar("current_span", default=None)
+        self._file_lock = threading.Lock()
+        registry.describe("stage_duration_seconds", "Latency of each pipeline stage")
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        parent = self._current.get()
+        record = {"stage": stage, "start": time.time(), "attributes": attributes, "children": []}
+        token = self._current.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._current.reset(token)
+            record["duration_ms"] = round(elapsed * 1000, 3)
+            self.registry.observe("stage_duration_seconds", elapsed, stage=stage)
+            if parent is not None:
+                parent["children"].append(record)
+            else:
+                self._finish(record)
+
+    def annotate(self, **attributes):
+        """
+        Adds attributes to the innermost open span, if any.
+        """
+        record = self._current.get()
+        if record is not None:
+            record["attributes"].update(attributes)
+
+    def traced(self, stage):
+        """
+        Decorator form of span().
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, record):
+        self.traces.append(record)
+        if self.trace_file is not None:
+            with self._file_lock, open(self.trace_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def dump(self, path):
+        """
+        Writes the in-memory traces to path as a JSON array.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(list(self.traces), f, indent=2, default=str)
+
+
+METRICS = MetricsRegistry()
+TRACER = Tracer(METRICS)
+span = TRACER.span
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = METRICS
+    tracer = TRACER
+
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            body = self.registry.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/traces"):
+            body = json.dumps(list(self.tracer.traces), default=str).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/stats"):
+            body = json.dumps(self.registry.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=9100, host="127.0.0.1", registry=METRICS, tracer=TRACER):
+    """
+    Serves /metrics (Prometheus text), /stats (JSON percentiles) and /traces (recent
+    request traces) from a daemon thread. Returns the server, or None if the port is taken.
+    host: Interface to bind; the endpoints have no auth, so pass "0.0.0.0" only behind a
+        firewall or a scraper-only network
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry, "tracer": tracer})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     start_metrics_server(port=9100)
+#     with span("query_combined", route="docs"):
+#         with span("faiss_search"):
+#             time.sleep(0.01)
+#     print(METRICS.render_prometheus())
+#     TRACER.dump("traces.json")
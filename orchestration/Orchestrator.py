@@ -1,29 +1,117 @@
 # orchestration.py
 
-from embeddings.extractor_faiss_manager import EmbedderPipeline
+from pathlib import Path
+import asyncio
+from embeddings.extractor_faiss_manager import FAISS_DOCSTORE_PATH, FAISS_INDEX_PATH, EmbedderPipeline
 from retrieval.sql_retriever import LangChainSQLManager
-from retrieval.faiss_retriever import LangChainFAISSManager
+from retrieval.faiss_retriever import LOAD_MEMORY, LangChainFAISSManager
+from retrieval.neo4j_retriever import BACKEND_MEMORY, GraphRetriever
+from retrieval.pricing_retriever import PricingRetriever
+from retrieval.quantized_index import STORAGE_FLOAT32
+from retrieval.sharded_faiss import WORKERS_THREAD
 from llm.llm_client import GroqLLMClient
+from llm.async_llm_client import AsyncGroqLLMClient
+from orchestration.parallel_retrieval import ParallelRetriever
+from orchestration.answer_cache import AnswerCache
+from orchestration.context_packer import ContextPacker
+from orchestration.query_router import QueryRouter, ROUTE_DOCS, ROUTE_SQL
+from monitoring.metrics import METRICS, TRACER, span, start_metrics_server
 
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 
 class Orchestrator:
-    def __init__(self, embedding_model, groq_api_key, sql_db_path=None, faiss_dim=1024):
-        # Embedding/RAG pipeline
+    def __init__(
+        self,
+        embedding_model,
+        groq_api_key,
+        sql_db_path=None,
+        faiss_dim=1024,
+        faiss_timeout=10.0,
+        sql_timeout=45.0,
+        total_budget=50.0,
+        answer_cache_threshold=0.92,
+        answer_cache_size=512,
+        answer_cache_ttl=3600,
+        context_max_tokens=3000,
+        route_confidence=0.75,
+        metrics_port=None,
+        trace_file=None,
+        faiss_file=FAISS_INDEX_PATH,
+        docstore_file=FAISS_DOCSTORE_PATH,
+        load_mode=LOAD_MEMORY,
+        graph_backend=BACKEND_MEMORY,
+        neo4j_uri=None,
+        neo4j_user="neo4j",
+        neo4j_password=None,
+        vector_storage=STORAGE_FLOAT32,
+        faiss_shards=1,
+        shard_workers=WORKERS_THREAD,
+        llm_max_in_flight=8,
+        max_concurrent=4,
+    ):
+        # Embedding/RAG pipeline ("mmap" shares one read-only index between server workers)
         self.embedder = EmbedderPipeline(
             embedding_model=embedding_model,
-            faiss_file="faiss_index.bin",
-            docstore_file="faiss_docstore.pkl",
-            dimension=faiss_dim
+            faiss_file=faiss_file,
+            docstore_file=docstore_file,
+            dimension=faiss_dim,
+            load_mode=load_mode,
+            vector_storage=vector_storage,
+            shards=faiss_shards,
+            shard_workers=shard_workers,
         )
         # SQL manager and agent
         self.sql_manager = LangChainSQLManager(db_type="USE_LOCALDB") # , sqlite_file=sql_db_path
         self.llm_client = GroqLLMClient(groq_api_key=groq_api_key)
-        self.sql_agent = self.sql_manager.get_sql_agent(self.llm_client.llm, verbose=True)
+        # Answers for the async paths: capped concurrent Groq calls, 429 retries, identical questions shared
+        self.async_llm_client = AsyncGroqLLMClient(groq_api_key=groq_api_key, max_in_flight=llm_max_in_flight)
+        self.sql_agent = self.sql_manager.get_cached_sql_agent(self.llm_client.llm, verbose=True)
         # FAISS retriever
         self.faiss_retriever = self.embedder.faiss_manager.as_retriever()
+        # FAISS and SQL agent branches run concurrently under per-branch timeouts
+        self.parallel_retriever = ParallelRetriever(
+            faiss_search=lambda query, k: self.embedder.hybrid_search(query, k=k),
+            sql_query=self.query_sql_agent,
+            faiss_timeout=faiss_timeout,
+            sql_timeout=sql_timeout,
+            total_budget=total_budget,
+            max_concurrent=max_concurrent,
+        )
+        # Foreign-key graph: multi-hop entity questions answered without SQL agent turns
+        self.graph_retriever = GraphRetriever(
+            self.sql_manager,
+            backend=graph_backend,
+            neo4j_uri=neo4j_uri,
+            neo4j_user=neo4j_user,
+            neo4j_password=neo4j_password,
+        )
+        # Price lists / rate cards parsed into indexed tables: pricing questions are one lookup
+        self.pricing_retriever = PricingRetriever(self.sql_manager)
+        # Sends each question to the documents, the SQL agent, or both
+        self.router = QueryRouter.from_sql_manager(self.sql_manager, confidence_threshold=route_confidence)
+        # Deduplicates, ranks and trims retrieved context to a token budget
+        self.context_packer = ContextPacker(max_tokens=context_max_tokens)
+        # Exact + near-duplicate answer cache, dropped whenever FAISS or the SQL DB changes
+        faiss_manager = self.embedder.faiss_manager
+        self.answer_cache = AnswerCache(
+            embed_fn=faiss_manager.embed_query,
+            similarity_threshold=answer_cache_threshold,
+            max_entries=answer_cache_size,
+            ttl_seconds=answer_cache_ttl,
+            version_fn=lambda: (faiss_manager.data_version(), self.sql_manager.data_version()),
+        )
+        # Cache hit rates and routing counts, exported with the stage latencies
+        METRICS.register_collector("answer_cache", self.answer_cache.stats)
+        METRICS.register_collector("query_embedding_cache", faiss_manager.query_cache_stats)
+        METRICS.register_collector("sql_plan_cache", self.sql_agent.plan_cache.stats)
+        METRICS.register_collector("route", self.router.stats)
+        METRICS.register_collector("relationship_graph", self.graph_retriever.stats)
+        METRICS.register_collector("vector_index", faiss_manager.memory_stats)
+        if trace_file:
+            TRACER.trace_file = Path(trace_file)
+        self.metrics_server = start_metrics_server(port=metrics_port) if metrics_port else None
 
     def query_sql_agent(self, user_query):
         """
@@ -41,42 +129,133 @@ class Orchestrator:
         """
         Combines FAISS and SQL agent results, stuffs them into a prompt, and gets LLM response.
         """
-        # 1. Retrieve from FAISS
-        faiss_docs = self.query_faiss(user_query, k=faiss_k)
-        # 2. Retrieve from SQL agent
-        try:
-            sql_answer = self.query_sql_agent(user_query)
-        except Exception as e:
-            sql_answer = f"(SQL Agent Error: {e})"
-
-        
-
-        # 4. Combine FAISS docs (as context)
-        faiss_context = "\n".join([doc.page_content for doc in faiss_docs])
-        # 5. Combine SQL answer
-        combined_context = f"SQL Agent Answer: {sql_answer}\n\nFAISS Context:\n{faiss_context}"
-        
-        # 3. Prepare prompt
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are assistant of the inventurs company. Use the provided context to answer the question more specifically to inventres."),
-            ("user", "{user_query}"),
-            ("context & info", "{combined_context}")
-        ])
-
-        # # 6. Create combine_documents_chain
-        # combine_docs_chain = create_stuff_documents_chain(self.llm_client.llm, prompt)
-
-        # 7. Run the chain
-        # result = combine_docs_chain.invoke({"input": user_query, "context": combined_context})
-        result = GroqLLMClient.get_response(
-            query=combined_context,  
-            prompt=prompt,
-            retriever=self.faiss_retriever, 
-            system_message="You are assistant of the inventurs company. Use the provided context to answer the question more specifically to inventres."
+        with span("query_combined"):
+            return self._query_combined(user_query, faiss_k)
+
+    async def aquery_combined(self, user_query, faiss_k=5):
+        """
+        Async query_combined: retrieval runs in a worker thread, the answer comes from the async Groq client.
+        """
+        with span("query_combined"):
+            cached = await asyncio.to_thread(self.answer_cache.get, user_query)
+            if cached is not None:
+                TRACER.annotate(answer_cache="hit")
+                return cached
+            combined_context, degraded = await asyncio.to_thread(self.retrieve_context, user_query, faiss_k)
+            answer = await self.async_llm_client.aget_response(
+                retriever=None,
+                context=combined_context,
+                query=user_query,
+            )
+        if not degraded:
+            self.answer_cache.put(user_query, answer)
+        return answer
+
+    def retrieve_context(self, user_query, faiss_k=5):
+        """
+        Routes the query, retrieves from FAISS and/or the SQL agent and packs the context.
+        Returns (combined_context, degraded branches).
+        """
+        # 1 + 2. Retrieve from FAISS and/or the SQL agent concurrently, as routed
+        with span("route"):
+            route = self.router.route(user_query)["route"]
+        TRACER.annotate(route=route)
+        graph = None
+        pricing = None
+        if route != ROUTE_DOCS:
+            with span("pricing_lookup"):
+                pricing = self.pricing_retriever.retrieve(user_query)
+            if pricing["covered"]:
+                TRACER.annotate(sql_skipped="pricing")
+            else:
+                with span("graph_retrieval"):
+                    graph = self.graph_retriever.retrieve(user_query)
+                if graph["covered"]:
+                    TRACER.annotate(sql_skipped="graph")
+        covered = any(result and result["covered"] for result in (pricing, graph))
+        with span("retrieve"):
+            retrieved = self.parallel_retriever.retrieve(
+                user_query,
+                k=faiss_k,
+                search_docs=route != ROUTE_SQL,
+                # Pricing lookups and relationship questions the graph facts fully cover skip the agent
+                query_sql=route != ROUTE_DOCS and not covered,
+            )
+        sql_answer = retrieved["sql_answer"]
+        if retrieved["degraded"]:
+            TRACER.annotate(degraded=",".join(retrieved["degraded"]))
+            for branch in retrieved["degraded"]:
+                METRICS.inc("retrieval_degraded_total", branch=branch)
+
+        # 3 + 4. Combine SQL answer and FAISS passages within the token budget
+        with span("context_packing"):
+            combined_context, packing = self.context_packer.pack(
+                sql_answer,
+                retrieved["faiss_docs"],
+                graph_facts=graph["facts"] if graph else None,
+                price_facts=pricing["facts"] if pricing else None,
+            )
+        METRICS.inc("context_tokens_total", packing["used_tokens"])
+        if packing["dropped_tokens"]:
+            METRICS.inc("context_dropped_tokens_total", packing["dropped_tokens"])
+            TRACER.annotate(dropped_tokens=packing["dropped_tokens"], dropped_passages=packing["dropped_passages"])
+        return combined_context, retrieved["degraded"]
+
+    def _query_combined(self, user_query, faiss_k):
+        # 0. Serve repeated and near-duplicate questions from the answer cache
+        with span("answer_cache_lookup"):
+            cached = self.answer_cache.get(user_query)
+        if cached is not None:
+            TRACER.annotate(answer_cache="hit")
+            return cached
+
+        combined_context, degraded = self.retrieve_context(user_query, faiss_k)
+
+        # 5. Run the chain on the packed context (no second retrieval pass)
+        result = self.llm_client.get_response(
+            retriever=None,
+            context=combined_context,
+            query=user_query,
         )
 
-        # 8. Return LLM answer
-        return result["answer"] if "answer" in result else result
+        # 6. Return LLM answer (answers built on degraded context are not cached)
+        answer = result["answer"] if isinstance(result, dict) and "answer" in result else result
+        if not degraded:
+            self.answer_cache.put(user_query, answer)
+        return answer
+
+    async def astream_combined(self, user_query, faiss_k=5):
+        """
+        Async query_combined that yields answer tokens as they are generated.
+        Retrieval (blocking) runs in a worker thread; cached answers are yielded whole.
+        """
+        cached = await asyncio.to_thread(self.answer_cache.get, user_query)
+        if cached is not None:
+            yield cached
+            return
+        combined_context, degraded = await asyncio.to_thread(self.retrieve_context, user_query, faiss_k)
+        answer = ""
+        async for token in self.async_llm_client.astream_response(
+            retriever=None,
+            context=combined_context,
+            query=user_query,
+        ):
+            answer += token
+            yield token
+        if not degraded:
+            self.answer_cache.put(user_query, answer)
+
+    async def aclose(self):
+        await self.async_llm_client.aclose()
+
+    def refresh(self):
+        """
+        Reloads the FAISS index if the ingestion process persisted a new one.
+        """
+        if self.embedder.refresh():
+            self.faiss_retriever = self.embedder.faiss_manager.as_retriever()
+            return True
+        return False
 
 # Example usage:
 # if __name__ == "__main__":
@@ -86,7 +265,8 @@ class Orchestrator:
 #         embedding_model=embedding_model,
 #         groq_api_key="YOUR_GROQ_API_KEY",
 #         sql_db_path="inventers.db",
-#         faiss_dim=1024
+#         faiss_dim=1024,
+#         metrics_port=9100,  # Prometheus scrape target: http://localhost:9100/metrics
 #     )
 #     user_query = "List all IT department employees and summarize their projects."
 #     answer = orchestrator.query_combined(user_query)
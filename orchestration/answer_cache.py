@@ -0,0 +1,159 @@
+# answer_cache.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from embeddings.chunk_metadata import detect_currency
+from retrieval.embedding_cache import normalize_query
+from retrieval.pricing_tables import SENIORITY_LEVELS
+
+# Words that change the answer while barely moving the embedding ("senior" vs "junior")
+QUALIFIER_WORDS = {**SENIORITY_LEVELS, "lead": "lead", "principal": "principal", "head": "head"}
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD_RE = re.compile(r"[A-Za-z][\w.&-]*")
+
+
+def query_signature(query):
+    """
+    The parts of a question a near-duplicate must share exactly: detected currency,
+    numbers, seniority/qualifier words and named entities (capitalised words after the
+    first), e.g. "hourly rate of a senior developer in AED" vs "... in USD" differ.
+    """
+    words = _WORD_RE.findall(query)
+    qualifiers = frozenset(QUALIFIER_WORDS[w.lower()] for w in words if w.lower() in QUALIFIER_WORDS)
+    entities = frozenset(w.lower() for w in words[1:] if w[0].isupper() and w.lower() not in QUALIFIER_WORDS)
+    return (detect_currency(query), frozenset(_NUMBER_RE.findall(query)), qualifiers, entities)
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        embed_fn,
+        similarity_threshold=0.92,
+        max_entries=512,
+        ttl_seconds=3600,
+        version_fn=None,
+    ):
+        """
+        Two-tier cache of final answers for the RAG + SQL pipeline.
+        Exact tier: normalized query text, no embedding needed.
+        Near-duplicate tier: cosine similarity of query embeddings >= similarity_threshold,
+        and the same query_signature (currency, numbers, seniority and entity words).
+        embed_fn: Callable query -> embedding (use the FAISS manager's cached _embed so
+            a miss costs no extra embedding call)
+        max_entries / ttl_seconds: LRU size and time-to-live of cached answers
+        version_fn: Callable returning a token that changes when the FAISS index or the
+            SQL database changes; the cache is dropped whenever the token moves
+        """
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_fn = version_fn
+        self._entries = OrderedDict()  # normalized query -> (stored_at, unit vector, answer, signature)
+        self._matrix = None
+        self._matrix_keys = []
+        self._version = version_fn() if version_fn else None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+            self.invalidations += 1
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds is not None and time.monotonic() - stored_at >= self.ttl_seconds
+
+    def _unit(self, vector):
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, unit_vector, signature):
+        """
+        Most similar cached query above the threshold whose signature matches, or None.
+        """
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = (
+                np.vstack([self._entries[key][1] for key in self._matrix_keys]) if self._matrix_keys else None
+            )
+        if self._matrix is None:
+            return None
+        scores = self._matrix @ unit_vector
+        for best in np.argsort(-scores):
+            if scores[best] < self.similarity_threshold:
+                break
+            key = self._matrix_keys[best]
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == signature:
+                return key
+        return None
+
+    def get(self, query):
+        """
+        Returns the cached answer for query (or a near-duplicate of it), else None.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[2]
+            if not self._entries:
+                self.misses += 1
+                return None
+        unit_vector = self._unit(self.embed_fn(query))
+        signature = query_signature(query)
+        with self._lock:
+            self._check_version()
+            nearest = self._nearest(unit_vector, signature)
+            if nearest is not None:
+                stored_at, _, answer, _ = self._entries[nearest]
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(nearest)
+                    self.semantic_hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def put(self, query, answer):
+        key = normalize_query(query)
+        unit_vector = self._unit(self.embed_fn(query))
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (time.monotonic(), unit_vector, answer, query_signature(query))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,144 @@
+# context_packer.py
+
+import hashlib
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to an approximate tokenizer
+    tiktoken = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class Tokenizer:
+    def __init__(self, encoding_name="cl100k_base"):
+        """
+        Uses tiktoken when installed; otherwise approximates tokens as words and punctuation.
+        get_encoding downloads the BPE file on first use (unless TIKTOKEN_CACHE_DIR holds it),
+        so offline containers fall back to the approximation instead of failing to start.
+        """
+        self.encoding = None
+        if tiktoken is None:
+            print("tiktoken is not installed; context token counts are approximate.")
+            return
+        try:
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"tiktoken encoding {encoding_name!r} unavailable ({e}); context token counts are approximate.")
+
+    def count(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return len(_WORD_RE.findall(text))
+
+    def truncate(self, text, max_tokens):
+        """
+        Returns the longest prefix of text that fits in max_tokens.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text)
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        matches = list(_WORD_RE.finditer(text))
+        return text if len(matches) <= max_tokens else text[: matches[max_tokens - 1].end()]
+
+
+def _shingles(text, size=5):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextPacker:
+    def __init__(self, max_tokens=3000, tokenizer=None, overlap_threshold=0.8, min_fragment_tokens=64):
+        """
+        Builds the LLM context from the SQL answer and retrieved passages under a token budget.
+        max_tokens: Token budget for the whole context
+        overlap_threshold: A passage whose word 5-grams are this much contained in already
+            kept passages is dropped as a duplicate (overlapping chunks, repeated pages)
+        min_fragment_tokens: The last passage is truncated to fit only if at least this many
+            tokens of budget remain
+        """
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer or Tokenizer()
+        self.overlap_threshold = overlap_threshold
+        self.min_fragment_tokens = min_fragment_tokens
+
+    def _ranked(self, faiss_results, lower_is_better):
+        """
+        Accepts Documents or (Document, score) pairs; returns (text, score) best-first.
+        Unscored documents keep their retrieval order.
+        """
+        passages = []
+        for position, item in enumerate(faiss_results):
+            doc, score = item if isinstance(item, tuple) else (item, None)
+            passages.append((doc.page_content, score, position))
+        if all(score is not None for _, score, _ in passages):
+            passages.sort(key=lambda p: p[1] if lower_is_better else -p[1])
+        return [(text, score) for text, score, _ in passages]
+
+    def pack(self, sql_answer, faiss_results, lower_is_better=True, graph_facts=None, price_facts=None):
+        """
+        Returns (context, report). The SQL answer is always kept first (and left out when it
+        is None, i.e. the SQL agent was not run); passages are deduplicated, ranked by score
+        and added until the token budget is spent.
+        lower_is_better: True for FAISS L2 distances, False for similarity scores
+        graph_facts: Optional relationship facts, kept right after the SQL answer
+        price_facts: Optional rows looked up in the pricing tables, kept before the graph facts
+        """
+        header = "FAISS Context:\n"
+        if graph_facts:
+            header = "Relationship Facts:\n" + "\n".join(graph_facts) + "\n\n" + header
+        if price_facts:
+            header = "Price Table:\n" + "\n".join(price_facts) + "\n\n" + header
+        if sql_answer is not None:
+            header = f"SQL Agent Answer: {sql_answer}\n\n" + header
+        header_tokens = self.tokenizer.count(header)
+        if header_tokens > self.max_tokens:
+            header = self.tokenizer.truncate(header, self.max_tokens)
+            header_tokens = self.max_tokens
+        budget = self.max_tokens - header_tokens
+
+        kept = []
+        kept_shingles = set()
+        seen_hashes = set()
+        report = {
+            "budget": self.max_tokens,
+            "used_tokens": header_tokens,
+            "kept_passages": 0,
+            "duplicate_passages": 0,
+            "dropped_passages": 0,
+            "dropped_tokens": 0,
+            "truncated": False,
+        }
+        for text, score in self._ranked(faiss_results, lower_is_better):
+            digest = hashlib.sha1(" ".join(text.split()).lower().encode("utf-8")).hexdigest()
+            shingles = _shingles(text)
+            overlap = len(shingles & kept_shingles) / len(shingles) if shingles else 1.0
+            if digest in seen_hashes or overlap >= self.overlap_threshold:
+                report["duplicate_passages"] += 1
+                continue
+            tokens = self.tokenizer.count(text)
+            separator_tokens = 1 if kept else 0
+            if tokens + separator_tokens <= budget:
+                kept.append(text)
+                budget -= tokens + separator_tokens
+            elif budget - separator_tokens >= self.min_fragment_tokens:
+                fragment = self.tokenizer.truncate(text, budget - separator_tokens)
+                kept.append(fragment)
+                report["dropped_tokens"] += tokens - self.tokenizer.count(fragment)
+                report["truncated"] = True
+                budget = 0
+            else:
+                report["dropped_passages"] += 1
+                report["dropped_tokens"] += tokens
+                continue
+            seen_hashes.add(digest)
+            kept_shingles |= shingles
+
+        report["kept_passages"] = len(kept)
+        report["used_tokens"] = self.max_tokens - budget
+        return header + "\n".join(kept), report
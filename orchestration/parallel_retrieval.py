@@ -0,0 +1,119 @@
+# parallel_retrieval.py
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+def sql_output(result):
+    """
+    Normalizes an agent result (dict from .invoke or str from .run) to its answer text.
+    """
+    if isinstance(result, dict) and "output" in result:
+        return result["output"]
+    return result
+
+
+class ParallelRetriever:
+    def __init__(
+        self,
+        faiss_search,
+        sql_query,
+        faiss_timeout=10.0,
+        sql_timeout=45.0,
+        total_budget=50.0,
+        max_concurrent=4,
+    ):
+        """
+        faiss_search: Callable (query, k) -> list of Documents or (Document, score) pairs
+        sql_query: Callable (query) -> SQL agent answer
+        faiss_timeout / sql_timeout: Per-branch timeouts in seconds
+        total_budget: Overall latency budget in seconds for both branches together
+        max_concurrent: Requests served at once (the admission limit); each branch gets a
+            pool of this size, so slow SQL agent calls never hold the threads FAISS needs
+
+        Both branches start at the same time, so latency is close to the slower one.
+        A branch's timeout counts from when it starts running, not from when it was queued;
+        total_budget counts from the call. A branch that misses its deadline is abandoned
+        (its thread finishes in the background) and the answer is built from whatever
+        arrived in time.
+        """
+        self.faiss_search = faiss_search
+        self.sql_query = sql_query
+        self.faiss_timeout = faiss_timeout
+        self.sql_timeout = sql_timeout
+        self.total_budget = total_budget
+        self.faiss_executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="retrieval-faiss")
+        self.sql_executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="retrieval-sql")
+
+    @staticmethod
+    def _submit(executor, fn, *args):
+        """
+        Submits fn in the caller's context; the returned branch records when it starts running.
+        """
+        branch = {"running": threading.Event(), "started": None}
+
+        def run():
+            branch["started"] = time.perf_counter()
+            branch["running"].set()
+            return fn(*args)
+
+        # Branches run in the caller's context so their trace spans nest under its request
+        branch["future"] = executor.submit(contextvars.copy_context().run, run)
+        return branch
+
+    def _collect(self, name, branch, started, timeout, fallback, result):
+        future = branch["future"]
+        budget_deadline = started + self.total_budget
+        try:
+            # Time spent queued behind other requests only counts against total_budget
+            if branch["running"].wait(max(budget_deadline - time.perf_counter(), 0)):
+                deadline = min(branch["started"] + timeout, budget_deadline)
+            else:
+                deadline = budget_deadline
+            value = future.result(timeout=max(deadline - time.perf_counter(), 0))
+            result["timings"][name] = round(time.perf_counter() - started, 3)
+            return value
+        except FutureTimeoutError:
+            future.cancel()
+            result["degraded"].append(name)
+            limit = min(timeout, self.total_budget) if branch["started"] is not None else self.total_budget
+            return fallback(f"timed out after {limit}s")
+        except Exception as e:
+            result["degraded"].append(name)
+            result["timings"][name] = round(time.perf_counter() - started, 3)
+            return fallback(e)
+
+    def retrieve(self, query, k=5, search_docs=True, query_sql=True):
+        """
+        Runs FAISS search and the SQL agent concurrently.
+        search_docs / query_sql: Skip a branch the query router ruled out
+        Returns a dict with faiss_docs, sql_answer, degraded (late/failed branches), skipped and timings.
+        """
+        started = time.perf_counter()
+        faiss_branch = self._submit(self.faiss_executor, self.faiss_search, query, k) if search_docs else None
+        sql_branch = self._submit(self.sql_executor, self.sql_query, query) if query_sql else None
+
+        result = {"faiss_docs": [], "sql_answer": None, "degraded": [], "skipped": [], "timings": {}}
+        if faiss_branch is not None:
+            result["faiss_docs"] = self._collect(
+                "faiss", faiss_branch, started, self.faiss_timeout,
+                lambda reason: [], result,
+            )
+        else:
+            result["skipped"].append("faiss")
+        if sql_branch is not None:
+            result["sql_answer"] = self._collect(
+                "sql", sql_branch, started, self.sql_timeout,
+                lambda reason: f"(SQL Agent Error: {reason})", result,
+            )
+            result["sql_answer"] = sql_output(result["sql_answer"])
+        else:
+            result["skipped"].append("sql")
+        result["timings"]["total"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def shutdown(self):
+        self.faiss_executor.shutdown(wait=False, cancel_futures=True)
+        self.sql_executor.shutdown(wait=False, cancel_futures=True)
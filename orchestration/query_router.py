@@ -0,0 +1,218 @@
+# query_router.py
+
+import math
+import re
+import time
+from collections import Counter, deque
+from sqlalchemy import inspect
+from monitoring.metrics import TRACER
+from retrieval.sql_plan_cache import QuestionTemplater
+
+ROUTE_DOCS = "docs"
+ROUTE_SQL = "sql"
+ROUTE_BOTH = "both"
+
+# Schema words too generic to say anything about the question
+_GENERIC_TERMS = frozenset({"id", "name", "date", "to", "hr"})
+# Phrasing typical of questions answered by querying the database
+SQL_INTENT = (
+    "how many", "count", "number of", "list", "which", "who", "whose", "average", "total",
+    "most", "least", "latest", "oldest", "assigned", "pending", "completed", "ongoing",
+    "working on", "reports to", "manages", "managed by", "scheduled",
+)
+# Phrasing typical of questions about the company's documents and website
+DOCS_INTENT = (
+    "service", "offer", "provide", "price", "pricing", "rate card", "cost", "about",
+    "company", "website", "technology", "technologies", "expertise", "portfolio",
+    "case study", "policy", "process", "explain", "describe", "why", "benefit", "contact you",
+)
+DOCS_EXAMPLES = (
+    "What services do you offer?",
+    "How much does a mobile app cost?",
+    "Tell me about your company.",
+    "Which technologies do you work with?",
+)
+SQL_EXAMPLES = (
+    "How many employees are in the IT department?",
+    "List the projects managed by each manager.",
+    "Which tasks are pending and who are they assigned to?",
+    "Show the interview results for candidates.",
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _words(text):
+    return [_stem(word) for word in _WORD_RE.findall(text.lower())]
+
+
+def _phrase_re(phrases):
+    return re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True)) + r")", re.IGNORECASE)
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _centroid(vectors):
+    return [sum(values) / len(vectors) for values in zip(*vectors)]
+
+
+class QueryRouter:
+    def __init__(
+        self,
+        table_terms,
+        column_terms,
+        templater=None,
+        embed_fn=None,
+        confidence_threshold=0.75,
+        centroid_weight=10.0,
+        mixed_evidence=1.5,
+        history_size=200,
+    ):
+        """
+        Decides per question whether to search the documents, run the SQL agent, or both.
+        table_terms / column_terms: Words from the database's table and column names
+        templater: Optional QuestionTemplater whose entity vocabulary (department names,
+            employee names, statuses, ...) counts as strong SQL evidence
+        embed_fn: Optional query embedder; adds similarity to docs/SQL example centroids
+        confidence_threshold: A single source is chosen only when its probability reaches
+            this value; anything less confident goes to both
+        centroid_weight: Weight of the (sql - docs) centroid similarity margin
+        mixed_evidence: When the losing side scores at least this much, route to both
+        """
+        self.table_terms = {_stem(term) for term in table_terms} - _GENERIC_TERMS
+        self.column_terms = {_stem(term) for term in column_terms} - _GENERIC_TERMS - self.table_terms
+        self.templater = templater
+        self.embed_fn = embed_fn
+        self.confidence_threshold = confidence_threshold
+        self.centroid_weight = centroid_weight
+        self.mixed_evidence = mixed_evidence
+        self.sql_intent_re = _phrase_re(SQL_INTENT)
+        self.docs_intent_re = _phrase_re(DOCS_INTENT)
+        self._centroids = None
+        self.decisions = deque(maxlen=history_size)
+        self.route_counts = Counter()
+        self.confidence_total = 0.0
+
+    @classmethod
+    def from_sql_manager(cls, sql_manager, **kwargs):
+        """
+        Builds the vocabulary from the tables and columns of the connected database.
+        """
+        inspector = inspect(sql_manager.db.engine)
+        table_terms, column_terms = set(), set()
+        for table in inspector.get_table_names():
+            table_terms.update(_WORD_RE.findall(table.lower()))
+            for column in inspector.get_columns(table):
+                column_terms.update(_WORD_RE.findall(column["name"].lower()))
+        templater = QuestionTemplater.from_sql_manager(sql_manager)
+        return cls(table_terms, column_terms, templater=templater, **kwargs)
+
+    def _centroid_margin(self, query):
+        if self.embed_fn is None:
+            return 0.0
+        if self._centroids is None:
+            self._centroids = (
+                _centroid([self.embed_fn(q) for q in SQL_EXAMPLES]),
+                _centroid([self.embed_fn(q) for q in DOCS_EXAMPLES]),
+            )
+        vector = self.embed_fn(query)
+        return _cosine(vector, self._centroids[0]) - _cosine(vector, self._centroids[1])
+
+    def score(self, query):
+        """
+        Returns (sql_score, docs_score, evidence) for a question.
+        """
+        evidence = []
+        sql_score = docs_score = 0.0
+        for word in dict.fromkeys(_words(query)):
+            if word in self.table_terms:
+                sql_score += 2.0
+                evidence.append(f"table:{word}")
+            elif word in self.column_terms:
+                sql_score += 1.0
+                evidence.append(f"column:{word}")
+        if self.templater is not None and self.templater.entity_re is not None:
+            for match in dict.fromkeys(m.group(1) for m in self.templater.entity_re.finditer(query)):
+                sql_score += 2.5
+                evidence.append(f"entity:{match}")
+        for match in dict.fromkeys(m.group(1).lower() for m in self.sql_intent_re.finditer(query)):
+            sql_score += 1.0
+            evidence.append(f"sql_intent:{match}")
+        for match in dict.fromkeys(m.group(1).lower() for m in self.docs_intent_re.finditer(query)):
+            docs_score += 1.5
+            evidence.append(f"docs_intent:{match}")
+        margin = self._centroid_margin(query)
+        if margin:
+            weighted = self.centroid_weight * margin
+            if weighted > 0:
+                sql_score += weighted
+            else:
+                docs_score -= weighted
+            evidence.append(f"centroid:{margin:+.3f}")
+        return sql_score, docs_score, evidence
+
+    def route(self, query):
+        """
+        Returns a decision dict: route ("docs", "sql" or "both"), confidence, scores and evidence.
+        """
+        started = time.perf_counter()
+        sql_score, docs_score, evidence = self.score(query)
+        p_sql = 1.0 / (1.0 + math.exp(-(sql_score - docs_score)))
+        # A question with real evidence for both sides ("which of your services did Sales use?")
+        # needs both sources, however lopsided the scores are
+        if p_sql >= self.confidence_threshold and docs_score < self.mixed_evidence:
+            route = ROUTE_SQL
+        elif 1.0 - p_sql >= self.confidence_threshold and sql_score < self.mixed_evidence:
+            route = ROUTE_DOCS
+        else:
+            route = ROUTE_BOTH
+        decision = {
+            "query": query,
+            "route": route,
+            "confidence": round(max(p_sql, 1.0 - p_sql), 3),
+            "sql_score": round(sql_score, 3),
+            "docs_score": round(docs_score, 3),
+            "evidence": evidence,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        self.decisions.append(decision)
+        self.route_counts[route] += 1
+        self.confidence_total += decision["confidence"]
+        # Recorded on the request's trace (not stdout, which would log every user question)
+        TRACER.annotate(
+            route_confidence=decision["confidence"],
+            route_sql_score=decision["sql_score"],
+            route_docs_score=decision["docs_score"],
+            route_evidence=",".join(evidence),
+        )
+        return decision
+
+    def stats(self):
+        """
+        Returns how many questions went to each route and their mean confidence.
+        """
+        routed = sum(self.route_counts.values())
+        stats = dict(self.route_counts)
+        stats["mean_confidence"] = round(self.confidence_total / routed, 4) if routed else 0.0
+        return stats
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     from retrieval.sql_retriever import LangChainSQLManager
+#     router = QueryRouter.from_sql_manager(LangChainSQLManager(db_type="USE_LOCALDB", sqlite_file="inventers.db"))
+#     router.route("What services do you offer?")                     # -> docs
+#     router.route("How many employees are in the IT department?")    # -> sql
+#     router.route("Which of your services did the Sales team use?")  # -> both
@@ -0,0 +1,154 @@
+# bm25_index.py
+
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from pathlib import Path
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or our "
+    "please show tell that the their this to us we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric terms; numbers keep their decimal/thousand separators.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        In-process inverted index scored with Okapi BM25.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> {doc_id: term frequency}
+        self.doc_terms = {}  # doc_id -> distinct terms, for removal
+        self.doc_len = {}
+        self.total_len = 0
+        self.generation = None  # Publish generation it was saved for, see LangChainFAISSManager.persist
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_len
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        terms = tokenize(text)
+        counts = Counter(terms)
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = tuple(counts)
+        self.doc_len[doc_id] = len(terms)
+        self.total_len += len(terms)
+
+    def remove(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+
+    def idf(self, term, stats=None):
+        if stats:
+            num_docs, df = stats["docs"], stats["df"].get(term, 0)
+        else:
+            num_docs, df = len(self.doc_len), len(self.postings.get(term, ()))
+        return math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+    def term_stats(self, query):
+        """
+        Document count, total length and per-term document frequencies for query, so
+        indexes holding parts of one corpus can score against the whole (see merge_term_stats).
+        """
+        return {
+            "docs": len(self.doc_len),
+            "total_len": self.total_len,
+            "df": {term: len(self.postings.get(term, ())) for term in self.query_terms(query)},
+        }
+
+    def query_terms(self, query):
+        return [term for term in dict.fromkeys(tokenize(query)) if term not in STOPWORDS]
+
+    def search(self, query, k=5, allowed=None, stats=None):
+        """
+        Returns up to k (doc_id, score) pairs, highest score first.
+        allowed: Optional set of doc_ids; other documents are never scored
+        stats: Corpus-wide term_stats to score with instead of this index's own, so
+            scores from several shards of one corpus can be compared
+        """
+        if not self.doc_len:
+            return []
+        avg_len = stats["total_len"] / stats["docs"] if stats else self.total_len / len(self.doc_len)
+        scores = {}
+        for term in self.query_terms(query):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term, stats)
+            for doc_id, tf in docs.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def coverage(self, query, doc_id):
+        """
+        Fraction of the query's content terms that occur in doc_id.
+        """
+        terms = self.query_terms(query)
+        if not terms:
+            return 0.0
+        return sum(1 for term in terms if doc_id in self.postings.get(term, ())) / len(terms)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+
+def merge_term_stats(stats):
+    """
+    Sums the term_stats of several indexes into those of their combined corpus.
+    """
+    merged = {"docs": 0, "total_len": 0, "df": {}}
+    for shard_stats in stats:
+        merged["docs"] += shard_stats["docs"]
+        merged["total_len"] += shard_stats["total_len"]
+        for term, df in shard_stats["df"].items():
+            merged["df"][term] = merged["df"].get(term, 0) + df
+    return merged
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Merges ranked lists of ids: score(id) = sum over lists of 1 / (k + rank).
+    Returns (id, fused score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
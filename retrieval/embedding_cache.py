@@ -0,0 +1,169 @@
+# embedding_cache.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+
+def embedding_model_name(embedding_model):
+    """
+    Best-effort identifier of an embedding model, used to namespace cache keys.
+    """
+    for attr in ("model", "model_name"):
+        name = getattr(embedding_model, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(embedding_model).__name__
+
+
+def normalize_query(text):
+    """
+    Lowercases and collapses whitespace so trivially different spellings share a key.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        """
+        In-process LRU cache with a time-to-live for query embeddings.
+        max_entries: Least recently used entries are evicted beyond this size
+        ttl_seconds: Entries older than this are treated as misses (None disables expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_name, text):
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, model_name, text, vector):
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def content_hash(text):
+    """
+    Content address of a chunk of text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentEmbeddingCache:
+    # SQLite caps the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, cache_file):
+        """
+        Disk-backed, content-addressed cache of document embeddings.
+        Keyed by (model name, sha256 of chunk text), so unchanged chunks are never
+        re-embedded and identical chunks from different sources are stored once.
+        """
+        self.cache_file = Path(cache_file)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_file), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, content_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model_name, hashes):
+        """
+        Returns {content_hash: vector} for the hashes that are cached.
+        """
+        unique = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), self._LOOKUP_BATCH):
+                batch = unique[start:start + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model_name, *batch],
+                )
+                for digest, blob in rows:
+                    found[digest] = array("f", blob).tolist()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model_name, vectors_by_hash):
+        """
+        Stores {content_hash: vector}; existing entries are left untouched.
+        """
+        rows = [
+            (model_name, digest, len(vector), array("f", vector).tobytes())
+            for digest, vector in vectors_by_hash.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, content_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": size,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,200 @@
+# faiss_benchmark.py
+#
+# Recall@k and latency of the ANN index types against the exact flat baseline.
+#
+#   python -m retrieval.faiss_benchmark --synthetic 50000
+#   python -m retrieval.faiss_benchmark --index faissDB/faiss_index.bin --k 5
+#   python -m retrieval.faiss_benchmark --synthetic 50000 --quantized
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import faiss
+import numpy as np
+from retrieval.faiss_index_factory import (
+    FLAT,
+    HNSW,
+    IVF_FLAT,
+    IVF_PQ,
+    build_index,
+    default_nlist,
+    min_training_size,
+    reconstruct_vectors,
+    set_search_params,
+    train_index,
+)
+from retrieval.quantized_index import QUANTIZED_STORAGES, QuantizedIndex, code_size
+
+# (index type, runtime knobs) combinations compared against the flat baseline
+DEFAULT_CONFIGS = [
+    (IVF_FLAT, {"nprobe": 8}),
+    (IVF_FLAT, {"nprobe": 32}),
+    (IVF_PQ, {"nprobe": 16}),
+    (IVF_PQ, {"nprobe": 64}),
+    (HNSW, {"ef_search": 32}),
+    (HNSW, {"ef_search": 128}),
+]
+
+
+def recall_at_k(ground_truth, found, k):
+    """
+    Mean fraction of the exact top-k that the approximate search also returned.
+    """
+    hits = sum(len(set(truth[:k]) & set(result[:k])) for truth, result in zip(ground_truth, found))
+    return hits / (len(ground_truth) * k)
+
+
+def _timed_search(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0].tolist())
+    return results, latencies
+
+
+def run_benchmark(vectors, queries, k=5, configs=DEFAULT_CONFIGS):
+    """
+    Builds every configured index over vectors and reports recall@k and
+    per-query latency (ms) relative to an exact flat index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    dimension = vectors.shape[1]
+    ids = np.arange(len(vectors), dtype="int64")
+
+    baseline = build_index(FLAT, dimension)
+    baseline.add_with_ids(vectors, ids)
+    ground_truth, flat_latencies = _timed_search(baseline, queries, k)
+    rows = [{
+        "index": FLAT,
+        "params": {},
+        "recall": 1.0,
+        "p50_ms": round(float(np.percentile(flat_latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(flat_latencies, 99)), 3),
+        "build_s": 0.0,
+    }]
+
+    for index_type, params in configs:
+        if len(vectors) < min_training_size(index_type, nlist=default_nlist(len(vectors))):
+            print(f"Skipping {index_type}: not enough vectors to train it.")
+            continue
+        started = time.perf_counter()
+        index = build_index(index_type, dimension, ntotal=len(vectors))
+        train_index(index, vectors)
+        index.add_with_ids(vectors, ids)
+        build_seconds = time.perf_counter() - started
+        set_search_params(index, **params)
+        found, latencies = _timed_search(index, queries, k)
+        rows.append({
+            "index": index_type,
+            "params": params,
+            "recall": round(recall_at_k(ground_truth, found, k), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "build_s": round(build_seconds, 2),
+        })
+    return rows
+
+
+def run_quantization_benchmark(vectors, queries, k=5, storages=QUANTIZED_STORAGES, rescore_factors=(1, 4, 10)):
+    """
+    Recall@k, latency and RAM per vector of each quantized storage after exact
+    rescoring, relative to an exact float32 flat index. A rescore factor of 1 shows
+    the recall of the quantized pass on its own.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    dimension = vectors.shape[1]
+    ids = np.arange(len(vectors), dtype="int64")
+
+    baseline = build_index(FLAT, dimension)
+    baseline.add_with_ids(vectors, ids)
+    ground_truth, flat_latencies = _timed_search(baseline, queries, k)
+    rows = [{
+        "storage": "float32",
+        "rescore": "-",
+        "bytes": code_size("float32", dimension),
+        "recall": 1.0,
+        "p50_ms": round(float(np.percentile(flat_latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(flat_latencies, 99)), 3),
+    }]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for storage in storages:
+            index = QuantizedIndex(dimension, storage, Path(tmp_dir) / f"{storage}_vectors.f32")
+            index.add_with_ids(vectors, ids)
+            # Search the way a served index does: full vectors memory-mapped from disk
+            index.write(Path(tmp_dir) / f"{storage}_index.bin")
+            for factor in rescore_factors:
+                index.rescore_factor = factor
+                found, latencies = _timed_search(index, queries, k)
+                rows.append({
+                    "storage": storage,
+                    "rescore": factor,
+                    "bytes": code_size(storage, dimension),
+                    "recall": round(recall_at_k(ground_truth, found, k), 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                    "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                })
+    return rows
+
+
+def print_quantization_report(rows, k):
+    print(f"{'storage':<8} {'rescore':>7} {'B/vector':>9} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        print(
+            f"{row['storage']:<8} {row['rescore']:>7} {row['bytes']:>9} "
+            f"{row['recall']:>9} {row['p50_ms']:>8} {row['p99_ms']:>8}"
+        )
+
+
+def print_report(rows, k):
+    print(f"{'index':<10} {'params':<20} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8}")
+    for row in rows:
+        params = ",".join(f"{key}={value}" for key, value in row["params"].items()) or "-"
+        print(
+            f"{row['index']:<10} {params:<20} {row['recall']:>9} "
+            f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['build_s']:>8}"
+        )
+
+
+def _load_index_vectors(path):
+    index = faiss.read_index(path)
+    if isinstance(index, faiss.IndexIDMap):
+        ids = faiss.vector_to_array(index.id_map)
+        return reconstruct_vectors(index, ids)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index recall/latency benchmark")
+    parser.add_argument("--index", help="Existing FAISS index file to take vectors from")
+    parser.add_argument("--synthetic", type=int, default=20000, help="Number of random vectors if no --index")
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--quantized", action="store_true", help="Compare fp16/int8/binary storage with rescoring")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.index:
+        vectors = _load_index_vectors(args.index)
+    else:
+        vectors = rng.standard_normal((args.synthetic, args.dimension)).astype("float32")
+    # Queries are perturbed corpus vectors, so they have realistic near neighbours
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.01 * rng.standard_normal((len(picks), vectors.shape[1])).astype("float32")
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, dimension {vectors.shape[1]}")
+    if args.quantized:
+        print_quantization_report(run_quantization_benchmark(vectors, queries, k=args.k), args.k)
+    else:
+        print_report(run_benchmark(vectors, queries, k=args.k), args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# faiss_index_factory.py
+
+import math
+import faiss
+import numpy as np
+
+FLAT = "flat"
+IVF_FLAT = "ivf_flat"
+IVF_PQ = "ivf_pq"
+HNSW = "hnsw"
+AUTO = "auto"
+INDEX_TYPES = (FLAT, IVF_FLAT, IVF_PQ, HNSW)
+
+# Corpus sizes at which auto-selection moves to the next index type.
+# HNSW is never picked automatically because it cannot remove vectors in place.
+IVF_FLAT_MIN_VECTORS = 10_000
+IVF_PQ_MIN_VECTORS = 1_000_000
+# Rough ordering used so auto mode only ever migrates "up"
+_SIZE_ORDER = {FLAT: 0, HNSW: 0, IVF_FLAT: 1, IVF_PQ: 2}
+# FAISS warns below ~39 training points per centroid
+_POINTS_PER_CENTROID = 39
+
+
+def choose_index_type(ntotal):
+    """
+    Picks an index type for a corpus of ntotal vectors.
+    """
+    if ntotal >= IVF_PQ_MIN_VECTORS:
+        return IVF_PQ
+    if ntotal >= IVF_FLAT_MIN_VECTORS:
+        return IVF_FLAT
+    return FLAT
+
+
+def is_upgrade(current_type, target_type):
+    return _SIZE_ORDER[target_type] > _SIZE_ORDER[current_type]
+
+
+def default_nlist(ntotal):
+    """
+    ~4*sqrt(n) inverted lists, capped so every centroid gets enough training points.
+    """
+    nlist = int(4 * math.sqrt(max(ntotal, 1)))
+    return max(1, min(nlist, ntotal // _POINTS_PER_CENTROID or 1))
+
+
+def default_pq_m(dimension):
+    """
+    Number of PQ sub-quantizers: the largest of 64/32/16/8 that divides the dimension.
+    """
+    for m in (64, 32, 16, 8):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def min_training_size(index_type, nlist=1, pq_nbits=8):
+    """
+    Number of vectors needed before an index of this type can be trained.
+    """
+    if index_type == IVF_FLAT:
+        return nlist * _POINTS_PER_CENTROID
+    if index_type == IVF_PQ:
+        return max(nlist * _POINTS_PER_CENTROID, (1 << pq_nbits) * _POINTS_PER_CENTROID)
+    return 0
+
+
+def factory_string(index_type, dimension, ntotal=0, nlist=None, pq_m=None, pq_nbits=8, hnsw_m=32):
+    """
+    faiss.index_factory description of an ID-mapped index of the given type.
+    """
+    if index_type == FLAT:
+        return "IDMap2,Flat"
+    if index_type == HNSW:
+        return f"IDMap2,HNSW{hnsw_m}"
+    nlist = nlist or default_nlist(ntotal)
+    if index_type == IVF_FLAT:
+        return f"IDMap2,IVF{nlist},Flat"
+    if index_type == IVF_PQ:
+        return f"IDMap2,IVF{nlist},PQ{pq_m or default_pq_m(dimension)}x{pq_nbits}"
+    raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}.")
+
+
+def build_index(index_type, dimension, ntotal=0, nlist=None, pq_m=None, pq_nbits=8, hnsw_m=32, ef_construction=40):
+    """
+    Creates an empty, ID-mapped FAISS index of the given type.
+    """
+    index = faiss.index_factory(
+        dimension,
+        factory_string(index_type, dimension, ntotal, nlist=nlist, pq_m=pq_m, pq_nbits=pq_nbits, hnsw_m=hnsw_m),
+        faiss.METRIC_L2,
+    )
+    if index_type == HNSW:
+        faiss.downcast_index(index.index).hnsw.efConstruction = ef_construction
+    return index
+
+
+def index_type_of(index):
+    """
+    Returns which of INDEX_TYPES an (optionally ID-mapped) index is.
+    """
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(base, faiss.IndexIVFPQ):
+        return IVF_PQ
+    if isinstance(base, faiss.IndexIVF):
+        return IVF_FLAT
+    return FLAT
+
+
+def train_index(index, vectors, max_training_points=100_000, seed=1234):
+    """
+    Trains an untrained index on a random sample of vectors.
+    """
+    if index.is_trained:
+        return
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if len(vectors) > max_training_points:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), max_training_points, replace=False)]
+    index.train(vectors)
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """
+    Applies runtime search knobs: nprobe for IVF indexes, efSearch for HNSW.
+    """
+    index_type = index_type_of(index)
+    params = faiss.ParameterSpace()
+    if nprobe and index_type in (IVF_FLAT, IVF_PQ):
+        params.set_index_parameter(index, "nprobe", int(nprobe))
+    if ef_search and index_type == HNSW:
+        params.set_index_parameter(index, "efSearch", int(ef_search))
+
+
+def filtered_search_params(index, int_ids, nprobe=None, ef_search=None):
+    """
+    Search parameters that restrict a search to int_ids, so filtered queries scan only
+    allowed vectors instead of over-fetching and post-filtering. Typed parameters replace
+    the index's own nprobe/efSearch, so those are passed along.
+    Returns (params, selector); keep the selector referenced while searching.
+    """
+    int_ids = np.ascontiguousarray(int_ids, dtype="int64")
+    selector = faiss.IDSelectorBatch(len(int_ids), faiss.swig_ptr(int_ids))
+    index_type = index_type_of(index)
+    if index_type in (IVF_FLAT, IVF_PQ):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=int(nprobe or 1))
+    elif index_type == HNSW:
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=int(ef_search or 16))
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return params, selector
+
+
+def read_index_mmap(path, reader=faiss.read_index):
+    """
+    Reads an index with its codes memory-mapped from the file instead of copied into RAM.
+    IO_FLAG_MMAP_IFC maps flat, SQ and HNSW storage in place; plain IO_FLAG_MMAP still
+    copies those codes and is only the fallback for index types IFC refuses.
+    path: Index file
+    reader: faiss.read_index or faiss.read_index_binary
+    """
+    flags = [faiss.IO_FLAG_MMAP]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        flags.insert(0, faiss.IO_FLAG_MMAP_IFC)
+    for flag in flags:
+        try:
+            return reader(str(path), flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            error = e
+    print(f"Could not memory-map {path} ({error}); reading it into memory instead.")
+    return reader(str(path))
+
+
+def reconstruct_vectors(index, ids):
+    """
+    Returns the stored vectors of an ID-mapped index for the given int64 ids.
+    PQ-compressed indexes return approximate vectors.
+    """
+    ivf = faiss.try_extract_index_ivf(index.index) if isinstance(index, faiss.IndexIDMap) else None
+    if ivf is not None:
+        ivf.make_direct_map()
+    return np.vstack([index.reconstruct(int(i)) for i in ids]) if len(ids) else np.zeros((0, index.d), dtype="float32")
@@ -1,18 +1,80 @@
 from pathlib import Path
+from typing import Any, Optional
+import hashlib
+import os
+import pickle
+import uuid
 import faiss
 import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from retrieval.faiss_index_factory import (
+    AUTO,
+    FLAT,
+    HNSW,
+    INDEX_TYPES,
+    build_index,
+    choose_index_type,
+    default_nlist,
+    filtered_search_params,
+    index_type_of,
+    is_upgrade,
+    min_training_size,
+    read_index_mmap,
+    reconstruct_vectors,
+    set_search_params,
+    train_index,
+)
+from monitoring.metrics import TRACER, span
+from retrieval.quantized_index import STORAGE_FLOAT32, STORAGE_TYPES, QuantizedIndex, code_size
+from retrieval.bm25_index import BM25Index, reciprocal_rank_fusion
+from retrieval.metadata_index import MetadataIndex
+from retrieval.sqlite_docstore import DocstoreIdToFaissId, FaissIdToDocstoreId, SQLiteDocstore
+from retrieval.embedding_cache import (
+    DocumentEmbeddingCache,
+    QueryEmbeddingCache,
+    content_hash,
+    embedding_model_name,
+)
 
 LOCALFAISS = "USE_LOCAL_FAISS"
 
+# Load modes: read the whole index into RAM, or memory-map it read-only
+LOAD_MEMORY = "memory"
+LOAD_MMAP = "mmap"
+# Docstore backends: lazily-read SQLite file, or the legacy pickled dict
+DOCSTORE_SQLITE = "sqlite"
+DOCSTORE_PICKLE = "pickle"
+
 
 # Get the root directory of your project (where this script is located)
 FAISS_ROOT = (Path(__file__).parent.parent / "faissDB").absolute()
 FAISS_INDEX_PATH = f"{FAISS_ROOT}/faiss_index.bin"
 FAISS_DOCSTORE_PATH = f"{FAISS_ROOT}/faiss_docstore.pkl"
+EMBEDDING_CACHE_PATH = f"{FAISS_ROOT}/embedding_cache.sqlite"
+
+
+class FilteredRetriever(BaseRetriever):
+    """
+    LangChain retriever that searches a manager with a metadata filter pushed into the search.
+    """
+
+    manager: Any
+    k: int = 4
+    filter: Optional[dict] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None, **kwargs):
+        return self.manager.similarity_search(query, k=kwargs.get("k", self.k), filter=kwargs.get("filter", self.filter))
+
 
+def faiss_id(doc_id):
+    """
+    Stable non-negative int64 FAISS id for a docstore id.
+    """
+    digest = hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
 
 
 class LangChainFAISSManager:
@@ -23,6 +85,18 @@ class LangChainFAISSManager:
         docstore_file=FAISS_DOCSTORE_PATH,
         dimension=1024,  # Default dimension, can be changed based on model
         initialize_new=False,
+        query_cache_size=1024,
+        query_cache_ttl=3600,
+        embedding_cache_file=EMBEDDING_CACHE_PATH,
+        index_type=AUTO,
+        nlist=None,
+        nprobe=16,
+        ef_search=64,
+        hnsw_m=32,
+        load_mode=LOAD_MEMORY,
+        docstore_backend=DOCSTORE_SQLITE,
+        vector_storage=STORAGE_FLOAT32,
+        rescore_factor=None,
     ):
         """
         embedding_model: Any embedding model with an .encode() or .embed_query() method
@@ -30,94 +104,667 @@ class LangChainFAISSManager:
         docstore_file: Path to persist/load the docstore
         dimension: Embedding dimension (required for new index)
         initialize_new: If True, creates a new index even if files exist
+        query_cache_size / query_cache_ttl: LRU size and TTL (seconds) of the query-embedding cache
+        embedding_cache_file: SQLite file caching document embeddings by content hash (None disables it)
+        index_type: "flat", "ivf_flat", "ivf_pq", "hnsw", or "auto" to pick by corpus size.
+            IVF types start flat and are trained and migrated once enough vectors exist.
+        nlist: IVF inverted lists (defaults to ~4*sqrt(ntotal) at training time)
+        nprobe / ef_search: Runtime recall/speed knobs for IVF and HNSW
+        hnsw_m: HNSW graph degree
+        load_mode: "memory" reads the index into RAM; "mmap" memory-maps it read-only so
+            start-up is cheap and worker processes share pages (ingestion is disabled)
+        docstore_backend: "sqlite" fetches documents lazily from <docstore_file>.sqlite
+            (the writer imports a legacy .pkl docstore once; readers read the pickle until then);
+            "pickle" keeps the old in-memory dict
+        vector_storage: "float32" keeps full vectors in the index; "fp16", "int8" or "binary"
+            keep compact codes in RAM and rescore candidates exactly against float32 copies
+            memory-mapped from <faiss_file>_vectors.f32 (an existing index is converted on load)
+        rescore_factor: Quantized candidates rescored per requested result (default per storage)
         """
+        if index_type != AUTO and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type {index_type!r}, expected 'auto' or one of {INDEX_TYPES}.")
+        if vector_storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown vector_storage {vector_storage!r}, expected one of {STORAGE_TYPES}.")
+        if vector_storage != STORAGE_FLOAT32 and index_type not in (AUTO, FLAT):
+            raise ValueError("Quantized vector storage is scanned flat; use index_type 'flat' or 'auto'.")
         print(faiss_file, docstore_file, dimension, initialize_new)
         self.embedding_model = embedding_model
+        self.model_name = embedding_model_name(embedding_model)
+        self.query_cache = QueryEmbeddingCache(max_entries=query_cache_size, ttl_seconds=query_cache_ttl)
+        self.doc_cache = DocumentEmbeddingCache(embedding_cache_file) if embedding_cache_file else None
         self.faiss_file = Path(faiss_file)
         self.docstore_file = Path(docstore_file)
         self.dimension = dimension
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.load_mode = load_mode
+        self.read_only = load_mode == LOAD_MMAP
+        self.docstore_backend = docstore_backend
+        self.vector_storage = vector_storage
+        self.quantized = vector_storage != STORAGE_FLOAT32
+        self.rescore_factor = rescore_factor
+        self.vectors_file = self.faiss_file.with_name(f"{self.faiss_file.stem}_vectors.f32")
+        if docstore_backend == DOCSTORE_SQLITE:
+            self.sqlite_docstore_file = self.docstore_file.with_suffix(".sqlite")
+        self.bm25_file = self.docstore_file.with_name(f"{self.docstore_file.stem}_bm25.pkl")
+        self.bm25 = BM25Index()
+        self.metadata_file = self.docstore_file.with_name(f"{self.docstore_file.stem}_metadata.pkl")
+        self.metadata_index = MetadataIndex()
+        # Legacy pickle docstores record their publish generation next to the pickle
+        self.generation_file = self.docstore_file.with_name(f"{self.docstore_file.stem}_generation.txt")
         self.vector_store = None
+        self._retriever = None
+        # Bumped on every in-process change; used to invalidate downstream caches
+        self.generation = 0
         self.index = None
         self.docstore = None
         self.index_to_docstore_id = {}
+        self.loaded_mtime = 0
+        # Publish generation of the side indexes in memory, see persist()
+        self.loaded_generation = 0
+        if self.read_only and initialize_new:
+            raise ValueError(f"Cannot create {self.faiss_file} read-only; use load_mode='memory'.")
         if initialize_new or not self.faiss_file.exists():
             if not dimension:
                 raise ValueError("Must provide embedding dimension to create new index.")
-            self._init_new_index()
+            if self.read_only:
+                self._init_empty_reader()
+            else:
+                self._init_new_index()
         else:
             self._load_index()
+            self._load_side_indexes()
+        if not self.read_only:
+            self._maybe_migrate()
+        self._apply_search_params()
 
     def _init_new_index(self):
-        self.index = faiss.IndexFlatL2(self.dimension)
+        # ID-mapped so chunks can be replaced or removed in place by their docstore id.
+        # Types that need training start flat and are migrated by _maybe_migrate.
+        if self.quantized:
+            self.index = QuantizedIndex(self.dimension, self.vector_storage, self.vectors_file, self.rescore_factor)
+        else:
+            start_type = self.index_type if self.index_type in (FLAT, HNSW) else FLAT
+            self.index = build_index(start_type, self.dimension, hnsw_m=self.hnsw_m)
+        if self.docstore_backend == DOCSTORE_SQLITE:
+            self._open_sqlite_docstore()
+            self.docstore.clear()
+        else:
+            self.docstore = InMemoryDocstore()
+            self.index_to_docstore_id = {}
+            self.docstore_id_to_index = {}
+        self._init_vector_store()
+
+    def _init_empty_reader(self):
+        """
+        Fresh deploy: serves an empty index until the ingest process publishes one,
+        which refresh() then loads.
+        """
+        print(f"{self.faiss_file} does not exist yet; serving an empty index until it is published.")
+        self.index = build_index(FLAT, self.dimension)
         self.docstore = InMemoryDocstore()
         self.index_to_docstore_id = {}
+        self.docstore_id_to_index = {}
+        self._init_vector_store()
+
+    def _init_vector_store(self):
         self.vector_store = FAISS(
-            embedding_function=self._embed,  # <-- FIXED ARGUMENT NAME
+            embedding_function=self._embed,
             index=self.index,
             docstore=self.docstore,
             index_to_docstore_id=self.index_to_docstore_id,
-)
+        )
 
+    def _read_index(self):
+        if self.quantized:
+            if self.vectors_file.exists():
+                return QuantizedIndex.read(
+                    self.faiss_file,
+                    self.vector_storage,
+                    self.vectors_file,
+                    rescore_factor=self.rescore_factor,
+                    mmap=self.load_mode == LOAD_MMAP,
+                )
+            if self.read_only:
+                raise ValueError(
+                    f"{self.vectors_file} is missing; open {self.faiss_file} once with load_mode='memory' "
+                    f"to convert it to {self.vector_storage} storage."
+                )
+        if self.load_mode == LOAD_MMAP:
+            return read_index_mmap(self.faiss_file)
+        return faiss.read_index(str(self.faiss_file))
 
-    def _load_index(self):
-        self.index = faiss.read_index(str(self.faiss_file))
+    def _open_sqlite_docstore(self):
+        legacy_pickle = not self.sqlite_docstore_file.exists() and self.docstore_file.exists()
+        if legacy_pickle and self.read_only:
+            # Readers never write; the writer imports the pickle the next time it opens the index
+            print(f"{self.sqlite_docstore_file} does not exist yet; reading {self.docstore_file} until it is imported.")
+            self._load_pickle_docstore()
+            return
+        self.docstore = SQLiteDocstore(self.sqlite_docstore_file, faiss_id_fn=faiss_id, read_only=self.read_only)
+        if legacy_pickle:
+            print(f"Importing {self.docstore_file} into {self.sqlite_docstore_file} ...")
+            with open(self.docstore_file, "rb") as f:
+                self.docstore.import_documents(pickle.load(f))
+        # Lazy views: no per-document Python loop at start-up
+        self.index_to_docstore_id = FaissIdToDocstoreId(self.docstore)
+        self.docstore_id_to_index = DocstoreIdToFaissId(self.docstore)
+
+    def _load_pickle_docstore(self):
         self.docstore = InMemoryDocstore()
         if self.docstore_file.exists():
-            import pickle
             with open(self.docstore_file, "rb") as f:
                 self.docstore._dict = pickle.load(f)
-        # Only map index_to_docstore_id for IDs that exist in docstore
-        self.index_to_docstore_id = {
-            i: str(i) for i in range(self.index.ntotal) if str(i) in self.docstore._dict
-        }
-        self.vector_store = FAISS(
-            embedding_function=self._embed,
-            index=self.index,
-            docstore=self.docstore,
-            index_to_docstore_id=self.index_to_docstore_id,
-        )
+        # FAISS ids are derived from docstore ids, so the mapping is rebuilt from the docstore
+        self.index_to_docstore_id = {faiss_id(doc_id): doc_id for doc_id in self.docstore._dict}
+        self.docstore_id_to_index = {doc_id: i for i, doc_id in self.index_to_docstore_id.items()}
+
+    def _file_mtime(self):
+        return self.faiss_file.stat().st_mtime_ns if self.faiss_file.exists() else 0
+
+    def _load_index(self):
+        self.loaded_mtime = self._file_mtime()
+        self.index = self._read_index()
+        if self.docstore_backend == DOCSTORE_SQLITE:
+            self._open_sqlite_docstore()
+        else:
+            self._load_pickle_docstore()
+        if not isinstance(self.index, (faiss.IndexIDMap2, QuantizedIndex)):
+            self._migrate_to_id_map()
+        if self.quantized and not isinstance(self.index, QuantizedIndex):
+            print(f"Converting {self.faiss_file} to {self.vector_storage} vector storage ...")
+            self.index = QuantizedIndex.from_index(
+                self.index, self.vector_storage, self.vectors_file, rescore_factor=self.rescore_factor
+            )
+        self._init_vector_store()
+
+    def _published_generation(self):
+        """
+        Generation of the last persist() whose docstore is committed (0 if none).
+        """
+        if isinstance(self.docstore, SQLiteDocstore):
+            return self.docstore.published_generation()
+        return int(self.generation_file.read_text()) if self.generation_file.exists() else 0
+
+    def _load_side_indexes(self):
+        generation = self._published_generation()
+        self._load_bm25(generation)
+        self._load_metadata_index(generation)
+        self.loaded_generation = generation
+
+    def _load_bm25(self, generation):
+        """
+        Loads the persisted BM25 index, or rebuilds it from the docstore if it is missing or
+        stamped with an older generation than the committed docstore.
+        A newer stamp is fine: persist() saves it just before committing the docstore.
+        """
+        if self.bm25_file.exists():
+            self.bm25 = BM25Index.load(self.bm25_file)
+            if self.bm25.generation is not None and self.bm25.generation >= generation:
+                return
+        print("Building BM25 index from the docstore ...")
+        self.bm25 = BM25Index()
+        for doc_id in list(self.docstore_id_to_index):
+            self.bm25.add(doc_id, self.docstore.search(doc_id).page_content)
+
+    def _load_metadata_index(self, generation):
+        """
+        Loads the persisted metadata index, or rebuilds it from the documents' metadata
+        (same generation check as _load_bm25).
+        """
+        if self.metadata_file.exists():
+            self.metadata_index = MetadataIndex.load(self.metadata_file)
+            if self.metadata_index.generation is not None and self.metadata_index.generation >= generation:
+                return
+        print("Building metadata index from the docstore ...")
+        self.metadata_index = MetadataIndex()
+        for doc_id in list(self.docstore_id_to_index):
+            self.metadata_index.add(doc_id, self.docstore.search(doc_id).metadata)
+
+    def _migrate_to_id_map(self):
+        """
+        Converts a legacy positional index (docstore ids "0".."n-1") into an ID-mapped one.
+        """
+        print(f"Migrating {self.faiss_file} to an ID-mapped index ...")
+        legacy = self.index
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(legacy.d))
+        positions = [i for i in range(legacy.ntotal) if self.has_id(str(i))]
+        if positions:
+            vectors = legacy.reconstruct_n(0, legacy.ntotal)[positions]
+            ids = np.array([faiss_id(str(i)) for i in positions], dtype="int64")
+            self.index.add_with_ids(vectors, ids)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(
+                f"{self.faiss_file} is memory-mapped read-only; open it with load_mode='memory' to modify it."
+            )
+
+    def _set_index(self, index):
+        self.generation += 1
+        self.index = index
+        self.vector_store.index = index
+        self._apply_search_params()
+
+    def _apply_search_params(self):
+        if not self.quantized:
+            set_search_params(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def _stored_vectors(self):
+        """
+        Returns (int64 ids, float32 vectors) of everything in the index.
+        Exact vectors come from the document embedding cache when available,
+        otherwise they are reconstructed from the index itself.
+        """
+        doc_ids = list(self.docstore_id_to_index)
+        int_ids = np.array([self.docstore_id_to_index[doc_id] for doc_id in doc_ids], dtype="int64")
+        if self.doc_cache is not None and doc_ids:
+            hashes = [content_hash(self.docstore.search(doc_id).page_content) for doc_id in doc_ids]
+            cached = self.doc_cache.get_many(self.model_name, hashes)
+            if all(digest in cached for digest in hashes):
+                return int_ids, np.asarray([cached[digest] for digest in hashes], dtype="float32")
+        return int_ids, reconstruct_vectors(self.index, int_ids)
+
+    def rebuild_index(self, index_type=None):
+        """
+        Rebuilds the index as index_type (default: the configured/auto-selected type),
+        training it on the stored vectors and re-adding them under the same ids.
+        """
+        self._check_writable()
+        if self.quantized:
+            # Quantized storage is always a flat scan; rebuilding re-encodes the codes
+            self.index.retrain()
+            self._set_index(self.index)
+            return
+        target = index_type or self._target_index_type()
+        int_ids, vectors = self._stored_vectors()
+        index = build_index(target, self.index.d, ntotal=len(int_ids), nlist=self.nlist, hnsw_m=self.hnsw_m)
+        train_index(index, vectors)
+        if len(int_ids):
+            index.add_with_ids(vectors, int_ids)
+        self._set_index(index)
+
+    def _target_index_type(self):
+        if self.index_type == AUTO:
+            return choose_index_type(self.index.ntotal)
+        return self.index_type
+
+    def _maybe_migrate(self):
+        """
+        Migrates to the target index type once there are enough vectors to train it.
+        In auto mode the index only ever migrates to a larger-corpus type.
+        """
+        if self.quantized:
+            return
+        current = index_type_of(self.index)
+        target = self._target_index_type()
+        if target == current:
+            return
+        if self.index_type == AUTO and not is_upgrade(current, target):
+            return
+        ntotal = self.index.ntotal
+        if ntotal < min_training_size(target, nlist=self.nlist or default_nlist(ntotal)):
+            return
+        print(f"Migrating FAISS index from {current} to {target} at {ntotal} vectors ...")
+        self.rebuild_index(target)
 
     def _embed(self, texts):
         if isinstance(texts, list):
             return self.embedding_model.embed_documents(texts)
-        else:
-            return self.embedding_model.embed_query(texts)
+        # Queries go through the cache, which is shared by similarity_search and as_retriever()
+        vector = self.query_cache.get(self.model_name, texts)
+        if vector is None:
+            with span("query_embedding"):
+                vector = self.embedding_model.embed_query(texts)
+            self.query_cache.put(self.model_name, texts, vector)
+        return vector
 
-    def add_texts(self, texts, ids=None):
+    def embed_query(self, query):
         """
-        Add new texts to the vector store.
+        Embeds a query through the shared query-embedding cache.
         """
-        embeddings = self._embed(texts)
+        return self._embed(query)
+
+    def _embed_documents_cached(self, texts):
+        """
+        Embeds texts, reusing cached vectors for chunks whose content was embedded before.
+        Only chunks never seen by this model reach embed_documents, each one once.
+        """
+        if self.doc_cache is None:
+            return self._embed(list(texts))
+        hashes = [content_hash(text) for text in texts]
+        vectors = self.doc_cache.get_many(self.model_name, hashes)
+        missing = {}
+        for digest, text in zip(hashes, texts):
+            if digest not in vectors and digest not in missing:
+                missing[digest] = text
+        if missing:
+            new_vectors = dict(zip(missing.keys(), self._embed(list(missing.values()))))
+            self.doc_cache.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[digest] for digest in hashes]
+
+    def query_cache_stats(self):
+        """
+        Returns hit/miss counters of the query-embedding cache.
+        """
+        return self.query_cache.stats()
+
+    def data_version(self):
+        """
+        Token that changes whenever the index changes, in this process or on disk.
+        """
+        return (self.generation, self.index.ntotal, self._file_mtime())
+
+    def refresh(self):
+        """
+        Re-opens the index if another process persisted a new version of it, and the
+        BM25/metadata indexes whenever a newer generation was published, so a reader that
+        caught a persist() half-way picks up the rest on its next call.
+        Meant for read-only (mmap) readers; searches already running keep the old index,
+        whose file stays valid because persist() replaces it atomically.
+        Returns True if anything was reloaded.
+        """
+        mtime = self._file_mtime()
+        if not mtime:
+            return False
+        index_changed = mtime != self.loaded_mtime
+        if not index_changed and self._published_generation() == self.loaded_generation:
+            return False
+        if index_changed and not self.loaded_mtime:
+            print(f"{self.faiss_file} was published; loading it.")
+            self._load_index()
+            self._apply_search_params()
+        elif index_changed:
+            print(f"{self.faiss_file} changed on disk; reloading.")
+            self.loaded_mtime = mtime
+            index = self._read_index()
+            if self.docstore_backend == DOCSTORE_PICKLE:
+                self._load_pickle_docstore()
+            elif not isinstance(self.docstore, SQLiteDocstore):
+                # Still on a legacy pickle: switches to SQLite once the writer has imported it
+                self._open_sqlite_docstore()
+            # The SQLite docstore needs no reload: a WAL reader sees the writer's commits
+            self.index = index
+            self._init_vector_store()
+            self._retriever = None
+            self._apply_search_params()
+        self._load_side_indexes()
+        self.generation += 1
+        return True
+
+    def memory_stats(self):
+        """
+        RAM per stored vector and its compression relative to float32.
+        """
+        if self.quantized:
+            return self.index.memory_stats()
+        try:
+            base = faiss.downcast_index(self.index.index)
+            bytes_per_vector = base.sa_code_size()
+        except RuntimeError:
+            bytes_per_vector = code_size(STORAGE_FLOAT32, self.index.d)
+        return {
+            "storage": STORAGE_FLOAT32,
+            "vectors": self.index.ntotal,
+            "bytes_per_vector": bytes_per_vector,
+            "float32_bytes_per_vector": 4 * self.index.d,
+            "compression": round(4 * self.index.d / bytes_per_vector, 1),
+            "resident_bytes": bytes_per_vector * self.index.ntotal,
+        }
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def has_id(self, doc_id):
+        return doc_id in self.docstore_id_to_index
+
+    def add_texts(self, texts, ids=None, metadatas=None):
+        """
+        Add new texts to the vector store, or replace them if their ids already exist.
+        Texts are embedded at most once, in a single embed_documents call for the
+        chunks missing from the document embedding cache.
+        metadatas: Optional metadata dict per text (source, page, currency, doc_type,
+            ingested_at); the filterable fields are indexed for search filters
+        """
+        if not texts:
+            return []
+        self._check_writable()
+        texts = list(texts)
         if ids is None:
-            ids = [str(self.index.ntotal + i) for i in range(len(texts))]
-        # Wrap texts in Document objects
-        docs = [Document(page_content=text) for text in texts]
-        self.vector_store.add_texts(texts, ids=ids, embeddings=embeddings)
-        # Update docstore and index_to_docstore_id
-        for idx, doc_id in enumerate(ids):
-            self.docstore._dict[doc_id] = docs[idx]  # Store Document, not string
-            self.index_to_docstore_id[self.index.ntotal - len(texts) + idx] = doc_id
+            ids = [uuid.uuid4().hex for _ in texts]
+        ids = list(ids)
+        if len(ids) != len(texts) or len(set(ids)) != len(ids):
+            raise ValueError("ids must be unique and match the number of texts.")
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        if len(metadatas) != len(texts):
+            raise ValueError("metadatas must match the number of texts.")
+        existing = [doc_id for doc_id in ids if self.has_id(doc_id)]
+        if existing:
+            self.delete(existing)
+        embeddings = self._embed_documents_cached(texts)
+        int_ids = [faiss_id(doc_id) for doc_id in ids]
+        self.index.add_with_ids(np.asarray(embeddings, dtype="float32"), np.array(int_ids, dtype="int64"))
+        self.docstore.add({
+            doc_id: Document(page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        # Keep the lexical and metadata indexes in sync with the docstore
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            self.bm25.add(doc_id, text)
+            self.metadata_index.add(doc_id, metadata)
+        for int_id, doc_id in zip(int_ids, ids):
+            self.index_to_docstore_id[int_id] = doc_id
+            self.docstore_id_to_index[doc_id] = int_id
+        self.generation += 1
+        self._maybe_migrate()
+        return ids
+
+    def delete(self, ids):
+        """
+        Removes documents (vectors and docstore entries) by docstore id.
+        Returns the number of vectors removed.
+        """
+        self._check_writable()
+        ids = [doc_id for doc_id in ids if self.has_id(doc_id)]
+        if not ids:
+            return 0
+        int_ids = np.array([self.docstore_id_to_index[doc_id] for doc_id in ids], dtype="int64")
+        try:
+            removed = self.index.remove_ids(int_ids)
+        except RuntimeError:
+            # HNSW cannot remove vectors; it is rebuilt from the remaining ones below
+            removed = None
+        for doc_id in ids:
+            self.index_to_docstore_id.pop(self.docstore_id_to_index.pop(doc_id), None)
+        self.docstore.delete(ids)
+        for doc_id in ids:
+            self.bm25.remove(doc_id)
+            self.metadata_index.remove(doc_id)
+        self.generation += 1
+        if removed is None:
+            self.rebuild_index(index_type_of(self.index))
+            removed = len(ids)
+        return removed
 
     def persist(self):
         """
-        Save the FAISS index and docstore to disk.
+        Save the FAISS index and docstore to disk as the next publish generation.
+        Everything a reader resolves hits against is written first (full vectors, the
+        BM25 and metadata indexes stamped with the generation, the docstore commit) and
+        the index is swapped in last, so processes that have the old file memory-mapped
+        keep a consistent view and a new index never returns ids they cannot look up.
+        Documents deleted since the last persist stay readable as tombstones for readers
+        still searching the previous index.
         """
-        faiss.write_index(self.index, str(self.faiss_file))
-        import pickle
-        with open(self.docstore_file, "wb") as f:
-            pickle.dump(self.docstore._dict, f)
+        self._check_writable()
+        generation = self._published_generation() + 1
+        self.faiss_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.faiss_file.with_suffix(self.faiss_file.suffix + ".tmp")
+        if self.quantized:
+            # Swaps in the full vectors file and writes the codes to tmp_file
+            self.index.write(tmp_file)
+        else:
+            faiss.write_index(self.index, str(tmp_file))
+        self.bm25.generation = generation
+        self.bm25.save(self.bm25_file)
+        self.metadata_index.generation = generation
+        self.metadata_index.save(self.metadata_file)
+        if self.docstore_backend == DOCSTORE_SQLITE:
+            self.docstore.publish(generation)
+        else:
+            docstore_tmp = self.docstore_file.with_suffix(self.docstore_file.suffix + ".tmp")
+            with open(docstore_tmp, "wb") as f:
+                pickle.dump(self.docstore._dict, f)
+            os.replace(docstore_tmp, self.docstore_file)
+            self.generation_file.write_text(str(generation))
+        os.replace(tmp_file, self.faiss_file)
+        self.loaded_mtime = self._file_mtime()
+        self.loaded_generation = generation
 
-    def similarity_search(self, query, k=5):
+    def similarity_search(self, query, k=5, filter=None):
         """
         Returns the top-k most similar texts to the query.
+        filter: Optional metadata filter, e.g. {"currency": "USD", "doc_type": "price_list"}
+        """
+        return [document for document, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query, k=5, filter=None):
+        """
+        Returns the top-k (Document, L2 distance) pairs; lower distance is more similar.
+        A filter is applied inside the FAISS search, so k matches are returned whenever
+        k documents match, however rare they are.
+        """
+        nearest = self.search_by_vector(self._embed(query), k, filter=filter)
+        documents = self.documents_by_id([doc_id for doc_id, _ in nearest])
+        return [(documents[doc_id], distance) for doc_id, distance in nearest if doc_id in documents]
+
+    def is_keyword_query(self, query, lexical_results, max_terms=8, min_coverage=1.0):
+        """
+        True when a query is short, made of rare/exact terms (codes, currencies, numbers,
+        role names), and the best lexical hit contains all of them, so the embedding
+        model adds nothing.
+        """
+        terms = self.bm25.query_terms(query)
+        if not terms or len(terms) > max_terms or not lexical_results:
+            return False
+        if len(lexical_results) > 1 and lexical_results[0][1] < 1.2 * lexical_results[1][1]:
+            return False
+        return self.bm25.coverage(query, lexical_results[0][0]) >= min_coverage
+
+    def hybrid_search(self, query, k=5, mode="auto", candidates=20, rrf_k=60, filter=None):
+        """
+        Lexical (BM25) + vector retrieval merged with reciprocal rank fusion.
+        Returns the top-k Documents, best first.
+        mode: "hybrid" always fuses both, "lexical" never embeds the query, "vector" is
+            dense only, and "auto" takes the lexical-only fast path for keyword queries
+        candidates: Results taken from each retriever before fusion
+        filter: Optional metadata filter applied inside both retrievers
+        """
+        if mode == "vector":
+            return self.similarity_search(query, k=k, filter=filter)
+        with span("bm25_search"):
+            lexical = self.lexical_search(query, max(candidates, k), filter=filter)
+        if mode == "lexical" or (mode == "auto" and self.is_keyword_query(query, lexical)):
+            TRACER.annotate(path="lexical")
+            return self.get_documents([doc_id for doc_id, _ in lexical[:k]])
+        TRACER.annotate(path="hybrid")
+        with span("vector_search"):
+            dense_ids = self._dense_ids(query, max(candidates, k), filter=filter)
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in lexical], dense_ids], k=rrf_k)
+        return self.get_documents([doc_id for doc_id, _ in fused[:k]])
+
+    def _dense_ids(self, query, k, filter=None):
+        """
+        Docstore ids of the k nearest vectors, nearest first.
+        """
+        if self.index.ntotal == 0:
+            return []
+        return [doc_id for doc_id, _ in self.search_by_vector(self._embed(query), k, filter=filter)]
+
+    def _allowed_ids(self, filter):
+        """
+        Docstore ids matching a metadata filter, or None when there is no filter.
+        """
+        return self.metadata_index.matching_ids(filter) if filter else None
+
+    def search_by_vector(self, vector, k, filter=None):
+        """
+        (docstore id, L2 distance) of the k nearest vectors to an embedded query, nearest first.
+        A filter becomes an ID selector, so FAISS only scores the allowed vectors.
+        """
+        if self.index.ntotal == 0:
+            return []
+        query = np.asarray([vector], dtype="float32")
+        allowed = self._allowed_ids(filter)
+        if allowed is None:
+            distances, int_ids = self.index.search(query, min(k, self.index.ntotal))
+        elif not allowed:
+            return []
+        else:
+            allowed_int_ids = np.fromiter((faiss_id(doc_id) for doc_id in allowed), dtype="int64", count=len(allowed))
+            k = min(k, len(allowed_int_ids))
+            if self.quantized:
+                distances, int_ids = self.index.search(query, k, allowed_ids=allowed_int_ids)
+            else:
+                # params only points at the selector, which must stay alive during the search
+                params, selector = filtered_search_params(
+                    self.index, allowed_int_ids, nprobe=self.nprobe, ef_search=self.ef_search
+                )
+                distances, int_ids = self.index.search(query, k, params=params)
+        return [
+            (self.index_to_docstore_id[int(i)], float(distance))
+            for distance, i in zip(distances[0], int_ids[0])
+            if i != -1 and int(i) in self.index_to_docstore_id
+        ]
+
+    def lexical_search(self, query, k, filter=None, stats=None):
+        """
+        (docstore id, BM25 score) of the k best lexical matches, best first.
+        stats: Corpus-wide BM25 term stats when this index is one shard of several
+        """
+        return self.bm25.search(query, k=k, allowed=self._allowed_ids(filter), stats=stats)
+
+    def lexical_stats(self, query):
+        return self.bm25.term_stats(query)
+
+    def documents_by_id(self, doc_ids):
+        """
+        {docstore id: Document} for the ids the docstore still holds. Ids a newer
+        generation has purged are left out instead of surfacing as "not found" strings.
+        """
+        documents = {}
+        for doc_id in doc_ids:
+            document = self.docstore.search(doc_id)
+            if isinstance(document, Document):
+                documents[doc_id] = document
+        return documents
+
+    def get_documents(self, doc_ids):
+        documents = self.documents_by_id(doc_ids)
+        return [documents[doc_id] for doc_id in doc_ids if doc_id in documents]
+
+    def metadata_values(self, field):
+        """
+        Distinct values of a filterable metadata field with their chunk counts.
         """
-        return self.vector_store.similarity_search(query, k=k)
+        return self.metadata_index.values(field)
 
-    def as_retriever(self):
+    def as_retriever(self, k=4, filter=None):
         """
         Returns a LangChain retriever for use in RAG pipelines.
+        The unfiltered retriever object is reused, so chains built on it can be cached.
+        filter: Optional metadata filter applied inside the vector search
         """
-        return self.vector_store.as_retriever()
+        if filter or k != 4:
+            return FilteredRetriever(manager=self, k=k, filter=filter)
+        if self._retriever is None:
+            self._retriever = FilteredRetriever(manager=self)
+        return self._retriever
 
 
 
@@ -0,0 +1,82 @@
+# metadata_index.py
+
+import os
+import pickle
+from pathlib import Path
+
+# Chunk metadata fields that can be filtered on
+FILTER_FIELDS = ("source", "page", "currency", "doc_type")
+
+
+class MetadataIndex:
+    def __init__(self, fields=FILTER_FIELDS):
+        """
+        Inverted index (field, value) -> doc_ids over chunk metadata, used to resolve a
+        filter to the set of allowed ids before a search runs.
+        """
+        self.fields = tuple(fields)
+        self.postings = {}  # (field, value) -> set of doc_ids
+        self.doc_values = {}  # doc_id -> (field, value) pairs, for removal
+        self.generation = None  # Publish generation it was saved for, see LangChainFAISSManager.persist
+
+    def __len__(self):
+        return len(self.doc_values)
+
+    def add(self, doc_id, metadata):
+        if doc_id in self.doc_values:
+            self.remove(doc_id)
+        pairs = tuple((field, metadata[field]) for field in self.fields if metadata.get(field) is not None)
+        for pair in pairs:
+            self.postings.setdefault(pair, set()).add(doc_id)
+        self.doc_values[doc_id] = pairs
+
+    def remove(self, doc_id):
+        for pair in self.doc_values.pop(doc_id, ()):
+            docs = self.postings.get(pair)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self.postings[pair]
+
+    def matching_ids(self, filter):
+        """
+        Set of doc_ids matching filter: {field: value or list of values}.
+        Values of one field are alternatives (OR); fields must all match (AND).
+        """
+        conditions = []
+        for field, values in filter.items():
+            if field not in self.fields:
+                raise ValueError(f"Cannot filter on {field!r}; filterable fields are {self.fields}.")
+            values = values if isinstance(values, (list, tuple, set, frozenset)) else [values]
+            docs = set()
+            for value in values:
+                docs |= self.postings.get((field, value), set())
+            conditions.append(docs)
+        allowed = None
+        # Most selective field first, so the intersection stays small
+        for docs in sorted(conditions, key=len):
+            allowed = set(docs) if allowed is None else allowed & docs
+            if not allowed:
+                break
+        return allowed if allowed is not None else set(self.doc_values)
+
+    def values(self, field):
+        """
+        Distinct values of a field with their chunk counts, e.g. to list the currencies indexed.
+        """
+        return {value: len(docs) for (name, value), docs in self.postings.items() if name == field}
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
@@ -0,0 +1,340 @@
+# neo4j_retriever.py
+
+import re
+import threading
+from collections import defaultdict, deque
+from sqlalchemy import inspect
+
+try:
+    from neo4j import GraphDatabase
+except ImportError:  # optional: the in-memory graph is used instead
+    GraphDatabase = None
+
+BACKEND_MEMORY = "memory"
+BACKEND_NEO4J = "neo4j"
+
+# Columns used as a node's display name, in order of preference
+NAME_COLUMNS = ("NAME", "CANDIDATE_NAME", "TITLE")
+# Questions with these words need SQL aggregation, which graph facts do not provide
+AGGREGATE_RE = re.compile(r"\b(how many|count|number of|average|avg|total|sum|most|least|max|min)\b", re.IGNORECASE)
+# Text values with at most this many distinct values per column are matched in questions
+_MAX_FILTER_VALUES = 50
+
+
+def _relation_name(column):
+    """
+    EMPLOYEE.MANAGER_ID -> MANAGER, TASK.ASSIGNED_TO -> ASSIGNED_TO.
+    """
+    name = column.upper()
+    return name[:-3] if name.endswith("_ID") else name
+
+
+def _entity_regex(labels):
+    # Longest labels first; short ones ("IT", "HR") only match with their exact case
+    ordered = sorted(labels, key=len, reverse=True)
+    alternatives = [re.escape(label) if len(label) > 3 else f"(?-i:{re.escape(label)})" for label in ordered]
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b", re.IGNORECASE) if ordered else None
+
+
+class RelationshipGraph:
+    def __init__(self):
+        """
+        In-memory property graph: one node per row, one edge per foreign-key value.
+        Adjacency lists are precomputed in both directions, so a k-hop expansion
+        touches only the rows it returns.
+        """
+        self.nodes = {}  # (table, pk) -> row dict
+        self.labels = {}  # (table, pk) -> display name
+        self.adjacency = defaultdict(list)  # node -> [(relation, neighbor, outgoing)]
+        self.by_label = defaultdict(list)  # lowercased display name -> [node]
+        self.by_value = defaultdict(set)  # lowercased property value -> {node}
+        self.key_columns = defaultdict(set)  # table -> primary/foreign key columns (not shown in facts)
+        self.edge_count = 0
+        self.entity_re = None
+        self.value_re = None
+
+    @classmethod
+    def from_sql_manager(cls, sql_manager):
+        """
+        Builds the graph from the tables that take part in a foreign key and their links.
+        Tables no foreign key touches (e.g. the pricing *_BY_CURRENCY tables, keyed by a
+        composite primary key) would only add unconnected nodes and are left out.
+        """
+        graph = cls()
+        inspector = inspect(sql_manager.db.engine)
+        preparer = sql_manager.db.engine.dialect.identifier_preparer
+        tables = inspector.get_table_names()
+        foreign_keys = []
+        for table in tables:
+            for fk in inspector.get_foreign_keys(table):
+                for column in fk["constrained_columns"]:
+                    foreign_keys.append((table, column, fk["referred_table"]))
+                    graph.key_columns[table].add(column)
+        related = {table for table, _, _ in foreign_keys} | {referred for _, _, referred in foreign_keys}
+        rows_by_table = {}
+        for table in tables:
+            if table not in related:
+                continue
+            primary_key = (inspector.get_pk_constraint(table).get("constrained_columns") or [None])[0]
+            graph.key_columns[table].add(primary_key)
+            rows_by_table[table] = []
+            for index, row in enumerate(sql_manager.iter_select_query(f"SELECT * FROM {preparer.quote(table)}")):
+                key = (table, row.get(primary_key, index) if primary_key else index)
+                graph.add_node(key, row)
+                rows_by_table[table].append(key)
+        for table, column, referred_table in foreign_keys:
+            for key in rows_by_table.get(table, ()):
+                value = graph.nodes[key].get(column)
+                if value is not None:
+                    graph.add_edge(key, _relation_name(column), (referred_table, value))
+        graph.index()
+        return graph
+
+    def add_node(self, key, properties):
+        self.nodes[key] = dict(properties)
+        label = next((str(properties[c]) for c in NAME_COLUMNS if properties.get(c)), f"{key[0]} {key[1]}")
+        self.labels[key] = label
+        self.by_label[label.lower()].append(key)
+
+    def add_edge(self, source, relation, target):
+        if target not in self.nodes:
+            return
+        self.adjacency[source].append((relation, target, True))
+        self.adjacency[target].append((relation, source, False))
+        self.edge_count += 1
+
+    def index(self):
+        """
+        Builds the matchers for entity names and low-cardinality property values.
+        """
+        values = defaultdict(lambda: defaultdict(set))  # (table, column) -> value -> {node}
+        for key, row in self.nodes.items():
+            for column, value in row.items():
+                if column in self.key_columns[key[0]] or column in NAME_COLUMNS:
+                    continue
+                if isinstance(value, str) and value.strip():
+                    values[(key[0], column)][value.strip()].add(key)
+        filter_values = set()
+        for distinct in values.values():
+            if len(distinct) <= _MAX_FILTER_VALUES:
+                for value, nodes in distinct.items():
+                    self.by_value[value.lower()] |= nodes
+                    filter_values.add(value)
+        self.entity_re = _entity_regex({self.labels[key] for key in self.nodes if self.labels[key] != f"{key[0]} {key[1]}"})
+        self.value_re = _entity_regex(filter_values)
+
+    def link(self, question):
+        """
+        Returns (seed nodes named in the question, nodes whose property values it mentions).
+        """
+        seeds = []
+        if self.entity_re is not None:
+            for match in dict.fromkeys(m.group(1).lower() for m in self.entity_re.finditer(question)):
+                seeds.extend(self.by_label.get(match, ()))
+        matched = set()
+        if self.value_re is not None:
+            for match in self.value_re.finditer(question):
+                matched |= self.by_value.get(match.group(1).lower(), set())
+        return list(dict.fromkeys(seeds)), matched
+
+    def expand(self, seeds, max_hops=2, max_nodes=500):
+        """
+        Breadth-first expansion from the seeds, in both edge directions.
+        Returns {node: (hops, {seeds that reach it})} and the traversed edges.
+        """
+        reached = {}
+        edges = set()
+        for seed in seeds:
+            distance = {seed: 0}
+            frontier = deque([seed])
+            while frontier and len(distance) < max_nodes:
+                node = frontier.popleft()
+                if distance[node] >= max_hops:
+                    continue
+                for relation, neighbor, outgoing in self.adjacency.get(node, ()):
+                    edges.add((node, relation, neighbor) if outgoing else (neighbor, relation, node))
+                    if neighbor not in distance:
+                        distance[neighbor] = distance[node] + 1
+                        frontier.append(neighbor)
+            for node, hops in distance.items():
+                best, sources = reached.get(node, (hops, set()))
+                sources.add(seed)
+                reached[node] = (min(best, hops), sources)
+        return reached, edges
+
+    def describe(self, key):
+        row = self.nodes[key]
+        details = ", ".join(
+            f"{column}={value}" for column, value in row.items()
+            if value is not None and column not in NAME_COLUMNS and column not in self.key_columns[key[0]]
+        )
+        return f"{key[0]} '{self.labels[key]}'" + (f" ({details})" if details else "")
+
+
+class Neo4jGraphStore:
+    def __init__(self, uri, user, password, database=None):
+        """
+        Mirrors a RelationshipGraph into Neo4j and runs the same bounded traversals in Cypher.
+        """
+        if GraphDatabase is None:
+            raise ImportError("The neo4j driver is not installed (pip install neo4j).")
+        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.driver.verify_connectivity()
+        self.database = database
+        self.nodes_by_key = {}
+
+    def sync(self, graph, batch_size=1000):
+        """
+        Replaces the stored graph with graph's nodes and relationships.
+        """
+        self.nodes_by_key = {f"{table}:{pk}": (table, pk) for table, pk in graph.nodes}
+        nodes = [
+            {"key": f"{table}:{pk}", "table": table, "label": graph.labels[(table, pk)], "properties": {k: v for k, v in row.items() if v is not None}}
+            for (table, pk), row in graph.nodes.items()
+        ]
+        edges = [
+            {"source": f"{source[0]}:{source[1]}", "target": f"{target[0]}:{target[1]}", "relation": relation}
+            for source, neighbors in graph.adjacency.items()
+            for relation, target, outgoing in neighbors if outgoing
+        ]
+        with self.driver.session(database=self.database) as session:
+            session.run("MATCH (n:Row) DETACH DELETE n")
+            session.run("CREATE INDEX row_key IF NOT EXISTS FOR (n:Row) ON (n.key)")
+            for start in range(0, len(nodes), batch_size):
+                session.run(
+                    "UNWIND $rows AS row CREATE (n:Row {key: row.key, table: row.table, label: row.label}) SET n += row.properties",
+                    rows=nodes[start:start + batch_size],
+                )
+            for start in range(0, len(edges), batch_size):
+                session.run(
+                    "UNWIND $edges AS e MATCH (s:Row {key: e.source}), (t:Row {key: e.target}) "
+                    "CREATE (s)-[:REL {type: e.relation}]->(t)",
+                    edges=edges[start:start + batch_size],
+                )
+
+    def expand(self, seeds, max_hops=2, max_nodes=500):
+        """
+        Same contract as RelationshipGraph.expand, computed by Neo4j.
+        """
+        keys = [f"{table}:{pk}" for table, pk in seeds]
+        query = (
+            f"MATCH p = (s:Row)-[*0..{int(max_hops)}]-(n:Row) WHERE s.key IN $keys "
+            "RETURN s.key AS seed, n.key AS node, length(p) AS hops, "
+            "[r IN relationships(p) | [startNode(r).key, r.type, endNode(r).key]] AS rels LIMIT $limit"
+        )
+        reached, edges = {}, set()
+        with self.driver.session(database=self.database) as session:
+            for record in session.run(query, keys=keys, limit=max_nodes * max(len(keys), 1)):
+                node = self.nodes_by_key[record["node"]]
+                best, sources = reached.get(node, (record["hops"], set()))
+                sources.add(self.nodes_by_key[record["seed"]])
+                reached[node] = (min(best, record["hops"]), sources)
+                for source, relation, target in record["rels"]:
+                    edges.add((self.nodes_by_key[source], relation, self.nodes_by_key[target]))
+        return reached, edges
+
+    def close(self):
+        self.driver.close()
+
+
+class GraphRetriever:
+    def __init__(
+        self,
+        sql_manager,
+        backend=BACKEND_MEMORY,
+        neo4j_uri=None,
+        neo4j_user="neo4j",
+        neo4j_password=None,
+        max_hops=2,
+        max_facts=40,
+    ):
+        """
+        Answers relationship questions ("which employees under Priya Sharma have pending
+        tasks on IT projects?") from a graph precomputed from the database's foreign keys,
+        returning the connecting facts as context instead of running several SQL agent turns.
+        backend: "memory" (embedded adjacency lists) or "neo4j"; falls back to memory when
+            the driver is missing or the server is unreachable
+        max_hops / max_facts: Traversal depth and number of facts returned per question
+        """
+        self.sql_manager = sql_manager
+        self.max_hops = max_hops
+        self.max_facts = max_facts
+        self.store = None
+        if backend == BACKEND_NEO4J:
+            try:
+                self.store = Neo4jGraphStore(neo4j_uri, neo4j_user, neo4j_password)
+            except Exception as e:
+                print(f"Neo4j unavailable ({e}); using the in-memory graph.")
+        self.backend = BACKEND_NEO4J if self.store is not None else BACKEND_MEMORY
+        self._lock = threading.Lock()
+        self._graph = None
+        self._graph_version = None
+        self.rebuilds = 0
+
+    @property
+    def graph(self):
+        """
+        The in-memory graph, rebuilt whenever the database changes.
+        """
+        version = self.sql_manager.data_version()
+        with self._lock:
+            if self._graph is None or version != self._graph_version:
+                self._graph = RelationshipGraph.from_sql_manager(self.sql_manager)
+                self._graph_version = version
+                self.rebuilds += 1
+                if self.store is not None:
+                    self.store.sync(self._graph)
+            return self._graph
+
+    def stats(self):
+        """
+        Size of the current graph and how often it was rebuilt, for the metrics collector.
+        """
+        graph = self._graph
+        return {
+            "nodes": len(graph.nodes) if graph else 0,
+            "edges": graph.edge_count if graph else 0,
+            "rebuilds": self.rebuilds,
+        }
+
+    def retrieve(self, question):
+        """
+        Returns {"facts": [...], "seeds": [...], "covered": bool}.
+        covered is True when the question links two or more entities, asks for no
+        aggregate and every connecting fact fits in max_facts, i.e. the facts alone can
+        answer it without the SQL agent.
+        """
+        graph = self.graph
+        seeds, matched = graph.link(question)
+        if not seeds:
+            return {"facts": [], "seeds": [], "covered": False}
+        store = self.store or graph
+        reached, edges = store.expand(seeds, max_hops=self.max_hops)
+
+        def score(edge):
+            source, _, target = edge
+            # Facts connecting several named entities, or touching a mentioned value
+            # ("pending"), rank first; then the closest ones
+            seeds_reached = len(reached.get(source, (0, set()))[1] | reached.get(target, (0, set()))[1])
+            value_hits = (source in matched) + (target in matched)
+            hops = min(reached.get(source, (self.max_hops, ()))[0], reached.get(target, (self.max_hops, ()))[0])
+            return (-seeds_reached, -value_hits, hops)
+
+        ranked = sorted((edge for edge in edges if edge[0] in graph.nodes and edge[2] in graph.nodes), key=score)
+        facts = [
+            f"{graph.describe(source)} -[{relation}]-> {graph.describe(target)}"
+            for source, relation, target in ranked[: self.max_facts]
+        ]
+        return {
+            "facts": facts,
+            "seeds": [graph.describe(seed) for seed in seeds],
+            "covered": len(seeds) >= 2 and len(ranked) <= self.max_facts and not AGGREGATE_RE.search(question),
+        }
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     from retrieval.sql_retriever import LangChainSQLManager
+#     retriever = GraphRetriever(LangChainSQLManager(db_type="USE_LOCALDB", sqlite_file="inventers.db"))
+#     result = retriever.retrieve("Which employees under Priya Sharma have pending tasks on IT projects?")
+#     print("\n".join(result["facts"]))
@@ -0,0 +1,141 @@
+# pricing_retriever.py
+
+import re
+import threading
+from embeddings.chunk_metadata import detect_currency
+from retrieval.neo4j_retriever import AGGREGATE_RE
+from retrieval.pricing_tables import (
+    RESOURCE_RATE_QUERY,
+    SENIORITY_LEVELS,
+    SERVICE_PRICE_QUERY,
+    UNIT_FIXED,
+    lookup_query,
+    name_tokens,
+    normalize_unit,
+)
+
+# Only questions about prices are answered from the pricing tables
+PRICE_QUESTION_RE = re.compile(
+    r"\b(rates?|prices?|pricing|costs?|charges?|fees?|quotes?|budget|how much|billing)\b", re.IGNORECASE
+)
+# "hourly", "per hour", "a month", "/hr" -> the unit asked for
+QUESTION_UNIT_RE = re.compile(
+    r"\b(hourly|daily|weekly|monthly|annual|yearly)\b|(?:\bper\b|\ban?\b|/)\s*(hour|hr|day|week|month|year|screen|product|page)\b",
+    re.IGNORECASE,
+)
+# Share of a role/service name's words the question must contain to match it
+MIN_KEY_OVERLAP = 0.6
+
+
+def _format_amount(value):
+    return f"{value:,.2f}".removesuffix(".00")
+
+
+def _match_keys(question_tokens, keys):
+    """
+    Keys (role or service names) best covered by the question's words, e.g.
+    "custom website development" for "cost of custom website development in AED".
+    """
+    best, best_score = [], None
+    for key, key_tokens in keys.items():
+        hits = len(key_tokens & question_tokens)
+        score = (hits / len(key_tokens), hits)
+        if score[0] < MIN_KEY_OVERLAP or hits < min(2, len(key_tokens)):
+            continue
+        if best_score is None or score > best_score:
+            best, best_score = [key], score
+        elif score == best_score:
+            best.append(key)
+    return sorted(best)
+
+
+class PricingRetriever:
+    def __init__(self, sql_manager, max_facts=20):
+        """
+        Answers pricing questions ("hourly rate of a senior developer in AED") with one
+        indexed query on the precomputed cross-currency tables built by
+        retrieval/pricing_tables.py, instead of vector search plus the SQL agent.
+        max_facts: Rows returned per question
+        """
+        self.sql_manager = sql_manager
+        self.max_facts = max_facts
+        self._lock = threading.Lock()
+        self._keys = None
+        self._keys_version = None
+
+    @property
+    def keys(self):
+        """
+        {"role": {ROLE_KEY: words}, "service": {SERVICE_KEY: words}}, reloaded whenever the database changes.
+        """
+        version = self.sql_manager.data_version()
+        with self._lock:
+            if self._keys is None or version != self._keys_version:
+                keys = {"role": {}, "service": {}}
+                try:
+                    for kind, query in (
+                        ("role", "SELECT DISTINCT ROLE_KEY AS NAME_KEY FROM RESOURCE_RATE_BY_CURRENCY"),
+                        ("service", "SELECT DISTINCT SERVICE_KEY AS NAME_KEY FROM SERVICE_PRICE_BY_CURRENCY"),
+                    ):
+                        for row in self.sql_manager.iter_select_query(query):
+                            if row["NAME_KEY"]:
+                                keys[kind][row["NAME_KEY"]] = set(row["NAME_KEY"].split())
+                except Exception as e:
+                    print(f"Pricing tables unavailable ({e}); run retrieval/pricing_tables.py to load them.")
+                self._keys = keys
+                self._keys_version = version
+            return self._keys
+
+    def retrieve(self, question):
+        """
+        Returns {"facts": [...], "covered": bool}.
+        covered is True when the question names a known role or service and asks for no
+        aggregate, i.e. the looked-up prices answer it without the SQL agent.
+        """
+        if not PRICE_QUESTION_RE.search(question):
+            return {"facts": [], "covered": False}
+        keys = self.keys
+        tokens = set(name_tokens(question))
+        currency = detect_currency(question)
+        unit_match = QUESTION_UNIT_RE.search(question)
+        unit = normalize_unit(unit_match.group(1) or unit_match.group(2)) if unit_match else None
+        seniority = next(
+            (SENIORITY_LEVELS[word] for word in re.findall(r"[a-z-]+", question.lower()) if word in SENIORITY_LEVELS),
+            None,
+        )
+        params = {"unit": unit}
+        if currency:
+            params["currency"] = currency
+
+        facts = []
+        for role_key in _match_keys(tokens, keys["role"]):
+            rows = self.sql_manager.run_select_query(
+                lookup_query(RESOURCE_RATE_QUERY, currency), dict(params, key=role_key, seniority=seniority)
+            )
+            for row in rows:
+                experience = f" ({row['EXPERIENCE']})" if row["EXPERIENCE"] else ""
+                facts.append(f"{row['ROLE']}{experience}: {self._price(row, 'RATE', 'MAX_RATE')}")
+        for key in _match_keys(tokens, keys["service"]):
+            for row in self.sql_manager.run_select_query(lookup_query(SERVICE_PRICE_QUERY, currency), dict(params, key=key)):
+                facts.append(f"{row['SERVICE']}: {self._price(row, 'MIN_PRICE', 'MAX_PRICE')}")
+        facts = facts[: self.max_facts]
+        return {"facts": facts, "covered": bool(facts) and not AGGREGATE_RE.search(question)}
+
+    @staticmethod
+    def _price(row, low, high):
+        amount = _format_amount(row[low])
+        if row[high] is not None:
+            amount += f"–{_format_amount(row[high])}"
+        per = "fixed price" if row["UNIT"] == UNIT_FIXED else f"per {row['UNIT']}"
+        if row["IS_PUBLISHED"]:
+            source = f"published in {row['FILE_NAME']}"
+        else:
+            source = f"converted from {row['SOURCE_CURRENCY']} at {row['EXCHANGE_RATE']:.6g}, {row['FILE_NAME']}"
+        return f"{row['CURRENCY']} {amount} {per} ({source})"
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     from retrieval.sql_retriever import LangChainSQLManager
+#     retriever = PricingRetriever(LangChainSQLManager(db_type="USE_LOCALDB", sqlite_file="inventers.db"))
+#     print("\n".join(retriever.retrieve("What is the hourly rate of a senior developer in AED?")["facts"]))
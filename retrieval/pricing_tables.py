@@ -0,0 +1,673 @@
+# pricing_tables.py
+
+import argparse
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from embeddings.chunk_metadata import detect_currency, detect_doc_type, ingestion_timestamp
+from embeddings.source_manifest import file_sha256
+
+# Same database the SQL agent queries (retrieval/inventers.db, see retrieval/sqlite.py)
+PRICING_DB_PATH = Path(__file__).parent / "inventers.db"
+
+DOC_TYPE_PRICE_LIST = "price_list"
+DOC_TYPE_RATE_CARD = "rate_card"
+PRICING_DOC_TYPES = (DOC_TYPE_PRICE_LIST, DOC_TYPE_RATE_CARD)
+
+UNIT_FIXED = "fixed"
+UNIT_HOUR = "hour"
+# How a price's period or quantity is written -> canonical unit
+UNIT_ALIASES = {
+    "hr": "hour", "hrs": "hour", "hour": "hour", "hours": "hour", "hourly": "hour",
+    "day": "day", "days": "day", "daily": "day",
+    "wk": "week", "week": "week", "weeks": "week", "weekly": "week",
+    "mo": "month", "month": "month", "months": "month", "monthly": "month", "retainer": "month",
+    "subscription": "month",
+    "yr": "year", "year": "year", "years": "year", "yearly": "year", "annual": "year",
+    "annually": "year", "annum": "year",
+    "fixed": "fixed", "project": "fixed", "one-time": "fixed", "one time": "fixed",
+}
+
+# Seniority words split off a role, so "Sr. Developer" and "Senior Developer" share ROLE_KEY "developer"
+SENIORITY_LEVELS = {
+    "intern": "intern", "trainee": "intern",
+    "junior": "junior", "jr": "junior",
+    "mid": "mid", "mid-level": "mid", "intermediate": "mid",
+    "senior": "senior", "sr": "senior",
+}
+
+# Units of currency per USD; every cross-currency amount is converted through USD.
+# AED is pegged; INR floats, so override it with --rate INR=... or set_exchange_rates()
+DEFAULT_EXCHANGE_RATES = {"USD": 1.0, "AED": 3.6725, "INR": 85.5}
+EXCHANGE_RATES_AS_OF = "2025-07-01"
+
+_CURRENCY = r"US\$|₹|\$|\bAED\b|\bUSD\b|\bINR\b|\bRs\b\.?|\bDhs?\b\.?"
+_AMOUNT = r"\d[\d,]*(?:\.\d+)?"
+# "$200", "$500+", "₹1,50,000+", "$12–$18/screen", "AED 45/hr", "45 AED per hour", "$0.50/ product"
+PRICE_RE = re.compile(
+    rf"(?P<currency>{_CURRENCY})?\s*(?P<min>{_AMOUNT})(?P<plus>\+)?"
+    rf"(?:\s*(?:-|–|—|to)\s*(?:{_CURRENCY})?\s*(?P<max>{_AMOUNT})\+?)?"
+    rf"(?:\s*(?P<suffix>\bAED\b|\bUSD\b|\bINR\b))?"
+    rf"(?:\s*(?:/|\bper\b)\s*(?P<unit>[A-Za-z][A-Za-z-]*))?",
+    re.IGNORECASE,
+)
+_MODEL_TERM = r"fixed(?: price| cost)?|hourly|daily|weekly|monthly|annual(?:ly)?|yearly|one[- ]time|retainer|subscription|per [a-z][a-z-]*"
+_MODEL = rf"(?:{_MODEL_TERM})(?:\s*(?:/|,|&|\bor\b)\s*(?:{_MODEL_TERM}))*"
+# A pricing model cell ("Fixed / Hourly", "Per Screen"), alone or at the end of a row's name
+PRICING_MODEL_RE = re.compile(rf"^{_MODEL}$", re.IGNORECASE)
+_MODEL_TAIL_RE = re.compile(rf"(?:^|\s)({_MODEL})\s*$", re.IGNORECASE)
+EXPERIENCE_RE = re.compile(
+    r"\d+(?:\.\d+)?\s*(?:\+|(?:-|–|to)\s*\d+(?:\.\d+)?)?\s*\+?\s*(?:years?|yrs?)(?:\s+(?:of\s+)?exp(?:erience|\.)?)?",
+    re.IGNORECASE,
+)
+# Column headings of the tables ("Cost (₹)" counts as "cost")
+HEADER_TERMS = (
+    "pricing model", "hourly rate", "daily rate", "monthly rate", "tech stack", "service", "services",
+    "solution", "solutions", "model", "cost", "price", "pricing", "rate", "rates", "details",
+    "description", "includes", "inclusions", "role", "roles", "resource", "resources", "designation",
+    "position", "experience", "level", "seniority", "skills", "technology",
+)
+_HEADER_RE = re.compile(r"\b(" + "|".join(re.escape(term) for term in HEADER_TERMS) + r")\b", re.IGNORECASE)
+_SMALL_WORDS = {"a", "an", "and", "or", "of", "for", "the", "to", "with", "in", "on", "via"}
+_CONNECTORS = ("or", "and", "with", "like", "for", "of", "to", "including", "via")
+
+PRICING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS PRICE_SOURCE (
+    SOURCE_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FILE_NAME VARCHAR(200) UNIQUE NOT NULL,
+    DOC_TYPE VARCHAR(20),
+    CURRENCY CHAR(3),
+    CONTENT_HASH CHAR(64),
+    ROW_COUNT INTEGER,
+    INGESTED_AT TEXT
+);
+
+CREATE TABLE IF NOT EXISTS SERVICE_PRICE (
+    PRICE_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SOURCE_ID INTEGER NOT NULL,
+    PAGE INTEGER,
+    CATEGORY VARCHAR(100),
+    SERVICE VARCHAR(150),
+    SERVICE_KEY VARCHAR(150),
+    PRICING_MODEL VARCHAR(50),
+    UNIT VARCHAR(20),
+    MIN_PRICE REAL,
+    MAX_PRICE REAL,
+    CURRENCY CHAR(3),
+    DETAILS TEXT,
+    FOREIGN KEY (SOURCE_ID) REFERENCES PRICE_SOURCE(SOURCE_ID)
+);
+CREATE INDEX IF NOT EXISTS IDX_SERVICE_PRICE_KEY ON SERVICE_PRICE (SERVICE_KEY, UNIT, CURRENCY);
+CREATE INDEX IF NOT EXISTS IDX_SERVICE_PRICE_SOURCE ON SERVICE_PRICE (SOURCE_ID);
+
+CREATE TABLE IF NOT EXISTS RESOURCE_RATE (
+    RATE_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SOURCE_ID INTEGER NOT NULL,
+    PAGE INTEGER,
+    CATEGORY VARCHAR(100),
+    ROLE VARCHAR(100),
+    ROLE_KEY VARCHAR(100),
+    SENIORITY VARCHAR(20),
+    EXPERIENCE VARCHAR(30),
+    UNIT VARCHAR(20),
+    RATE REAL,
+    MAX_RATE REAL,
+    CURRENCY CHAR(3),
+    FOREIGN KEY (SOURCE_ID) REFERENCES PRICE_SOURCE(SOURCE_ID)
+);
+CREATE INDEX IF NOT EXISTS IDX_RESOURCE_RATE_KEY ON RESOURCE_RATE (ROLE_KEY, SENIORITY, UNIT, CURRENCY);
+CREATE INDEX IF NOT EXISTS IDX_RESOURCE_RATE_SOURCE ON RESOURCE_RATE (SOURCE_ID);
+
+CREATE TABLE IF NOT EXISTS EXCHANGE_RATE (
+    FROM_CURRENCY CHAR(3),
+    TO_CURRENCY CHAR(3),
+    RATE REAL NOT NULL,
+    AS_OF TEXT,
+    PRIMARY KEY (FROM_CURRENCY, TO_CURRENCY)
+);
+
+-- Precomputed cross-currency tables: every price in every currency, the published
+-- figure where a document lists one, otherwise converted through EXCHANGE_RATE
+CREATE TABLE IF NOT EXISTS SERVICE_PRICE_BY_CURRENCY (
+    PRICE_ID INTEGER,
+    CURRENCY CHAR(3),
+    SERVICE VARCHAR(150),
+    SERVICE_KEY VARCHAR(150),
+    CATEGORY VARCHAR(100),
+    PRICING_MODEL VARCHAR(50),
+    UNIT VARCHAR(20),
+    MIN_PRICE REAL,
+    MAX_PRICE REAL,
+    SOURCE_CURRENCY CHAR(3),
+    EXCHANGE_RATE REAL,
+    IS_PUBLISHED INTEGER,
+    FILE_NAME VARCHAR(200),
+    DETAILS TEXT,
+    PRIMARY KEY (PRICE_ID, CURRENCY)
+);
+CREATE INDEX IF NOT EXISTS IDX_SERVICE_PRICE_BY_CURRENCY ON SERVICE_PRICE_BY_CURRENCY (SERVICE_KEY, CURRENCY, UNIT);
+
+CREATE TABLE IF NOT EXISTS RESOURCE_RATE_BY_CURRENCY (
+    RATE_ID INTEGER,
+    CURRENCY CHAR(3),
+    ROLE VARCHAR(100),
+    ROLE_KEY VARCHAR(100),
+    SENIORITY VARCHAR(20),
+    EXPERIENCE VARCHAR(30),
+    UNIT VARCHAR(20),
+    RATE REAL,
+    MAX_RATE REAL,
+    SOURCE_CURRENCY CHAR(3),
+    EXCHANGE_RATE REAL,
+    IS_PUBLISHED INTEGER,
+    FILE_NAME VARCHAR(200),
+    PRIMARY KEY (RATE_ID, CURRENCY)
+);
+CREATE INDEX IF NOT EXISTS IDX_RESOURCE_RATE_BY_CURRENCY ON RESOURCE_RATE_BY_CURRENCY (ROLE_KEY, CURRENCY, SENIORITY, UNIT);
+"""
+
+# Rows of the best source currency per item and target currency: the target itself when
+# published, else USD, else the alphabetically first (RANK keeps every row of that currency)
+_REFRESH_SERVICE_PRICES = """
+INSERT INTO SERVICE_PRICE_BY_CURRENCY
+SELECT PRICE_ID, TARGET, SERVICE, SERVICE_KEY, CATEGORY, PRICING_MODEL, UNIT,
+       ROUND(MIN_PRICE * FX, 2), ROUND(MAX_PRICE * FX, 2), CURRENCY, FX, CURRENCY = TARGET, FILE_NAME, DETAILS
+FROM (
+    SELECT p.*, x.TO_CURRENCY AS TARGET, x.RATE AS FX, s.FILE_NAME,
+           RANK() OVER (
+               PARTITION BY LOWER(p.SERVICE), p.UNIT, x.TO_CURRENCY
+               ORDER BY p.CURRENCY = x.TO_CURRENCY DESC, p.CURRENCY = 'USD' DESC, p.CURRENCY
+           ) AS PREFERENCE
+    FROM SERVICE_PRICE p
+    JOIN EXCHANGE_RATE x ON x.FROM_CURRENCY = p.CURRENCY
+    JOIN PRICE_SOURCE s ON s.SOURCE_ID = p.SOURCE_ID
+)
+WHERE PREFERENCE = 1
+"""
+_REFRESH_RESOURCE_RATES = """
+INSERT INTO RESOURCE_RATE_BY_CURRENCY
+SELECT RATE_ID, TARGET, ROLE, ROLE_KEY, SENIORITY, EXPERIENCE, UNIT,
+       ROUND(RATE * FX, 2), ROUND(MAX_RATE * FX, 2), CURRENCY, FX, CURRENCY = TARGET, FILE_NAME
+FROM (
+    SELECT r.*, x.TO_CURRENCY AS TARGET, x.RATE AS FX, s.FILE_NAME,
+           RANK() OVER (
+               PARTITION BY LOWER(r.ROLE), r.UNIT, x.TO_CURRENCY
+               ORDER BY r.CURRENCY = x.TO_CURRENCY DESC, r.CURRENCY = 'USD' DESC, r.CURRENCY
+           ) AS PREFERENCE
+    FROM RESOURCE_RATE r
+    JOIN EXCHANGE_RATE x ON x.FROM_CURRENCY = r.CURRENCY
+    JOIN PRICE_SOURCE s ON s.SOURCE_ID = r.SOURCE_ID
+)
+WHERE PREFERENCE = 1
+"""
+
+# Single indexed lookups on (key, currency); the {currency} clause is filled by _currency_clause
+RESOURCE_RATE_QUERY = """
+SELECT ROLE, SENIORITY, EXPERIENCE, UNIT, RATE, MAX_RATE, CURRENCY, SOURCE_CURRENCY, EXCHANGE_RATE, IS_PUBLISHED, FILE_NAME
+FROM RESOURCE_RATE_BY_CURRENCY
+WHERE ROLE_KEY = :key AND {currency}
+  AND (:seniority IS NULL OR SENIORITY = :seniority)
+  AND (:unit IS NULL OR UNIT = :unit)
+ORDER BY CURRENCY, UNIT, RATE
+"""
+SERVICE_PRICE_QUERY = """
+SELECT SERVICE, CATEGORY, PRICING_MODEL, UNIT, MIN_PRICE, MAX_PRICE, CURRENCY, SOURCE_CURRENCY, EXCHANGE_RATE, IS_PUBLISHED, FILE_NAME, DETAILS
+FROM SERVICE_PRICE_BY_CURRENCY
+WHERE SERVICE_KEY = :key AND {currency}
+  AND (:unit IS NULL OR UNIT = :unit)
+ORDER BY CURRENCY, SERVICE, UNIT, MIN_PRICE
+"""
+
+
+def lookup_query(query, currency):
+    """
+    Lookup SQL for one currency, or for the published figures in any currency when currency is None.
+    """
+    return query.format(currency="CURRENCY = :currency" if currency else "IS_PUBLISHED = 1")
+
+
+def normalize_unit(word):
+    word = word.strip().lower().rstrip(".")
+    if word in UNIT_ALIASES:
+        return UNIT_ALIASES[word]
+    # "screens" -> "screen", "products" -> "product"
+    return word[:-1] if word.endswith("s") and len(word) > 3 else word
+
+
+def name_tokens(text):
+    """
+    Lowercased words of a name or question, plural "s" dropped, e.g. for key matching.
+    """
+    words = re.findall(r"[a-z0-9][a-z0-9+#]*", text.lower())
+    return [w[:-1] if w.endswith("s") and len(w) > 3 and not w.endswith("ss") else w for w in words]
+
+
+def split_seniority(name):
+    """
+    "Senior Developer (5+ years)" -> ("developer", "senior").
+    Parenthesised qualifiers and experience are left out of the key.
+    """
+    base = EXPERIENCE_RE.sub(" ", re.sub(r"\(.*?\)", " ", name))
+    seniority = None
+    words = []
+    for word in re.findall(r"[A-Za-z0-9][\w+#-]*", base):
+        level = SENIORITY_LEVELS.get(word.lower())
+        if level is None:
+            words.append(word)
+        else:
+            seniority = seniority or level
+    return " ".join(name_tokens(" ".join(words))), seniority
+
+
+def service_key(name):
+    """
+    "UI/UX Design (Mobile)" -> "ui ux design": the key lookups match a question against.
+    """
+    return " ".join(name_tokens(re.sub(r"\(.*?\)", " ", name)))
+
+
+def _parse_amount(text):
+    return float(text.replace(",", "")) if text else None
+
+
+def _model_units(model):
+    """
+    "Fixed / Hourly" -> ["fixed", "hour"], "Per Screen" -> ["screen"].
+    """
+    units = []
+    for term in re.split(r"\s*(?:/|,|&|\bor\b)\s*", model or ""):
+        term = term.strip().lower()
+        if term.startswith("per "):
+            units.append(normalize_unit(term[4:]))
+        elif term:
+            units.append(UNIT_ALIASES.get(term, UNIT_ALIASES.get(term.split()[0], UNIT_FIXED)))
+    return units
+
+
+def _header_units(line):
+    return [normalize_unit(word) for word in re.findall(r"\b(hourly|daily|weekly|monthly|annual|yearly)\b", line, re.I)]
+
+
+def _is_header(line):
+    text = re.sub(r"\(.*?\)", " ", line)
+    return bool(_HEADER_RE.search(text)) and not _HEADER_RE.sub("", text).strip(" |/-:\t")
+
+
+def _is_title(line):
+    """
+    Short, mostly capitalised, comma-free lines: item names and section headings
+    rather than the wrapped description text of a row.
+    """
+    if len(line) > 60 or line.endswith((",", ";", ".")) or ", " in line:
+        return False
+    words = [w for w in re.findall(r"[A-Za-z][\w.+#-]*", line) if w.lower() not in _SMALL_WORDS]
+    return bool(words) and sum(w[0].isupper() for w in words) / len(words) >= 0.6
+
+
+def _continues(line):
+    """
+    True when the next line carries on this one (a trailing comma, connector or open bracket).
+    """
+    stripped = line.rstrip()
+    if stripped.endswith((",", "/", "(", "&", "-", "+")) or stripped.count("(") > stripped.count(")"):
+        return True
+    words = stripped.lower().split()
+    return bool(words) and words[-1] in _CONNECTORS
+
+
+def _page_lines(text):
+    lines = []
+    pending_symbol = ""
+    for raw in (text or "").splitlines():
+        for cell in raw.split("|"):
+            line = " ".join(cell.split())
+            if not line:
+                continue
+            # A currency symbol set on its own line belongs to the amount below it
+            if re.fullmatch(_CURRENCY, line, re.IGNORECASE):
+                pending_symbol = line
+                continue
+            lines.append(f"{pending_symbol}{line}" if pending_symbol else line)
+            pending_symbol = ""
+    return lines
+
+
+def _find_prices(line, bare_amounts):
+    """
+    Price matches of a line. Amounts without a currency only count when the table
+    header named the currency, and then only as a whole cell or with a unit ("45/hr").
+    """
+    matches = []
+    for match in PRICE_RE.finditer(line):
+        has_currency = match.group("currency") or match.group("suffix")
+        unit = match.group("unit")
+        if has_currency:
+            matches.append(match)
+        elif bare_amounts and (unit or match.group(0).strip() == line.strip()):
+            matches.append(match)
+    return matches
+
+
+def _finish_row(row, header_units):
+    units = _model_units(row["pricing_model"]) or header_units
+    prices = []
+    for i, (amount_min, amount_max, unit, currency) in enumerate(row["prices"]):
+        if unit is None:
+            unit = units[i] if i < len(units) else (units[-1] if units else UNIT_FIXED)
+        prices.append((amount_min, amount_max, unit, currency))
+    row["prices"] = prices
+    row["details"] = " ".join(row["details"]) or None
+    return row
+
+
+def parse_pricing_pages(pages, currency=None):
+    """
+    Parses the table rows of a price list or rate card from its page texts.
+    Works on extracted text whether each table cell landed on its own line or a whole
+    row on one: a row is its name (service or role), an optional pricing model and
+    experience, one or more prices, then the wrapped description.
+    pages: Page texts
+    currency: Currency of prices written without one (defaults to the one the pages mention most)
+    Returns a list of dicts with page, category, name, pricing_model, experience, details
+    and prices [(amount_min, amount_max, unit, currency)].
+    """
+    default_currency = currency or detect_currency("\n".join(page or "" for page in pages))
+    rows = []
+    for page_no, text in enumerate(pages, start=1):
+        category = None
+        header_units, header_currency, previous_header = [], None, False
+        names, model, experience, row = [], None, None, None
+        # Whether the last line ends mid-sentence, so this one carries on its text
+        continued = False
+        for line in _page_lines(text):
+            if _is_header(line):
+                # A new table: the heading above it names its category
+                if names:
+                    category = " ".join(names[-2:])
+                header_units = header_units + _header_units(line) if previous_header else _header_units(line)
+                header_currency = detect_currency(line) or (header_currency if previous_header else None)
+                names, model, experience, row = [], None, None, None
+                previous_header = True
+                continued = False
+                continue
+            previous_header = False
+            matches = _find_prices(line, bare_amounts=header_currency is not None)
+            if matches:
+                head = line[: matches[0].start()].strip(" |:-–")
+                tail = line[matches[-1].end():].strip(" |:-–")
+                model_match = _MODEL_TAIL_RE.search(head)
+                if model_match:
+                    model = model_match.group(1)
+                    head = head[: model_match.start()].strip(" |:-–")
+                experience_match = EXPERIENCE_RE.search(head)
+                if experience_match:
+                    experience = experience_match.group(0)
+                    head = (head[: experience_match.start()] + head[experience_match.end():]).strip(" |:-–()")
+                if head:
+                    names.append(head)
+                prices = []
+                for match in matches:
+                    symbol = match.group("currency") or match.group("suffix")
+                    prices.append((
+                        _parse_amount(match.group("min")),
+                        _parse_amount(match.group("max")),
+                        normalize_unit(match.group("unit")) if match.group("unit") else None,
+                        detect_currency(symbol) if symbol else header_currency or default_currency,
+                    ))
+                if not names and row is not None:
+                    # Another rate of the row above (e.g. its monthly rate in the next column)
+                    row["prices"].extend(prices)
+                    row["pricing_model"] = row["pricing_model"] or model
+                elif names or category:
+                    name = " ".join(names[-3:]) if names else category
+                    experience_match = EXPERIENCE_RE.search(name)
+                    if experience_match:
+                        experience = experience or experience_match.group(0)
+                    row = {
+                        "page": page_no,
+                        "category": category,
+                        "name": name,
+                        "pricing_model": model,
+                        "experience": experience,
+                        "details": [],
+                        "prices": prices,
+                    }
+                    rows.append(row)
+                if tail and row is not None:
+                    row["details"].append(tail)
+                names, model, experience = [], None, None
+                # Only the description after the prices can run on; "$500+" or "₹25,000+" does not
+                continued = bool(tail) and _continues(tail)
+                continue
+            elif PRICING_MODEL_RE.match(line):
+                if row is not None and not names and row["pricing_model"] is None and not row["details"]:
+                    row["pricing_model"] = line
+                else:
+                    model = line
+            elif EXPERIENCE_RE.fullmatch(line):
+                if row is not None and not names and row["experience"] is None:
+                    row["experience"] = line
+                else:
+                    experience = line
+            elif names and (_continues(names[-1]) or line.startswith("(")):
+                names[-1] = f"{names[-1]} {line}"
+            elif row is not None and not names and (not _is_title(line) or continued):
+                row["details"].append(line)
+            else:
+                names.append(line)
+            continued = _continues(line)
+        for page_row in rows:
+            if page_row["page"] == page_no:
+                _finish_row(page_row, header_units)
+    return rows
+
+
+class PricingTables:
+    def __init__(self, db_path=PRICING_DB_PATH, exchange_rates=None):
+        """
+        Normalized, indexed pricing tables parsed from the price lists and rate cards,
+        stored next to the company schema so the SQL path can answer "hourly rate of a
+        senior developer in AED" with one indexed query instead of vector search.
+        db_path: SQLite database (the one retrieval/sqlite.py builds by default)
+        exchange_rates: {currency: units per USD}, merged over DEFAULT_EXCHANGE_RATES;
+            load_document() stores the pairs the database has no rate for yet, and
+            set_exchange_rates() replaces stored ones
+        Opening the tables only creates the missing ones, so it leaves the database (and
+        every cache keyed on its version) untouched.
+        """
+        self.db_path = Path(db_path)
+        self.exchange_rates = dict(DEFAULT_EXCHANGE_RATES, **(exchange_rates or {}))
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(PRICING_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _write_exchange_rates(self, conn, as_of=EXCHANGE_RATES_AS_OF, replace=True):
+        """
+        Stores a rate for every currency pair; replace=False only adds the missing pairs.
+        """
+        if replace:
+            conn.execute("DELETE FROM EXCHANGE_RATE")
+        conn.executemany(
+            "INSERT OR IGNORE INTO EXCHANGE_RATE (FROM_CURRENCY, TO_CURRENCY, RATE, AS_OF) VALUES (?, ?, ?, ?)",
+            [
+                (source, target, per_usd / self.exchange_rates[source], as_of)
+                for source in self.exchange_rates
+                for target, per_usd in self.exchange_rates.items()
+            ],
+        )
+
+    def _refresh_by_currency(self, conn):
+        conn.execute("DELETE FROM SERVICE_PRICE_BY_CURRENCY")
+        conn.execute("DELETE FROM RESOURCE_RATE_BY_CURRENCY")
+        conn.execute(_REFRESH_SERVICE_PRICES)
+        conn.execute(_REFRESH_RESOURCE_RATES)
+
+    def set_exchange_rates(self, rates, as_of=None):
+        """
+        Updates exchange rates ({currency: units per USD}) and recomputes the cross-currency tables.
+        """
+        self.exchange_rates.update(rates)
+        with closing(self._connect()) as conn, conn:
+            self._write_exchange_rates(conn, as_of=as_of or ingestion_timestamp()[:10])
+            self._refresh_by_currency(conn)
+
+    def stored_hash(self, source):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT CONTENT_HASH FROM PRICE_SOURCE WHERE FILE_NAME = ?", (Path(source).name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_stale(self, pdf_path):
+        """
+        True for a price list / rate card (judged by its file name) whose tables were
+        never loaded or were loaded from different content.
+        """
+        if detect_doc_type(str(pdf_path)) not in PRICING_DOC_TYPES:
+            return False
+        return self.stored_hash(pdf_path) != file_sha256(pdf_path)
+
+    def load_document(self, source, pages, doc_type=None, currency=None, content_hash=None):
+        """
+        Parses one document's tables and replaces its rows, then recomputes the
+        cross-currency tables, all in one transaction.
+        Returns the number of rows loaded (0 for documents that are not price lists or rate cards).
+        """
+        pages = list(pages)
+        doc_type = doc_type or detect_doc_type(str(source), next((p for p in pages if p and p.strip()), ""))
+        if doc_type not in PRICING_DOC_TYPES:
+            return 0
+        file_name = Path(source).name
+        currency = currency or detect_currency(file_name) or detect_currency("\n".join(p or "" for p in pages))
+        rows = parse_pricing_pages(pages, currency=currency)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO PRICE_SOURCE (FILE_NAME, DOC_TYPE, CURRENCY, CONTENT_HASH, ROW_COUNT, INGESTED_AT)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (FILE_NAME) DO UPDATE SET DOC_TYPE = excluded.DOC_TYPE,
+                    CURRENCY = excluded.CURRENCY, CONTENT_HASH = excluded.CONTENT_HASH,
+                    ROW_COUNT = excluded.ROW_COUNT, INGESTED_AT = excluded.INGESTED_AT
+                """,
+                (file_name, doc_type, currency, content_hash, 0, ingestion_timestamp()),
+            )
+            source_id = conn.execute("SELECT SOURCE_ID FROM PRICE_SOURCE WHERE FILE_NAME = ?", (file_name,)).fetchone()[0]
+            conn.execute("DELETE FROM SERVICE_PRICE WHERE SOURCE_ID = ?", (source_id,))
+            conn.execute("DELETE FROM RESOURCE_RATE WHERE SOURCE_ID = ?", (source_id,))
+            if doc_type == DOC_TYPE_RATE_CARD:
+                records = []
+                for row in rows:
+                    role_key, seniority = split_seniority(row["name"])
+                    for amount_min, amount_max, unit, price_currency in row["prices"]:
+                        records.append((
+                            source_id, row["page"], row["category"], row["name"], role_key, seniority,
+                            row["experience"], unit, amount_min, amount_max, price_currency,
+                        ))
+                conn.executemany(
+                    """
+                    INSERT INTO RESOURCE_RATE (SOURCE_ID, PAGE, CATEGORY, ROLE, ROLE_KEY, SENIORITY,
+                        EXPERIENCE, UNIT, RATE, MAX_RATE, CURRENCY)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    records,
+                )
+            else:
+                records = [
+                    (
+                        source_id, row["page"], row["category"], row["name"], service_key(row["name"]),
+                        row["pricing_model"], unit, amount_min, amount_max, price_currency, row["details"],
+                    )
+                    for row in rows
+                    for amount_min, amount_max, unit, price_currency in row["prices"]
+                ]
+                conn.executemany(
+                    """
+                    INSERT INTO SERVICE_PRICE (SOURCE_ID, PAGE, CATEGORY, SERVICE, SERVICE_KEY,
+                        PRICING_MODEL, UNIT, MIN_PRICE, MAX_PRICE, CURRENCY, DETAILS)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    records,
+                )
+            conn.execute("UPDATE PRICE_SOURCE SET ROW_COUNT = ? WHERE SOURCE_ID = ?", (len(records), source_id))
+            self._write_exchange_rates(conn, replace=False)
+            self._refresh_by_currency(conn)
+        if not records:
+            print(f"{file_name}: no table rows found (scanned or outlined-text PDFs need OCR before parsing).")
+        return len(records)
+
+    def load_folder(self, pdf_folder, parser=None, max_workers=None, force=False):
+        """
+        Loads every price list and rate card PDF of a folder; unchanged files are skipped.
+        Returns the number of rows loaded.
+        """
+        from Search.extractor import PARSER_AUTO, iter_extracted_pdfs
+
+        pdf_files = [p.resolve() for p in sorted(Path(pdf_folder).glob("*.pdf"))]
+        stale = [p for p in pdf_files if (force and detect_doc_type(str(p)) in PRICING_DOC_TYPES) or self.is_stale(p)]
+        loaded = 0
+        for pdf_path, pages, error in iter_extracted_pdfs(stale, max_workers=max_workers, parser=parser or PARSER_AUTO):
+            if error is not None:
+                print(f"Failed to parse {pdf_path}: {error}")
+                continue
+            count = self.load_document(str(pdf_path), pages, content_hash=file_sha256(pdf_path))
+            print(f"{Path(pdf_path).name}: {count} pricing rows loaded.")
+            loaded += count
+        print(f"Loaded {loaded} pricing rows from {len(stale)} documents, {len(pdf_files) - len(stale)} skipped.")
+        return loaded
+
+    def _query(self, query, params):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def resource_rates(self, role, currency=None, unit=None, seniority=None):
+        """
+        Rates of a role, e.g. resource_rates("Senior Developer", "AED", unit="hour").
+        """
+        key, detected = split_seniority(role)
+        return self._query(
+            lookup_query(RESOURCE_RATE_QUERY, currency),
+            {"key": key, "currency": currency, "seniority": seniority or detected, "unit": unit},
+        )
+
+    def service_prices(self, service, currency=None, unit=None):
+        """
+        Prices of a service, e.g. service_prices("Custom Website Development", "INR").
+        """
+        return self._query(lookup_query(SERVICE_PRICE_QUERY, currency), {"key": service_key(service), "currency": currency, "unit": unit})
+
+
+def _parse_rates(values):
+    rates = {}
+    for value in values or []:
+        code, _, rate = value.partition("=")
+        rates[code.strip().upper()] = float(rate)
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load price lists and rate cards into indexed SQL tables.")
+    parser.add_argument("pdf_folder", nargs="?", default="WithoutBranding", help="Folder of price list / rate card PDFs")
+    parser.add_argument("--db", default=str(PRICING_DB_PATH), help="SQLite database to load into")
+    parser.add_argument("--rate", action="append", help="Exchange rate as CODE=units per USD, e.g. INR=85.5")
+    parser.add_argument("--force", action="store_true", help="Reload documents even if unchanged")
+    args = parser.parse_args(argv)
+
+    tables = PricingTables(args.db)
+    if args.rate:
+        tables.set_exchange_rates(_parse_rates(args.rate))
+    tables.load_folder(args.pdf_folder, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
+
+# Example usage:
+#   python -m retrieval.pricing_tables WithoutBranding --rate INR=85.5
+#
+#   tables = PricingTables()
+#   print(tables.resource_rates("Senior Developer", currency="AED", unit="hour"))
+#   print(tables.service_prices("Custom Website Development", currency="INR"))
@@ -0,0 +1,353 @@
+# quantized_index.py
+
+import os
+from pathlib import Path
+import faiss
+import numpy as np
+from retrieval.faiss_index_factory import read_index_mmap, reconstruct_vectors
+
+# Vector storage types: full float32 codes, or compact codes rescored against float32 copies on disk
+STORAGE_FLOAT32 = "float32"
+STORAGE_FP16 = "fp16"
+STORAGE_INT8 = "int8"
+STORAGE_BINARY = "binary"
+QUANTIZED_STORAGES = (STORAGE_FP16, STORAGE_INT8, STORAGE_BINARY)
+STORAGE_TYPES = (STORAGE_FLOAT32,) + QUANTIZED_STORAGES
+
+# Quantized candidates rescored exactly per requested result; coarser codes need more
+DEFAULT_RESCORE_FACTOR = {STORAGE_FP16: 2, STORAGE_INT8: 4, STORAGE_BINARY: 10}
+# int8 ranges are re-fitted once the index has grown this much since the last training
+RETRAIN_GROWTH = 2
+MAX_TRAINING_POINTS = 100_000
+BATCH_SIZE = 65_536
+# Rows scored per step of an exact scan (8192 x 1024 float32 = 32 MB)
+EXACT_BATCH_SIZE = 8_192
+
+# Full-vector file layout: magic, vector count, dimension, sorted int64 ids, float32 rows
+_MAGIC = b"FVEC0001"
+_HEADER_SIZE = 24
+
+
+def code_size(storage, dimension):
+    """
+    Bytes one vector takes in RAM under a storage type.
+    """
+    if storage == STORAGE_FP16:
+        return 2 * dimension
+    if storage == STORAGE_INT8:
+        return dimension
+    if storage == STORAGE_BINARY:
+        return (dimension + 7) // 8
+    return 4 * dimension
+
+
+class FullVectorFile:
+    def __init__(self, path, dimension, reset=False):
+        """
+        Exact float32 vectors on disk, sorted by id and memory-mapped read-only, so they
+        cost no RAM of their own and are shared between processes through the page cache.
+        Vectors added or removed since the last write() are tracked in memory.
+        reset: Start empty instead of opening the existing file
+        """
+        self.path = Path(path)
+        self.dimension = dimension
+        self.pending = {}  # id -> vector added since the last write
+        self.removed = set()  # ids in the file deleted since the last write
+        self.ids = np.zeros(0, dtype="int64")
+        self.vectors = np.zeros((0, dimension), dtype="float32")
+        if not reset:
+            self._open()
+
+    def _open(self):
+        self.ids = np.zeros(0, dtype="int64")
+        self.vectors = np.zeros((0, self.dimension), dtype="float32")
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+        if header[:8] != _MAGIC:
+            raise ValueError(f"{self.path} is not a full-vector file.")
+        count, dimension = (int(value) for value in np.frombuffer(header[8:], dtype="int64"))
+        if dimension != self.dimension:
+            raise ValueError(f"{self.path} holds {dimension}-dim vectors, expected {self.dimension}.")
+        if count:
+            self.ids = np.memmap(self.path, dtype="int64", mode="r", offset=_HEADER_SIZE, shape=(count,))
+            self.vectors = np.memmap(
+                self.path, dtype="float32", mode="r", offset=_HEADER_SIZE + 8 * count, shape=(count, dimension)
+            )
+
+    def __len__(self):
+        return len(self.ids) - len(self.removed) + len(self.pending)
+
+    def _in_file(self, ids):
+        if not len(self.ids):
+            return np.zeros(len(ids), dtype=bool), np.zeros(len(ids), dtype="int64")
+        rows = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        found = self.ids[rows] == ids
+        if self.removed:
+            found &= ~np.isin(ids, np.fromiter(self.removed, dtype="int64"))
+        return found, rows
+
+    def add(self, ids, vectors):
+        ids = np.asarray(ids, dtype="int64")
+        found, _ = self._in_file(ids)
+        # A re-added id replaces the copy in the file
+        self.removed.update(ids[found].tolist())
+        for i, vector in zip(ids.tolist(), np.asarray(vectors, dtype="float32")):
+            self.pending[i] = vector.copy()
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        for i in ids.tolist():
+            self.pending.pop(i, None)
+        found, _ = self._in_file(ids)
+        self.removed.update(ids[found].tolist())
+
+    def get(self, ids):
+        """
+        Exact vectors for int64 ids, in order; rows of unknown ids are NaN.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        vectors = np.full((len(ids), self.dimension), np.nan, dtype="float32")
+        found, rows = self._in_file(ids)
+        if found.any():
+            # Fancy indexing a memmap only reads the pages of the rows asked for
+            vectors[found] = self.vectors[rows[found]]
+        if self.pending:
+            for position, i in enumerate(ids.tolist()):
+                vector = self.pending.get(i)
+                if vector is not None:
+                    vectors[position] = vector
+        return vectors
+
+    def live_ids(self):
+        """
+        Sorted ids of every vector, written or pending.
+        """
+        ids = np.asarray(self.ids)
+        if self.removed:
+            ids = ids[~np.isin(ids, np.fromiter(self.removed, dtype="int64"))]
+        pending = np.fromiter(self.pending, dtype="int64", count=len(self.pending))
+        return np.sort(np.concatenate([ids, pending]))
+
+    def write(self):
+        """
+        Merges pending changes into a new file and swaps it in atomically, so readers
+        that have the old file mapped keep a consistent view.
+        """
+        ids = self.live_ids()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(_MAGIC + np.array([len(ids), self.dimension], dtype="int64").tobytes())
+            f.write(ids.tobytes())
+            for start in range(0, len(ids), BATCH_SIZE):
+                f.write(self.get(ids[start:start + BATCH_SIZE]).tobytes())
+        os.replace(tmp_file, self.path)
+        self.pending = {}
+        self.removed = set()
+        self._open()
+
+
+class QuantizedIndex:
+    def __init__(self, dimension, storage, vectors_file, rescore_factor=None, coarse=None):
+        """
+        Compact codes in RAM for a fast first pass, exact vectors memory-mapped from disk
+        to rescore the candidates. Provides the parts of the faiss index API that
+        LangChain's FAISS wrapper and LangChainFAISSManager use (search, add_with_ids,
+        remove_ids, reconstruct, ntotal, d).
+        dimension: Vector dimension
+        storage: "fp16", "int8" or "binary"
+        vectors_file: File of exact float32 vectors
+        rescore_factor: Quantized candidates rescored exactly per requested result
+        coarse: Existing faiss index of codes (a new, empty one is created if None)
+        """
+        if storage not in QUANTIZED_STORAGES:
+            raise ValueError(f"Unknown storage {storage!r}, expected one of {QUANTIZED_STORAGES}.")
+        if storage == STORAGE_BINARY and dimension % 8:
+            raise ValueError("Binary storage needs a dimension that is a multiple of 8.")
+        self.d = dimension
+        self.storage = storage
+        self.rescore_factor = rescore_factor or DEFAULT_RESCORE_FACTOR[storage]
+        self.full = FullVectorFile(vectors_file, dimension, reset=coarse is None)
+        self.coarse = coarse if coarse is not None else self._new_coarse()
+        self.trained_on = self.coarse.ntotal
+
+    def _new_coarse(self):
+        if self.storage == STORAGE_BINARY:
+            return faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(self.d))
+        qtype = faiss.ScalarQuantizer.QT_fp16 if self.storage == STORAGE_FP16 else faiss.ScalarQuantizer.QT_8bit
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(self.d, qtype, faiss.METRIC_L2))
+
+    @property
+    def ntotal(self):
+        return self.coarse.ntotal
+
+    @property
+    def is_trained(self):
+        return self.coarse.is_trained
+
+    def _codes_input(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.storage == STORAGE_BINARY:
+            # One sign bit per dimension; Hamming distance tracks the angle between vectors
+            return np.packbits(vectors > 0, axis=1)
+        return vectors
+
+    def add_with_ids(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        ids = np.ascontiguousarray(ids, dtype="int64")
+        if not self.coarse.is_trained:
+            # int8 needs per-dimension ranges: fitted on the first batch, refined by retrain()
+            self.coarse.train(vectors)
+            self.trained_on = len(vectors)
+        self.coarse.add_with_ids(self._codes_input(vectors), ids)
+        self.full.add(ids, vectors)
+        if self.storage == STORAGE_INT8 and self.ntotal > RETRAIN_GROWTH * max(self.trained_on, 1):
+            self.retrain()
+
+    def remove_ids(self, ids):
+        ids = np.ascontiguousarray(ids, dtype="int64")
+        removed = self.coarse.remove_ids(ids)
+        self.full.remove(ids)
+        return removed
+
+    def search(self, x, k, allowed_ids=None):
+        """
+        Quantized first pass for k * rescore_factor candidates, then exact squared L2
+        against the full vectors. Returns (distances, ids) like a flat L2 index.
+        allowed_ids: Optional int64 ids the search is restricted to
+        """
+        x = np.ascontiguousarray(x, dtype="float32")
+        if self.ntotal == 0:
+            return self._empty_result(len(x), k)
+        if allowed_ids is None:
+            _, candidates = self.coarse.search(self._codes_input(x), min(self.ntotal, k * self.rescore_factor))
+            return self._rescore(x, k, candidates)
+        allowed_ids = np.ascontiguousarray(allowed_ids, dtype="int64")
+        if self.storage == STORAGE_BINARY or len(allowed_ids) <= k * self.rescore_factor:
+            # Binary codes take no selector, and small sets would be rescored whole anyway
+            return self._exact_search(x, k, allowed_ids)
+        selector = faiss.IDSelectorBatch(len(allowed_ids), faiss.swig_ptr(allowed_ids))
+        _, candidates = self.coarse.search(
+            self._codes_input(x),
+            min(len(allowed_ids), k * self.rescore_factor),
+            params=faiss.SearchParameters(sel=selector),
+        )
+        return self._rescore(x, k, candidates)
+
+    @staticmethod
+    def _empty_result(nq, k):
+        return np.full((nq, k), np.inf, dtype="float32"), np.full((nq, k), -1, dtype="int64")
+
+    def _rescore(self, x, k, candidates):
+        """
+        Exact squared L2 of each query's candidate ids; keeps the k nearest.
+        """
+        distances, labels = self._empty_result(len(x), k)
+        for row, (query, ids) in enumerate(zip(x, candidates)):
+            ids = ids[ids != -1]
+            exact = ((self.full.get(ids) - query) ** 2).sum(axis=1)
+            known = ~np.isnan(exact)
+            ids, exact = ids[known], exact[known]
+            order = np.argsort(exact)[:k]
+            distances[row, :len(order)] = exact[order]
+            labels[row, :len(order)] = ids[order]
+        return distances, labels
+
+    def _exact_search(self, x, k, ids):
+        """
+        Exact squared L2 of every query against the full vectors of ids, scanned in batches.
+        """
+        distances, labels = self._empty_result(len(x), k)
+        query_norms = (x ** 2).sum(axis=1)[:, None]
+        for start in range(0, len(ids), EXACT_BATCH_SIZE):
+            batch = ids[start:start + EXACT_BATCH_SIZE]
+            vectors = self.full.get(batch)
+            known = ~np.isnan(vectors).any(axis=1)
+            batch, vectors = batch[known], vectors[known]
+            exact = query_norms - 2 * x @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+            merged_distances = np.hstack([distances, np.maximum(exact, 0).astype("float32")])
+            merged_labels = np.hstack([labels, np.broadcast_to(batch, (len(x), len(batch)))])
+            order = np.argsort(merged_distances, axis=1)[:, :k]
+            distances = np.take_along_axis(merged_distances, order, axis=1)
+            labels = np.take_along_axis(merged_labels, order, axis=1)
+        return distances, labels
+
+    def reconstruct(self, key):
+        vector = self.full.get([key])[0]
+        if np.isnan(vector).any():
+            raise RuntimeError(f"id {key} not found")
+        return vector
+
+    def retrain(self):
+        """
+        Re-encodes every vector from its exact copy (re-fits int8 ranges after growth).
+        """
+        ids = self.full.live_ids()
+        coarse = self._new_coarse()
+        if len(ids) and not coarse.is_trained:
+            sample = ids
+            if len(ids) > MAX_TRAINING_POINTS:
+                sample = np.sort(np.random.default_rng(1234).choice(ids, MAX_TRAINING_POINTS, replace=False))
+            coarse.train(self.full.get(sample))
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            coarse.add_with_ids(self._codes_input(self.full.get(batch)), batch)
+        self.coarse = coarse
+        self.trained_on = len(ids)
+
+    def write(self, path):
+        """
+        Writes the codes to path after the full vectors to their own file.
+        """
+        self.full.write()
+        if self.storage == STORAGE_BINARY:
+            faiss.write_index_binary(self.coarse, str(path))
+        else:
+            faiss.write_index(self.coarse, str(path))
+
+    @classmethod
+    def read(cls, path, storage, vectors_file, rescore_factor=None, mmap=False):
+        reader = faiss.read_index_binary if storage == STORAGE_BINARY else faiss.read_index
+        coarse = read_index_mmap(path, reader) if mmap else reader(str(path))
+        return cls(coarse.d, storage, vectors_file, rescore_factor, coarse=coarse)
+
+    @classmethod
+    def from_index(cls, index, storage, vectors_file, rescore_factor=None):
+        """
+        Converts an ID-mapped float index into quantized storage.
+        """
+        quantized = cls(index.d, storage, vectors_file, rescore_factor)
+        ids = faiss.vector_to_array(index.id_map)
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            quantized.full.add(batch, reconstruct_vectors(index, batch))
+        quantized.retrain()
+        return quantized
+
+    def memory_stats(self):
+        """
+        RAM per vector of the codes versus float32, and the size of the on-disk copies.
+        """
+        bytes_per_vector = code_size(self.storage, self.d)
+        return {
+            "storage": self.storage,
+            "vectors": self.ntotal,
+            "bytes_per_vector": bytes_per_vector,
+            "float32_bytes_per_vector": 4 * self.d,
+            "compression": round(4 * self.d / bytes_per_vector, 1),
+            "resident_bytes": bytes_per_vector * self.ntotal,
+            "full_vectors_bytes": self.full.path.stat().st_size if self.full.path.exists() else 0,
+            "rescore_factor": self.rescore_factor,
+        }
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     vectors = np.random.default_rng(0).standard_normal((10000, 1024)).astype("float32")
+#     index = QuantizedIndex(1024, STORAGE_INT8, "faissDB/example_vectors.f32")
+#     index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+#     index.write("faissDB/example_index.bin")
+#     print(index.search(vectors[:1], 5))
+#     print(index.memory_stats())
@@ -0,0 +1,433 @@
+# sharded_faiss.py
+
+import contextvars
+import hashlib
+import heapq
+import json
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from monitoring.metrics import TRACER, span
+from retrieval.bm25_index import merge_term_stats, reciprocal_rank_fusion
+from retrieval.embedding_cache import QueryEmbeddingCache, embedding_model_name
+from retrieval.faiss_retriever import (
+    EMBEDDING_CACHE_PATH,
+    FAISS_DOCSTORE_PATH,
+    FAISS_INDEX_PATH,
+    LOAD_MEMORY,
+    LOAD_MMAP,
+    FilteredRetriever,
+    LangChainFAISSManager,
+)
+
+# Partitioning: by chunk source (all chunks of a page/PDF in one shard) or by chunk id hash
+SHARD_BY_SOURCE = "source"
+SHARD_BY_HASH = "hash"
+# Shards searched on threads of this process, or each in its own worker process
+WORKERS_THREAD = "thread"
+WORKERS_PROCESS = "process"
+
+
+def shard_path(path, shard):
+    path = Path(path)
+    return path.with_name(f"{path.stem}.shard{shard}{path.suffix}")
+
+
+def _invoke(shard, method, args, kwargs):
+    attr = getattr(shard, method)
+    return attr(*args, **kwargs) if callable(attr) else attr
+
+
+def _serve_shard(conn, manager_kwargs):
+    """
+    Entry point of a shard worker process: opens one shard and answers the parent's
+    (method, args, kwargs) calls until the pipe closes. Queries arrive already embedded.
+    """
+    try:
+        shard = LangChainFAISSManager(embedding_model=None, embedding_cache_file=None, **manager_kwargs)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ok", None))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        method, args, kwargs = message
+        try:
+            conn.send(("ok", _invoke(shard, method, args, kwargs)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _ShardProcess:
+    def __init__(self, context, manager_kwargs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve_shard, args=(child_conn, manager_kwargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def send(self, method, args=(), kwargs=None):
+        self.conn.send((method, args, kwargs or {}))
+
+    def receive(self):
+        status, value = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Shard worker {self.process.pid} failed: {value}")
+        return value
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ShardedFAISSManager:
+    def __init__(
+        self,
+        embedding_model,
+        num_shards=4,
+        shard_by=SHARD_BY_SOURCE,
+        workers=WORKERS_THREAD,
+        faiss_file=FAISS_INDEX_PATH,
+        docstore_file=FAISS_DOCSTORE_PATH,
+        dimension=1024,
+        initialize_new=False,
+        query_cache_size=1024,
+        query_cache_ttl=3600,
+        embedding_cache_file=EMBEDDING_CACHE_PATH,
+        load_mode=LOAD_MEMORY,
+        **shard_kwargs,
+    ):
+        """
+        Splits the corpus over num_shards LangChainFAISSManager indexes
+        (<faiss_file stem>.shard<i>.bin, ...). Queries are embedded once, fanned out to
+        every shard in parallel and the per-shard top-k lists are merged with a heap.
+        Writes only touch the shards that own the affected documents.
+        embedding_model: Embedding model shared by all shards
+        num_shards: Number of shards; fixed once the index exists
+        shard_by: "source" keeps all chunks of a source in one shard (the source is the
+            prefix of the chunk id), "hash" spreads chunks evenly by id
+        workers: "thread" searches shards on a thread pool; "process" opens each shard
+            in its own worker process (read-only, requires load_mode="mmap")
+        shard_kwargs: Passed to every shard (index_type, vector_storage, nprobe, ...)
+        """
+        if shard_by not in (SHARD_BY_SOURCE, SHARD_BY_HASH):
+            raise ValueError(f"Unknown shard_by {shard_by!r}, expected 'source' or 'hash'.")
+        if workers not in (WORKERS_THREAD, WORKERS_PROCESS):
+            raise ValueError(f"Unknown workers {workers!r}, expected 'thread' or 'process'.")
+        if workers == WORKERS_PROCESS and load_mode != LOAD_MMAP:
+            raise ValueError("Shard worker processes serve read-only shards; use load_mode='mmap'.")
+        self.embedding_model = embedding_model
+        self.model_name = embedding_model_name(embedding_model)
+        self.query_cache = QueryEmbeddingCache(max_entries=query_cache_size, ttl_seconds=query_cache_ttl)
+        self.faiss_file = Path(faiss_file)
+        self.docstore_file = Path(docstore_file)
+        self.layout_file = self.faiss_file.with_name(f"{self.faiss_file.stem}.shards.json")
+        self.num_shards = num_shards
+        self.shard_by = shard_by
+        self.workers = workers
+        self.load_mode = load_mode
+        self.read_only = load_mode == LOAD_MMAP
+        self.vector_storage = shard_kwargs.get("vector_storage", "float32")
+        self._check_layout(initialize_new)
+        self._retriever = None
+        self._fanout_lock = threading.Lock()
+        # Thread pool: shard calls in thread mode, parallel embedding + adds in either mode
+        self.executor = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="shard")
+
+        shard_configs = [
+            dict(
+                faiss_file=str(shard_path(self.faiss_file, i)),
+                docstore_file=str(shard_path(self.docstore_file, i)),
+                dimension=dimension,
+                initialize_new=initialize_new,
+                load_mode=load_mode,
+                **shard_kwargs,
+            )
+            for i in range(num_shards)
+        ]
+        self.shards = []
+        self.processes = []
+        if workers == WORKERS_PROCESS:
+            # spawn: the parent runs threads, which fork does not copy safely
+            context = multiprocessing.get_context("spawn")
+            self.processes = [_ShardProcess(context, config) for config in shard_configs]
+            # Shards load concurrently; wait until every worker reports ready
+            for process in self.processes:
+                process.receive()
+        else:
+            self.shards = list(self.executor.map(
+                lambda config: LangChainFAISSManager(
+                    embedding_model=embedding_model,
+                    query_cache_size=0,
+                    embedding_cache_file=embedding_cache_file,
+                    **config,
+                ),
+                shard_configs,
+            ))
+        self._saved_generation = [shard.generation for shard in self.shards]
+        if not self.read_only and not self.layout_file.exists():
+            self._write_layout()
+
+    def _check_layout(self, initialize_new):
+        """
+        Documents are placed by shard count and scheme, so both must match the stored index.
+        """
+        if initialize_new or not self.layout_file.exists():
+            return
+        layout = json.loads(self.layout_file.read_text())
+        if layout != {"num_shards": self.num_shards, "shard_by": self.shard_by}:
+            raise ValueError(
+                f"{self.faiss_file} is sharded as {layout}; open it with those settings "
+                f"or rebuild it with initialize_new=True."
+            )
+
+    def _write_layout(self):
+        self.layout_file.parent.mkdir(parents=True, exist_ok=True)
+        self.layout_file.write_text(json.dumps({"num_shards": self.num_shards, "shard_by": self.shard_by}))
+
+    def shard_for(self, doc_id):
+        """
+        Index of the shard that owns a docstore id.
+        """
+        key = doc_id.split(":", 1)[0] if self.shard_by == SHARD_BY_SOURCE else doc_id
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.num_shards
+
+    def _group(self, doc_ids):
+        groups = {}
+        for doc_id in doc_ids:
+            groups.setdefault(self.shard_for(doc_id), []).append(doc_id)
+        return groups
+
+    def _map(self, calls):
+        """
+        Runs {shard index: (method, args)} on the shards in parallel.
+        Returns {shard index: result}.
+        """
+        if self.processes:
+            # One query at a time on the pipes; each query still runs on every shard at once
+            with self._fanout_lock:
+                for i, (method, args) in calls.items():
+                    self.processes[i].send(method, args)
+                return {i: self.processes[i].receive() for i in calls}
+        futures = {
+            i: self.executor.submit(contextvars.copy_context().run, _invoke, self.shards[i], method, args, {})
+            for i, (method, args) in calls.items()
+        }
+        return {i: future.result() for i, future in futures.items()}
+
+    def _map_all(self, method, *args):
+        results = self._map({i: (method, args) for i in range(self.num_shards)})
+        return [results[i] for i in range(self.num_shards)]
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(
+                f"{self.faiss_file} shards are memory-mapped read-only; open them with load_mode='memory' to modify them."
+            )
+
+    def embed_query(self, query):
+        """
+        Embeds a query once for all shards, through the query-embedding cache.
+        """
+        vector = self.query_cache.get(self.model_name, query)
+        if vector is None:
+            with span("query_embedding"):
+                vector = self.embedding_model.embed_query(query)
+            self.query_cache.put(self.model_name, query, vector)
+        return vector
+
+    def query_cache_stats(self):
+        return self.query_cache.stats()
+
+    @property
+    def ntotal(self):
+        return sum(self._map_all("ntotal"))
+
+    def data_version(self):
+        return tuple(self._map_all("data_version"))
+
+    def refresh(self):
+        """
+        Re-opens every shard another process persisted since it was loaded.
+        """
+        return any(self._map_all("refresh"))
+
+    def memory_stats(self):
+        per_shard = self._map_all("memory_stats")
+        stats = dict(per_shard[0])
+        stats["vectors"] = sum(shard["vectors"] for shard in per_shard)
+        stats["resident_bytes"] = sum(shard["resident_bytes"] for shard in per_shard)
+        stats["shards"] = self.num_shards
+        stats["largest_shard"] = max(shard["vectors"] for shard in per_shard)
+        return stats
+
+    def has_id(self, doc_id):
+        i = self.shard_for(doc_id)
+        return self._map({i: ("has_id", (doc_id,))})[i]
+
+    def add_texts(self, texts, ids=None, metadatas=None):
+        """
+        Adds (or replaces) texts; each shard embeds and indexes its own part in parallel.
+        """
+        if not texts:
+            return []
+        self._check_writable()
+        texts = list(texts)
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+        if len(ids) != len(texts) or len(set(ids)) != len(ids):
+            raise ValueError("ids must be unique and match the number of texts.")
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        by_shard = {}
+        for doc_id, text, metadata in zip(ids, texts, metadatas):
+            shard_ids, shard_texts, shard_metadatas = by_shard.setdefault(self.shard_for(doc_id), ([], [], []))
+            shard_ids.append(doc_id)
+            shard_texts.append(text)
+            shard_metadatas.append(metadata)
+        self._map({
+            i: ("add_texts", (shard_texts, shard_ids, shard_metadatas))
+            for i, (shard_ids, shard_texts, shard_metadatas) in by_shard.items()
+        })
+        return ids
+
+    def delete(self, ids):
+        self._check_writable()
+        groups = self._group(ids)
+        return sum(self._map({i: ("delete", (shard_ids,)) for i, shard_ids in groups.items()}).values())
+
+    def persist(self, shards=None):
+        """
+        Saves the shards changed since they were loaded or last saved (or only the given
+        shard indexes); untouched shard files are left as they are.
+        """
+        self._check_writable()
+        if shards is None:
+            shards = [i for i, shard in enumerate(self.shards) if shard.generation != self._saved_generation[i]]
+        self._map({i: ("persist", ()) for i in shards})
+        for i in shards:
+            self._saved_generation[i] = self.shards[i].generation
+        self._write_layout()
+
+    def rebuild_shard(self, shard, index_type=None):
+        """
+        Rebuilds and saves one shard (e.g. to migrate it to IVF) while the others keep serving.
+        """
+        self._check_writable()
+        self.shards[shard].rebuild_index(index_type)
+        self.persist(shards=[shard])
+
+    def _merge(self, results, k, reverse=False):
+        """
+        k-way heap merge of per-shard (doc_id, score) lists that are each sorted best first.
+        """
+        return list(islice(heapq.merge(*results, key=lambda item: item[1], reverse=reverse), k))
+
+    def _documents_by_id(self, doc_ids):
+        """
+        Fetches {doc_id: Document} from the shards that own doc_ids; purged ids are left out.
+        """
+        groups = self._group(doc_ids)
+        results = self._map({i: ("documents_by_id", (shard_ids,)) for i, shard_ids in groups.items()})
+        documents = {}
+        for shard_documents in results.values():
+            documents.update(shard_documents)
+        return documents
+
+    def _documents(self, doc_ids):
+        """
+        Fetches documents from their shards, keeping the order of doc_ids.
+        """
+        documents = self._documents_by_id(doc_ids)
+        return [documents[doc_id] for doc_id in doc_ids if doc_id in documents]
+
+    def _dense(self, query, k, filter=None):
+        vector = [float(value) for value in self.embed_query(query)]
+        return self._merge(self._map_all("search_by_vector", vector, k, filter), k)
+
+    def similarity_search_with_score(self, query, k=5, filter=None):
+        """
+        Returns the top-k (Document, L2 distance) pairs over all shards, nearest first.
+        filter: Optional metadata filter, applied inside each shard's FAISS search
+        """
+        nearest = self._dense(query, k, filter=filter)
+        documents = self._documents_by_id([doc_id for doc_id, _ in nearest])
+        return [(documents[doc_id], score) for doc_id, score in nearest if doc_id in documents]
+
+    def similarity_search(self, query, k=5, filter=None):
+        return [document for document, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def hybrid_search(self, query, k=5, mode="auto", candidates=20, rrf_k=60, filter=None):
+        """
+        LangChainFAISSManager.hybrid_search over all shards: BM25 and vector candidates
+        are heap-merged across shards, then fused with reciprocal rank fusion.
+        Every shard scores BM25 with the document frequencies and lengths of the whole
+        corpus, so its scores (and the keyword margin) compare across shards.
+        """
+        if mode == "vector":
+            return self.similarity_search(query, k=k, filter=filter)
+        candidates = max(candidates, k)
+        with span("bm25_search"):
+            stats = merge_term_stats(self._map_all("lexical_stats", query))
+            lexical = self._merge(
+                self._map_all("lexical_search", query, candidates, filter, stats), candidates, reverse=True
+            )
+        if mode == "auto" and lexical:
+            # The shard holding the best lexical hit checks it covers every query term
+            owner = self.shard_for(lexical[0][0])
+            keyword = self._map({owner: ("is_keyword_query", (query, lexical))})[owner]
+        else:
+            keyword = False
+        if mode == "lexical" or keyword:
+            TRACER.annotate(path="lexical")
+            return self._documents([doc_id for doc_id, _ in lexical[:k]])
+        TRACER.annotate(path="hybrid")
+        with span("vector_search"):
+            dense = self._dense(query, candidates, filter=filter)
+        fused = reciprocal_rank_fusion([[doc_id for doc_id, _ in lexical], [doc_id for doc_id, _ in dense]], k=rrf_k)
+        return self._documents([doc_id for doc_id, _ in fused[:k]])
+
+    def metadata_values(self, field):
+        counts = {}
+        for values in self._map_all("metadata_values", field):
+            for value, count in values.items():
+                counts[value] = counts.get(value, 0) + count
+        return counts
+
+    def as_retriever(self, k=4, filter=None):
+        if filter or k != 4:
+            return FilteredRetriever(manager=self, k=k, filter=filter)
+        if self._retriever is None:
+            self._retriever = FilteredRetriever(manager=self)
+        return self._retriever
+
+    def close(self):
+        for process in self.processes:
+            process.close()
+        self.executor.shutdown(wait=False)
+
+
+# Example usage:
+# if __name__ == "__main__":
+#     from langchain_ollama import OllamaEmbeddings
+#     manager = ShardedFAISSManager(
+#         embedding_model=OllamaEmbeddings(model="mxbai-embed-large"),
+#         num_shards=4,
+#         faiss_file="faissDB/sharded_index.bin",
+#         docstore_file="faissDB/sharded_docstore.pkl",
+#     )
+#     manager.add_texts(["Cloud migration services.", "Rate card for consulting in EUR."])
+#     manager.persist()
+#     print(manager.hybrid_search("consulting rates", k=2))
@@ -0,0 +1,250 @@
+# sql_plan_cache.py
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from monitoring.metrics import TRACER, span
+
+# Runtime caches live next to the FAISS files, not in the (read-only) package directory
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", Path(__file__).parent.parent / "faissDB")).absolute()
+PLAN_CACHE_PATH = CACHE_DIR / "sql_plan_cache.json"
+
+# Literal shapes that are parameterized even when they are not known DB values
+_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_QUOTED_RE = re.compile(r"""["']([^"']{1,80})["']""")
+# Text columns with at most this many distinct values are treated as entity vocabularies
+_MAX_ENTITY_VALUES = 500
+
+
+class QuestionTemplater:
+    def __init__(self, entity_values):
+        """
+        entity_values: {(table, column): [values]} of known entities (names, statuses, ...)
+        """
+        vocabulary = {}
+        for (table, column), values in entity_values.items():
+            for value in values:
+                if isinstance(value, str) and len(value.strip()) > 1:
+                    vocabulary.setdefault(value.strip().lower(), (f"{table}.{column}", value.strip()))
+        # Longest values first so "Mobile App Development" wins over "App".
+        # Short values ("IT", "HR") only match with their exact case, so "it" stays a word.
+        ordered = sorted(vocabulary, key=len, reverse=True)
+        alternatives = [
+            re.escape(key) if len(key) > 3 else f"(?-i:{re.escape(vocabulary[key][1])})"
+            for key in ordered
+        ]
+        self.vocabulary = vocabulary
+        self.entity_re = (
+            re.compile(r"\b(" + "|".join(alternatives) + r")\b", re.IGNORECASE)
+            if ordered else None
+        )
+
+    @classmethod
+    def from_sql_manager(cls, sql_manager):
+        """
+        Builds the entity vocabulary from low-cardinality text columns of the database.
+        """
+        entity_values = {}
+        for table, columns in sql_manager.text_columns().items():
+            for column in columns:
+                values = sql_manager.distinct_values(table, column, limit=_MAX_ENTITY_VALUES + 1)
+                if 0 < len(values) <= _MAX_ENTITY_VALUES:
+                    entity_values[(table, column)] = values
+        return cls(entity_values)
+
+    def template(self, question):
+        """
+        Returns (template, params): the question with entities replaced by typed
+        placeholders, and the ordered (placeholder, value) pairs that were replaced.
+        """
+        params = []
+
+        def replace(kind, value):
+            params.append((kind, value))
+            return f" {{{kind}}} "
+
+        text = question
+        if self.entity_re is not None:
+            text = self.entity_re.sub(lambda m: replace(*self.vocabulary[m.group(1).lower()]), text)
+        text = _QUOTED_RE.sub(lambda m: replace("STR", m.group(1)), text)
+        text = _DATE_RE.sub(lambda m: replace("DATE", m.group(0)), text)
+        text = _NUMBER_RE.sub(lambda m: replace("NUM", m.group(0)), text)
+        text = re.sub(r"[^\w{}.\s]", " ", text.lower())
+        return re.sub(r"\s+", " ", text).strip(), params
+
+
+def parameterize_sql(sql, params):
+    """
+    Replaces the literal values of params in sql with :p0, :p1, ... bind parameters.
+    Returns None if a value does not appear as a literal, since the SQL then cannot be
+    safely reused for other values.
+    """
+    for position, (kind, value) in enumerate(params):
+        if kind in ("NUM",):
+            pattern = re.compile(r"(?<![\w.'])" + re.escape(value) + r"(?![\w.'])")
+        else:
+            pattern = re.compile(r"'" + re.escape(value.replace("'", "''")) + r"'", re.IGNORECASE)
+        sql, count = pattern.subn(f":p{position}", sql)
+        if count == 0:
+            return None
+    return sql
+
+
+def is_select(sql):
+    statement = sql.strip().rstrip(";").strip()
+    return statement.lower().startswith(("select", "with")) and ";" not in statement
+
+
+def final_sql_from_steps(intermediate_steps):
+    """
+    Returns the last SQL the agent ran successfully with the sql_db_query tool, if any.
+    """
+    final_sql = None
+    for action, observation in intermediate_steps:
+        if getattr(action, "tool", None) != "sql_db_query":
+            continue
+        sql = action.tool_input
+        if isinstance(sql, dict):
+            sql = sql.get("query", "")
+        if isinstance(observation, str) and observation.lstrip().lower().startswith("error"):
+            continue
+        final_sql = sql.strip().strip("`").strip()
+    return final_sql
+
+
+class SQLPlanCache:
+    def __init__(self, cache_file=PLAN_CACHE_PATH):
+        """
+        Maps (schema version, question template) -> parameterized SELECT statement.
+        cache_file: JSON file the plans are persisted to (None keeps them in memory only)
+        """
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._plans = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_file and self.cache_file.exists():
+            with open(self.cache_file, encoding="utf-8") as f:
+                self._plans = json.load(f)
+
+    @staticmethod
+    def _key(schema_version, template):
+        return f"{schema_version}|{template}"
+
+    def get(self, schema_version, template):
+        with self._lock:
+            sql = self._plans.get(self._key(schema_version, template))
+            if sql is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return sql
+
+    def put(self, schema_version, template, sql):
+        with self._lock:
+            self._plans[self._key(schema_version, template)] = sql
+            self._save()
+
+    def discard(self, schema_version, template):
+        with self._lock:
+            if self._plans.pop(self._key(schema_version, template), None) is not None:
+                self._save()
+
+    def _save(self):
+        if self.cache_file is None:
+            return
+        # Per-process temp file: several server workers may save at the same time
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self._plans, f, indent=2)
+        tmp_file.replace(self.cache_file)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._plans),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def format_rows(rows, max_rows=50):
+    """
+    Renders query rows as compact text for the answer context.
+    """
+    if not rows:
+        return "The query returned no rows."
+    lines = [", ".join(f"{column}: {value}" for column, value in row.items()) for row in rows[:max_rows]]
+    if len(rows) > max_rows:
+        lines.append(f"... {len(rows) - max_rows} more rows")
+    return "\n".join(lines)
+
+
+class CachedSQLAgent:
+    def __init__(self, sql_manager, agent, plan_cache=None, agent_factory=None):
+        """
+        Answers questions with a cached, validated SQL plan when the question's template
+        has been answered before, and falls back to the ReAct agent on a miss or error.
+        agent: AgentExecutor created with return_intermediate_steps=True
+        agent_factory: Optional callable that rebuilds the agent when the schema version
+            changes (its prompt embeds the schema digest)
+        """
+        self.sql_manager = sql_manager
+        self.agent = agent
+        self.agent_factory = agent_factory
+        self._agent_schema_version = sql_manager.schema_version()
+        self.plan_cache = plan_cache or SQLPlanCache()
+        self._templater = None
+        self._templater_version = None
+        self._lock = threading.Lock()
+
+    def _current_templater(self):
+        version = self.sql_manager.data_version()
+        with self._lock:
+            if self._templater is None or self._templater_version != version:
+                self._templater = QuestionTemplater.from_sql_manager(self.sql_manager)
+                self._templater_version = version
+            return self._templater
+
+    def invoke(self, question):
+        if isinstance(question, dict):
+            question = question["input"]
+        with span("sql_agent"):
+            return self._invoke(question)
+
+    def _invoke(self, question):
+        schema_version = self.sql_manager.schema_version()
+        template, params = self._current_templater().template(question)
+
+        sql = self.plan_cache.get(schema_version, template)
+        if sql is not None:
+            try:
+                rows = self.sql_manager.run_select_query(
+                    sql, {f"p{position}": value for position, (_, value) in enumerate(params)}
+                )
+                TRACER.annotate(source="plan_cache")
+                return {"input": question, "output": format_rows(rows), "sql": sql, "source": "plan_cache"}
+            except Exception as e:
+                print(f"Cached SQL plan failed ({e}); falling back to the agent.")
+                self.plan_cache.discard(schema_version, template)
+
+        if self.agent_factory is not None and schema_version != self._agent_schema_version:
+            self.agent = self.agent_factory()
+            self._agent_schema_version = schema_version
+        TRACER.annotate(source="agent")
+        result = self.agent.invoke({"input": question})
+        final_sql = final_sql_from_steps(result.get("intermediate_steps", []))
+        if final_sql and is_select(final_sql):
+            plan = parameterize_sql(final_sql, params)
+            if plan is not None:
+                self.plan_cache.put(schema_version, template, plan)
+        return {"input": question, "output": result.get("output"), "sql": final_sql, "source": "agent"}
+
+    def run(self, question):
+        return self.invoke(question)["output"]
@@ -3,12 +3,46 @@ from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from langchain_community.utilities import SQLDatabase
 from langchain.agents.agent_types import AgentType
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from sqlalchemy import create_engine
+from sqlalchemy import String, create_engine, inspect, text
+from sqlalchemy.pool import QueuePool
+import hashlib
+import json
 import sqlite3
+from contextlib import closing
+from monitoring.callbacks import MetricsCallbackHandler
+from retrieval.sql_plan_cache import CachedSQLAgent, SQLPlanCache
+from retrieval.sql_schema_digest import (
+    SCHEMA_DIGEST_PATH,
+    SQL_DIGEST_SUFFIX,
+    DigestSQLDatabaseToolkit,
+    build_schema_digest,
+    digest_prefix,
+    load_cached_digest,
+    save_cached_digest,
+)
 
 LOCALDB = "USE_LOCALDB"
 MYSQL = "USE_MYSQL"
 
+# Applied to every pooled SQLite connection
+SQLITE_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # 256 MB, shared through the OS page cache
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _sqlite_connect(dbfilepath, read_only):
+    mode = "ro" if read_only else "rw"
+    conn = sqlite3.connect(f"file:{dbfilepath}?mode={mode}", uri=True, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only=1")
+    return conn
+
 class LangChainSQLManager:
     def __init__(
         self,
@@ -18,9 +52,16 @@ class LangChainSQLManager:
         mysql_user=None,
         mysql_password=None,
         mysql_db=None,
+        pool_size=8,
+        max_overflow=8,
+        pool_recycle=1800,
+        pool_timeout=30,
     ):
         """
         Initialize the manager and connect to the database.
+        pool_size / max_overflow: Pooled read connections (SQLite) or connections (MySQL)
+        pool_recycle: Seconds after which a pooled connection is replaced
+        pool_timeout: Seconds to wait for a free connection before failing
         """
         self.db_type = db_type
         self.sqlite_file = sqlite_file
@@ -28,59 +69,212 @@ class LangChainSQLManager:
         self.mysql_user = mysql_user
         self.mysql_password = mysql_password
         self.mysql_db = mysql_db
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
+        self.write_engine = None
         self.db = self._configure_db()
+        self._schema_version = None
+        self._schema_data_version = None
+        self._schema_digest = None
+        self._schema_digest_version = None
 
     def _configure_db(self):
         """
         Returns a LangChain SQLDatabase object for the selected database.
+        SQLite: WAL mode, a pool of read-only connections for queries (and the agent),
+        and a single-connection write engine, so readers never block on each other or on writes.
+        MySQL: one engine with explicit pool sizing, recycling and pre-ping.
         """
+        pool_kwargs = {
+            "poolclass": QueuePool,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_recycle": self.pool_recycle,
+            "pool_timeout": self.pool_timeout,
+        }
         if self.db_type == LOCALDB:
             dbfilepath = (Path(__file__).parent / "inventers.db").absolute()
-            creator = lambda: sqlite3.connect(f"file:{dbfilepath}?mode=rw", uri=True)
-            return SQLDatabase(create_engine("sqlite:///", creator=creator))
+            self.sqlite_path = dbfilepath
+            # journal_mode is persistent, so switching to WAL once is enough
+            with closing(sqlite3.connect(f"file:{dbfilepath}?mode=rw", uri=True)) as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+            self.write_engine = create_engine(
+                "sqlite://",
+                creator=lambda: _sqlite_connect(dbfilepath, read_only=False),
+                poolclass=QueuePool,
+                pool_size=1,
+                max_overflow=0,
+                pool_recycle=self.pool_recycle,
+                pool_timeout=self.pool_timeout,
+            )
+            read_engine = create_engine(
+                "sqlite://",
+                creator=lambda: _sqlite_connect(dbfilepath, read_only=True),
+                **pool_kwargs,
+            )
+            return SQLDatabase(read_engine)
         elif self.db_type == MYSQL:
             if not (self.mysql_host and self.mysql_user and self.mysql_password and self.mysql_db):
                 raise ValueError("Please provide all MySQL connection details.")
-            return SQLDatabase(
-                create_engine(
-                    f"mysql+mysqlconnector://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}/{self.mysql_db}"
-                )
+            engine = create_engine(
+                f"mysql+mysqlconnector://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}/{self.mysql_db}",
+                pool_pre_ping=True,
+                **pool_kwargs,
             )
+            self.write_engine = engine
+            return SQLDatabase(engine)
         else:
             raise ValueError("Unknown DB type")
 
-    def run_select_query(self, query: str):
+    def data_version(self):
         """
-        Runs a SELECT query and returns the result as a list of dicts.
+        Token that changes whenever the database contents change.
+        SQLite: file mtimes (including the WAL); MySQL: latest table UPDATE_TIME.
         """
+        if self.db_type == LOCALDB:
+            paths = [self.sqlite_path, Path(f"{self.sqlite_path}-wal")]
+            return tuple(p.stat().st_mtime_ns if p.exists() else 0 for p in paths)
         with self.db.engine.connect() as conn:
-            result = conn.execute(query)
-            columns = result.keys()
-            return [dict(zip(columns, row)) for row in result.fetchall()]
+            row = conn.execute(
+                text("SELECT MAX(UPDATE_TIME), SUM(TABLE_ROWS) FROM information_schema.tables WHERE table_schema = :db"),
+                {"db": self.mysql_db},
+            ).fetchone()
+        return tuple(str(value) for value in row)
 
-    def run_modify_query(self, query: str):
+    def schema_version(self):
+        """
+        Hash of the tables and their column names/types.
+        Recomputed only when data_version() moves, since DDL changes the DB file too.
+        """
+        data_version = self.data_version()
+        if self._schema_version is None or data_version != self._schema_data_version:
+            inspector = inspect(self.db.engine)
+            schema = {
+                table: [(column["name"], str(column["type"])) for column in inspector.get_columns(table)]
+                for table in sorted(inspector.get_table_names())
+            }
+            self._schema_version = hashlib.sha256(json.dumps(schema).encode("utf-8")).hexdigest()[:16]
+            self._schema_data_version = data_version
+        return self._schema_version
+
+    def text_columns(self):
+        """
+        Returns {table: [text column names]}.
+        """
+        inspector = inspect(self.db.engine)
+        return {
+            table: [column["name"] for column in inspector.get_columns(table) if isinstance(column["type"], String)]
+            for table in inspector.get_table_names()
+        }
+
+    def distinct_values(self, table, column, limit=500):
+        """
+        Returns up to limit distinct non-null values of table.column.
+        """
+        preparer = self.db.engine.dialect.identifier_preparer
+        query = (
+            f"SELECT DISTINCT {preparer.quote(column)} FROM {preparer.quote(table)} "
+            f"WHERE {preparer.quote(column)} IS NOT NULL LIMIT {int(limit)}"
+        )
+        with self.db.engine.connect() as conn:
+            return [row[0] for row in conn.execute(text(query))]
+
+    def iter_select_query(self, query: str, params=None, batch_size=500, as_columns=False):
+        """
+        Streams a SELECT query with fetchmany instead of materializing the whole result.
+        Yields one dict per row, or with as_columns=True one {column: [values]} per batch.
+        """
+        with self.db.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(query), params or {})
+            columns = list(result.keys())
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                if as_columns:
+                    yield {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+                else:
+                    for row in rows:
+                        yield dict(zip(columns, row))
+
+    def run_select_query(self, query: str, params=None):
+        """
+        Runs a SELECT query and returns the result as a list of dicts.
+        params: Optional bind parameters for :name placeholders in the query
+        """
+        return list(self.iter_select_query(query, params=params))
+
+    def run_modify_query(self, query: str, params=None):
         """
         Runs an INSERT/UPDATE/DELETE query and commits the change.
         Returns the number of affected rows.
         """
-        with self.db.engine.connect() as conn:
-            result = conn.execute(query)
-            conn.commit()
+        with self.write_engine.begin() as conn:
+            result = conn.execute(text(query), params or {})
             return result.rowcount
 
-    def get_sql_agent(self, llm, verbose=False):
+    def schema_digest(self, sample_rows=2, cache_file=SCHEMA_DIGEST_PATH):
         """
-        Returns a LangChain SQL agent for LLM-powered querying.
-        Pass your LLM as the argument.
+        Compact schema + foreign keys + sample rows, computed once per schema version.
+        The digest is also cached on disk so other processes skip the introspection.
         """
-        toolkit = SQLDatabaseToolkit(db=self.db, llm=llm)
-        agent = create_sql_agent(
+        schema_version = self.schema_version()
+        if self._schema_digest is None or self._schema_digest_version != schema_version:
+            digest = load_cached_digest(cache_file, schema_version) if cache_file else None
+            if digest is None:
+                digest = build_schema_digest(self.db.engine, sample_rows=sample_rows)
+                if cache_file:
+                    save_cached_digest(cache_file, schema_version, digest)
+            self._schema_digest = digest
+            self._schema_digest_version = schema_version
+        return self._schema_digest
+
+    def _create_agent(self, llm, verbose=False, use_schema_digest=True, agent_executor_kwargs=None):
+        if use_schema_digest:
+            # Schema is injected into the prompt, so the agent skips the list/schema tool turns
+            toolkit = DigestSQLDatabaseToolkit(db=self.db, llm=llm)
+            prompt_kwargs = {"prefix": digest_prefix(self.schema_digest()), "suffix": SQL_DIGEST_SUFFIX}
+        else:
+            toolkit = SQLDatabaseToolkit(db=self.db, llm=llm)
+            prompt_kwargs = {}
+        # Per-step latency and token usage of every tool call and LLM turn
+        agent_executor_kwargs = {**(agent_executor_kwargs or {}), "callbacks": [MetricsCallbackHandler("sql_agent")]}
+        return create_sql_agent(
             llm=llm,
             toolkit=toolkit,
             verbose=verbose,
-            agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION
+            agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+            agent_executor_kwargs=agent_executor_kwargs,
+            **prompt_kwargs,
         )
-        return agent
+
+    def get_sql_agent(self, llm, verbose=False, use_schema_digest=True):
+        """
+        Returns a LangChain SQL agent for LLM-powered querying.
+        Pass your LLM as the argument.
+        use_schema_digest: Put the precomputed schema digest in the prompt instead of
+            letting the agent call sql_db_list_tables / sql_db_schema on every question
+        """
+        return self._create_agent(llm, verbose=verbose, use_schema_digest=use_schema_digest)
+
+    def get_cached_sql_agent(self, llm, verbose=False, plan_cache=None, use_schema_digest=True):
+        """
+        Returns a SQL agent that reuses validated SQL for known question shapes.
+        Questions whose template (entities parameterized) was answered before run the
+        cached SELECT directly via run_select_query with no LLM call; everything else
+        goes through the ReAct agent, whose final SQL is then cached.
+        """
+        def agent_factory():
+            return self._create_agent(
+                llm,
+                verbose=verbose,
+                use_schema_digest=use_schema_digest,
+                agent_executor_kwargs={"return_intermediate_steps": True},
+            )
+
+        return CachedSQLAgent(self, agent_factory(), plan_cache=plan_cache or SQLPlanCache(), agent_factory=agent_factory)
 
 # Example usage in another file:
 # from your_module import LangChainSQLManager
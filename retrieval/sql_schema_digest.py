@@ -0,0 +1,110 @@
+# sql_schema_digest.py
+
+import json
+import os
+from pathlib import Path
+from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from sqlalchemy import inspect, text
+from retrieval.sql_plan_cache import CACHE_DIR
+
+SCHEMA_DIGEST_PATH = CACHE_DIR / "schema_digest.json"
+
+# Tools made redundant by the digest: each call would be one more LLM turn
+DIGEST_REPLACED_TOOLS = ("sql_db_list_tables", "sql_db_schema")
+
+SQL_DIGEST_PREFIX = """You are an agent designed to interact with a SQL database.
+Given an input question, create a syntactically correct {dialect} query to run, then look at the results of the query and return the answer.
+Unless the user specifies a specific number of examples they wish to obtain, always limit your query to at most {top_k} results.
+You can order the results by a relevant column to return the most interesting examples in the database.
+Never query for all the columns from a specific table, only ask for the relevant columns given the question.
+
+The complete database schema (tables, columns, keys and sample rows) is:
+
+<<SCHEMA_DIGEST>>
+
+Only use the tables and columns listed above. The schema is complete, so do not list tables or fetch schemas.
+You have access to tools for interacting with the database.
+Only use the below tools. Only use the information returned by the below tools to construct your final answer.
+You MUST double check your query before executing it. If you get an error while executing a query, rewrite the query and try again.
+
+DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
+
+If the question does not seem related to the database, just return "I don't know" as the answer.
+"""
+
+SQL_DIGEST_SUFFIX = """Begin!
+
+Question: {input}
+Thought: The schema is listed above, so I can write the query directly.
+{agent_scratchpad}"""
+
+
+class DigestSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """
+    SQL toolkit without the list-tables/schema tools; the schema digest in the prompt replaces them.
+    """
+
+    def get_tools(self):
+        return [tool for tool in super().get_tools() if tool.name not in DIGEST_REPLACED_TOOLS]
+
+
+def _short(value, width=40):
+    value = repr(value) if isinstance(value, str) else str(value)
+    return value if len(value) <= width else value[: width - 3] + "..."
+
+
+def build_schema_digest(engine, sample_rows=2):
+    """
+    Compact one-line-per-table description of the schema:
+    columns with types, primary keys, foreign keys, and a few sample rows.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    lines = []
+    with engine.connect() as conn:
+        for table in sorted(inspector.get_table_names()):
+            primary_keys = set(inspector.get_pk_constraint(table).get("constrained_columns") or [])
+            foreign_keys = {}
+            for fk in inspector.get_foreign_keys(table):
+                for column, referred in zip(fk["constrained_columns"], fk["referred_columns"]):
+                    foreign_keys[column] = f"{fk['referred_table']}.{referred}"
+            columns = []
+            for column in inspector.get_columns(table):
+                name = column["name"]
+                spec = f"{name} {column['type']}"
+                if name in primary_keys:
+                    spec += " PK"
+                if name in foreign_keys:
+                    spec += f" -> {foreign_keys[name]}"
+                columns.append(spec)
+            line = f"{table}({', '.join(columns)})"
+            if sample_rows:
+                rows = conn.execute(text(f"SELECT * FROM {preparer.quote(table)} LIMIT {int(sample_rows)}")).fetchall()
+                if rows:
+                    samples = "; ".join("(" + ", ".join(_short(value) for value in row) + ")" for row in rows)
+                    line += f" e.g. {samples}"
+            lines.append(line)
+    # The digest ends up inside prompt templates, so it must not contain format braces
+    return "\n".join(lines).replace("{", "(").replace("}", ")")
+
+
+def digest_prefix(digest):
+    return SQL_DIGEST_PREFIX.replace("<<SCHEMA_DIGEST>>", digest)
+
+
+def load_cached_digest(cache_file, schema_version):
+    cache_file = Path(cache_file)
+    if not cache_file.exists():
+        return None
+    with open(cache_file, encoding="utf-8") as f:
+        cached = json.load(f)
+    return cached.get("digest") if cached.get("schema_version") == schema_version else None
+
+
+def save_cached_digest(cache_file, schema_version, digest):
+    cache_file = Path(cache_file)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"schema_version": schema_version, "digest": digest}, f, indent=2)
+    tmp_file.replace(cache_file)
@@ -203,4 +203,8 @@ for name, contact, project_id, status in clients:
 connection.commit()
 connection.close()
 
+# The pricing tables (PRICE_SOURCE, SERVICE_PRICE, RESOURCE_RATE, EXCHANGE_RATE and the
+# *_BY_CURRENCY lookup tables) live in the same database; they are kept across re-runs and
+# filled from the price lists and rate cards with: python -m retrieval.pricing_tables WithoutBranding
+
 print("Database 'inventers.db' created and populated successfully!")
@@ -0,0 +1,237 @@
+# sqlite_docstore.py
+
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    # SQLite caps the number of bound parameters per statement
+    _BATCH = 500
+    # Generations a reader may lag behind and still resolve hits on rows deleted since
+    _KEEP_TOMBSTONES = 1
+
+    def __init__(self, db_file, faiss_id_fn, read_only=False, mmap_size=256 * 1024 * 1024):
+        """
+        LangChain docstore that keeps documents in SQLite and fetches them lazily by id.
+        Opening it costs a file open, not a full unpickle, and processes that open the same
+        file share its pages through the OS cache (and SQLite's mmap).
+        db_file: SQLite file holding the documents
+        faiss_id_fn: Maps a docstore id to its int64 FAISS id
+        read_only: Open the file read-only (for serving workers)
+        Deleted rows are kept as tombstones stamped with the generation that deletes them
+        and purged by publish() once readers have moved past it.
+        """
+        self.db_file = Path(db_file)
+        self.faiss_id_fn = faiss_id_fn
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        if read_only:
+            uri = f"file:{self.db_file}?mode=ro"
+        else:
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            uri = f"file:{self.db_file}?mode=rwc"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        if not read_only:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    faiss_id INTEGER NOT NULL UNIQUE,
+                    page_content TEXT NOT NULL,
+                    metadata TEXT,
+                    deleted_generation INTEGER
+                )
+            """)
+            if not self._has_tombstones():
+                self._conn.execute("ALTER TABLE documents ADD COLUMN deleted_generation INTEGER")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS docstore_meta (key TEXT PRIMARY KEY, value INTEGER)")
+            self._conn.commit()
+        self._live = " AND deleted_generation IS NULL" if self._has_tombstones() else ""
+
+    def _has_tombstones(self):
+        columns = self._conn.execute("PRAGMA table_info(documents)").fetchall()
+        return any(column[1] == "deleted_generation" for column in columns)
+
+    def published_generation(self):
+        """
+        Generation of the last publish() a writer committed (0 if there was none).
+        """
+        with self._lock:
+            if not self._live and self.read_only:
+                # The writer may have upgraded the file since it was opened
+                self._live = " AND deleted_generation IS NULL" if self._has_tombstones() else ""
+            try:
+                row = self._conn.execute("SELECT value FROM docstore_meta WHERE key = 'generation'").fetchone()
+            except sqlite3.OperationalError:
+                return 0
+        return row[0] if row else 0
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        page_content, metadata = row
+        return Document(id=search, page_content=page_content, metadata=json.loads(metadata) if metadata else {})
+
+    def add(self, texts):
+        rows = [
+            (doc_id, self.faiss_id_fn(doc_id), doc.page_content, json.dumps(doc.metadata or {}))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            # Re-adding a deleted id replaces its tombstone
+            self._delete_rows(list(texts), " AND deleted_generation IS NOT NULL")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, faiss_id, page_content, metadata) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Tried to add ids that already exist: {e}")
+
+    def delete(self, ids):
+        """
+        Tombstones ids for the next generation; search() and doc_id_for() still find them.
+        """
+        ids = list(ids)
+        generation = self.published_generation() + 1
+        with self._lock:
+            for start in range(0, len(ids), self._BATCH):
+                batch = ids[start:start + self._BATCH]
+                self._conn.execute(
+                    f"UPDATE documents SET deleted_generation = ? "
+                    f"WHERE doc_id IN ({','.join('?' * len(batch))}) AND deleted_generation IS NULL",
+                    [generation, *batch],
+                )
+
+    def _delete_rows(self, ids, condition=""):
+        for start in range(0, len(ids), self._BATCH):
+            batch = ids[start:start + self._BATCH]
+            self._conn.execute(
+                f"DELETE FROM documents WHERE doc_id IN ({','.join('?' * len(batch))}){condition}", batch
+            )
+
+    def doc_id_for(self, faiss_id):
+        with self._lock:
+            row = self._conn.execute("SELECT doc_id FROM documents WHERE faiss_id = ?", (int(faiss_id),)).fetchone()
+        return row[0] if row else None
+
+    def contains(self, doc_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT 1 FROM documents WHERE doc_id = ?{self._live}", (doc_id,)).fetchone()
+        return row is not None
+
+    def iter_ids(self):
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(f"SELECT doc_id FROM documents WHERE 1{self._live}")]
+        return iter(ids)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM documents WHERE 1{self._live}").fetchone()[0]
+
+    def clear(self):
+        """
+        Tombstones every document; like delete(), this takes effect at the next publish().
+        """
+        self.delete(self.iter_ids())
+
+    def import_documents(self, documents):
+        """
+        Bulk-loads {doc_id: Document} (e.g. a legacy pickled docstore) and commits.
+        """
+        self.add(documents)
+        self.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def publish(self, generation):
+        """
+        Commits pending changes as generation and purges tombstones older than the
+        generations readers may still be searching.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO docstore_meta (key, value) VALUES ('generation', ?)", (generation,)
+            )
+            self._conn.execute(
+                "DELETE FROM documents WHERE deleted_generation <= ?", (generation - self._KEEP_TOMBSTONES,)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FaissIdToDocstoreId(MutableMapping):
+    """
+    index_to_docstore_id view over a SQLiteDocstore, looked up lazily per hit.
+    The docstore is the source of truth: writes are recorded by SQLiteDocstore.add,
+    so assignments and deletions on this view only have to be accepted.
+    """
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, faiss_id):
+        doc_id = self.docstore.doc_id_for(faiss_id)
+        if doc_id is None:
+            raise KeyError(faiss_id)
+        return doc_id
+
+    def __setitem__(self, faiss_id, doc_id):
+        pass
+
+    def __delitem__(self, faiss_id):
+        pass
+
+    def __iter__(self):
+        return (self.docstore.faiss_id_fn(doc_id) for doc_id in self.docstore.iter_ids())
+
+    def __len__(self):
+        return len(self.docstore)
+
+
+class DocstoreIdToFaissId(MutableMapping):
+    """
+    docstore_id_to_index view over a SQLiteDocstore (FAISS ids are derived from docstore ids).
+    """
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, doc_id):
+        if not self.docstore.contains(doc_id):
+            raise KeyError(doc_id)
+        return self.docstore.faiss_id_fn(doc_id)
+
+    def __contains__(self, doc_id):
+        return self.docstore.contains(doc_id)
+
+    def __setitem__(self, doc_id, faiss_id):
+        pass
+
+    def __delitem__(self, doc_id):
+        pass
+
+    def pop(self, doc_id, *default):
+        return self.docstore.faiss_id_fn(doc_id)
+
+    def __iter__(self):
+        return self.docstore.iter_ids()
+
+    def __len__(self):
+        return len(self.docstore)
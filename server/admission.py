@@ -0,0 +1,64 @@
+# admission.py
+
+import asyncio
+from monitoring.metrics import METRICS
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request cannot be admitted; the server answers 503 with Retry-After.
+    """
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=4, max_queue=32, queue_timeout=30.0):
+        """
+        Bounds the work one server process takes on.
+        max_concurrent: Requests processed at the same time (retrieval + LLM)
+        max_queue: Requests allowed to wait for a slot; beyond that they are rejected at once
+        queue_timeout: Seconds a queued request waits before it is rejected
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _reject(self, reason):
+        self.rejected += 1
+        METRICS.inc("http_rejected_total", reason=reason)
+        raise Overloaded(reason, retry_after=max(1, int(self.queue_timeout // 4)))
+
+    async def acquire(self):
+        """
+        Waits for a processing slot. Raises Overloaded when the queue is full or the wait times out.
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self._reject("queue_full")
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("queue_timeout")
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
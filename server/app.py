@@ -0,0 +1,282 @@
+# app.py
+
+import argparse
+import asyncio
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_ollama import OllamaEmbeddings
+from pydantic import BaseModel, Field, HttpUrl
+from monitoring.metrics import METRICS
+from orchestration.Orchestrator import Orchestrator
+from retrieval.faiss_retriever import LOAD_MMAP
+from retrieval.quantized_index import STORAGE_FLOAT32
+from retrieval.sharded_faiss import WORKERS_THREAD
+from server.admission import AdmissionController, Overloaded
+from server.ingest_worker import EXIT_LOCKED, is_ingest_running
+
+# Settings are read from the environment so every uvicorn worker process sees the same ones
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "mxbai-embed-large")
+MAX_CONCURRENT = int(os.environ.get("SERVER_MAX_CONCURRENT", "4"))
+MAX_QUEUE = int(os.environ.get("SERVER_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.environ.get("SERVER_QUEUE_TIMEOUT", "30"))
+REFRESH_INTERVAL = float(os.environ.get("SERVER_REFRESH_INTERVAL", "5"))
+# Concurrent Groq calls per worker; further answers wait for a slot
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "8"))
+# "float32", "fp16", "int8" or "binary"; shared with the ingest worker
+VECTOR_STORAGE = os.environ.get("VECTOR_STORAGE", STORAGE_FLOAT32)
+# Index shards, searched on threads or in one process per shard ("thread" / "process")
+FAISS_SHARDS = int(os.environ.get("FAISS_SHARDS", "1"))
+SHARD_WORKERS = os.environ.get("FAISS_SHARD_WORKERS", WORKERS_THREAD)
+# /ingest needs "Authorization: Bearer <INGEST_TOKEN>"; it is disabled while no token is set
+INGEST_TOKEN = os.environ.get("INGEST_TOKEN", "")
+# Folders /ingest may read PDFs from (os.pathsep-separated) and domains it may crawl (comma-separated)
+DEFAULT_PDF_ROOT = Path(__file__).parent.parent / "WithoutBranding"
+INGEST_PDF_ROOTS = [
+    Path(root).resolve() for root in os.environ.get("INGEST_PDF_ROOTS", str(DEFAULT_PDF_ROOT)).split(os.pathsep) if root
+]
+INGEST_URL_DOMAINS = [
+    domain.strip().lower()
+    for domain in os.environ.get("INGEST_URL_DOMAINS", "inventurs.com").split(",")
+    if domain.strip()
+]
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(min_length=1, max_length=4000)
+    k: int = Field(default=5, ge=1, le=50)
+
+
+class IngestRequest(BaseModel):
+    urls: list[HttpUrl] = []
+    pdf_folders: list[str] = []
+
+
+def _check_ingest_token(request):
+    if not INGEST_TOKEN:
+        raise HTTPException(status_code=403, detail="Ingestion over HTTP is disabled; set INGEST_TOKEN to enable it.")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode("utf-8"), INGEST_TOKEN.encode("utf-8")):
+        raise HTTPException(
+            status_code=401, detail="Missing or invalid ingest token.", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+def _allowed_pdf_folder(folder):
+    """
+    Resolved folder path, if it lies under one of INGEST_PDF_ROOTS.
+    """
+    path = Path(folder).resolve()
+    if not any(path.is_relative_to(root) for root in INGEST_PDF_ROOTS):
+        raise HTTPException(status_code=403, detail=f"PDF folder {folder!r} is outside the allowed ingest roots.")
+    return path
+
+
+def _allowed_url(url):
+    """
+    The URL as a string, if its host is one of INGEST_URL_DOMAINS or a subdomain of one.
+    """
+    host = (url.host or "").lower()
+    if not any(host == domain or host.endswith(f".{domain}") for domain in INGEST_URL_DOMAINS):
+        raise HTTPException(status_code=403, detail=f"URL host {host!r} is not an allowed ingest domain.")
+    return str(url)
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that gives back its admission slot however the response ends,
+    including a client that disconnects before the first chunk is sent.
+    """
+
+    def __init__(self, content, admission, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.admission.release()
+
+
+async def _refresh_loop(orchestrator):
+    """
+    Re-opens the mmap'd index after the ingest worker persists a new version.
+    """
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(orchestrator.refresh)
+        except Exception as e:
+            print(f"Index refresh failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Blocking retrieval/LLM work runs on a pool sized to the admission limit
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=MAX_CONCURRENT + 2, thread_name_prefix="request")
+    )
+    app.state.orchestrator = Orchestrator(
+        embedding_model=OllamaEmbeddings(model=EMBEDDING_MODEL),
+        groq_api_key=os.environ["GROQ_API_KEY"],
+        load_mode=LOAD_MMAP,
+        vector_storage=VECTOR_STORAGE,
+        faiss_shards=FAISS_SHARDS,
+        shard_workers=SHARD_WORKERS,
+        llm_max_in_flight=LLM_MAX_IN_FLIGHT,
+        max_concurrent=MAX_CONCURRENT,
+    )
+    app.state.admission = AdmissionController(
+        max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT
+    )
+    app.state.ingest_jobs = {}
+    METRICS.register_collector("admission", app.state.admission.stats)
+    refresher = asyncio.create_task(_refresh_loop(app.state.orchestrator))
+    print(f"Worker {os.getpid()} ready (max {MAX_CONCURRENT} concurrent, {MAX_QUEUE} queued).")
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        app.state.orchestrator.parallel_retriever.shutdown()
+        await app.state.orchestrator.aclose()
+
+
+app = FastAPI(title="Inventurs Chatbot API", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy ({exc}); retry later."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.middleware("http")
+async def record_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    METRICS.observe("http_request_duration_seconds", time.perf_counter() - started, path=request.url.path)
+    METRICS.inc("http_requests_total", path=request.url.path, status=response.status_code)
+    return response
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    admission = request.app.state.admission
+    await admission.acquire()
+    try:
+        started = time.perf_counter()
+        answer = await request.app.state.orchestrator.aquery_combined(body.query, body.k)
+        return {"answer": answer, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    finally:
+        admission.release()
+
+
+@app.post("/stream")
+async def stream(body: QueryRequest, request: Request):
+    """
+    Streams the answer as plain-text chunks as the LLM generates them.
+    """
+    admission = request.app.state.admission
+    # Admission happens before the response starts, so an overloaded worker can still answer 503
+    await admission.acquire()
+
+    async def tokens():
+        async for token in request.app.state.orchestrator.astream_combined(body.query, body.k):
+            if await request.is_disconnected():
+                break
+            yield token
+
+    return AdmittedStreamingResponse(tokens(), admission, media_type="text/plain; charset=utf-8")
+
+
+@app.post("/ingest", status_code=202)
+async def ingest(body: IngestRequest, request: Request):
+    """
+    Starts ingestion in a separate writer process. Serving workers keep answering from
+    the current index and switch to the new one once it is persisted.
+    """
+    _check_ingest_token(request)
+    if not body.urls and not body.pdf_folders:
+        raise HTTPException(status_code=422, detail="Provide at least one URL or PDF folder.")
+    urls = [_allowed_url(url) for url in body.urls]
+    pdf_folders = [_allowed_pdf_folder(folder) for folder in body.pdf_folders]
+    faiss_file = request.app.state.orchestrator.embedder.faiss_manager.faiss_file
+    if is_ingest_running(faiss_file):
+        raise HTTPException(status_code=409, detail="An ingestion is already running.")
+    args = [sys.executable, "-m", "server.ingest_worker", "--faiss-file", str(faiss_file)]
+    args += ["--vector-storage", VECTOR_STORAGE, "--shards", str(FAISS_SHARDS)]
+    args += [arg for url in urls for arg in ("--url", url)]
+    args += [arg for folder in pdf_folders for arg in ("--pdf-folder", str(folder))]
+    process = await asyncio.create_subprocess_exec(*args)
+    request.app.state.ingest_jobs[process.pid] = process
+    return {"job": process.pid, "status": "started"}
+
+
+@app.get("/ingest/{job}")
+async def ingest_status(job: int, request: Request):
+    _check_ingest_token(request)
+    process = request.app.state.ingest_jobs.get(job)
+    if process is None:
+        raise HTTPException(status_code=404, detail="Unknown job (jobs are tracked by the worker that started them).")
+    if process.returncode is None:
+        return {"job": job, "status": "running"}
+    status = {0: "finished", EXIT_LOCKED: "skipped_locked"}.get(process.returncode, "failed")
+    return {"job": job, "status": status, "returncode": process.returncode}
+
+
+@app.get("/health")
+async def health(request: Request):
+    orchestrator = request.app.state.orchestrator
+    faiss_manager = orchestrator.embedder.faiss_manager
+    return {
+        "status": "ok",
+        "worker_pid": os.getpid(),
+        "index_vectors": faiss_manager.ntotal,
+        "index_read_only": faiss_manager.read_only,
+        "vector_storage": faiss_manager.vector_storage,
+        "ingest_running": is_ingest_running(faiss_manager.faiss_file),
+        **request.app.state.admission.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(METRICS.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the chatbot over HTTP with several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind; use 0.0.0.0 only behind a proxy")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT, help="Concurrent requests per worker")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Queued requests per worker before 503")
+    args = parser.parse_args(argv)
+    # Worker processes import this module afresh, so settings travel through the environment
+    os.environ["SERVER_MAX_CONCURRENT"] = str(args.max_concurrent)
+    os.environ["SERVER_MAX_QUEUE"] = str(args.max_queue)
+    uvicorn.run("server.app:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
+
+
+# Example usage:
+#   GROQ_API_KEY=... python -m server.app --workers 4 --port 8000
+#   curl -X POST localhost:8000/query -H 'Content-Type: application/json' -d '{"query": "What services do you offer?"}'
+#   curl -N -X POST localhost:8000/stream -H 'Content-Type: application/json' -d '{"query": "List IT employees"}'
+#   INGEST_TOKEN=... in the server's environment, then:
+#   curl -X POST localhost:8000/ingest -H "Authorization: Bearer $INGEST_TOKEN" -H 'Content-Type: application/json' \
+#        -d '{"urls": ["https://inventurs.com"]}'
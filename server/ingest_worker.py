@@ -0,0 +1,97 @@
+# ingest_worker.py
+
+import argparse
+import fcntl
+import os
+import sys
+from pathlib import Path
+from langchain_ollama import OllamaEmbeddings
+from embeddings.extractor_faiss_manager import FAISS_DOCSTORE_PATH, FAISS_INDEX_PATH, EmbedderPipeline
+from retrieval.pricing_tables import PRICING_DB_PATH
+from retrieval.quantized_index import STORAGE_FLOAT32, STORAGE_TYPES
+
+# Exit status when another ingestion already holds the writer lock
+EXIT_LOCKED = 75
+
+
+def writer_lock_path(faiss_file):
+    faiss_file = Path(faiss_file)
+    return faiss_file.with_name(f"{faiss_file.stem}.writer.lock")
+
+
+def acquire_writer_lock(faiss_file):
+    """
+    Non-blocking exclusive lock: the index has a single writer, serving workers only read it.
+    Returns the open lock file (keep it open to hold the lock), or None if it is taken.
+    """
+    lock_file = writer_lock_path(faiss_file)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(lock_file, "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def is_ingest_running(faiss_file):
+    handle = acquire_writer_lock(faiss_file)
+    if handle is None:
+        return True
+    handle.close()
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest URLs and PDFs into the shared FAISS index.")
+    parser.add_argument("--url", action="append", default=[], help="URL to ingest (repeatable)")
+    parser.add_argument("--pdf-folder", action="append", default=[], help="Folder of PDFs to ingest (repeatable)")
+    parser.add_argument("--faiss-file", default=FAISS_INDEX_PATH)
+    parser.add_argument("--docstore-file", default=FAISS_DOCSTORE_PATH)
+    parser.add_argument("--embedding-model", default=os.environ.get("EMBEDDING_MODEL", "mxbai-embed-large"))
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--max-depth", type=int, default=2, help="Link hops followed from each URL")
+    parser.add_argument("--max-pages", type=int, default=100, help="Pages crawled per URL")
+    parser.add_argument(
+        "--vector-storage",
+        choices=STORAGE_TYPES,
+        default=os.environ.get("VECTOR_STORAGE", STORAGE_FLOAT32),
+        help="Must match the storage the serving workers open the index with",
+    )
+    parser.add_argument("--shards", type=int, default=int(os.environ.get("FAISS_SHARDS", "1")), help="Index shards")
+    parser.add_argument(
+        "--pricing-db",
+        default=os.environ.get("PRICING_DB", str(PRICING_DB_PATH)),
+        help="SQLite database price lists and rate cards are parsed into ('' to skip)",
+    )
+    args = parser.parse_args(argv)
+
+    lock = acquire_writer_lock(args.faiss_file)
+    if lock is None:
+        print("Another ingestion is already running; exiting.")
+        return EXIT_LOCKED
+    try:
+        embedder = EmbedderPipeline(
+            embedding_model=OllamaEmbeddings(model=args.embedding_model),
+            faiss_file=args.faiss_file,
+            docstore_file=args.docstore_file,
+            dimension=args.dimension,
+            vector_storage=args.vector_storage,
+            shards=args.shards,
+            pricing_db=args.pricing_db or None,
+        )
+        # Each ingest_* call persists atomically; serving workers pick the new index up on refresh
+        for url in args.url:
+            embedder.ingest_url(url, max_depth=args.max_depth, max_pages=args.max_pages)
+        for folder in args.pdf_folder:
+            embedder.ingest_pdf(folder)
+    finally:
+        lock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
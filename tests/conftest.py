@@ -0,0 +1,7 @@
+# conftest.py
+
+import sys
+from pathlib import Path
+
+# Modules import each other as top-level packages (retrieval.*, embeddings.*, ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
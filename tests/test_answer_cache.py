@@ -0,0 +1,41 @@
+# test_answer_cache.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from orchestration.answer_cache import AnswerCache, query_signature
+
+
+def embed(query):
+    # Every pricing question about developers lands on (almost) the same embedding,
+    # as a real model does for "... in AED" vs "... in USD"
+    vector = np.ones(8, dtype="float32")
+    vector[0] += 0.01 * len(query)
+    return vector
+
+
+def test_currency_is_part_of_the_signature():
+    assert query_signature("hourly rate of a senior developer in AED") != query_signature(
+        "hourly rate of a senior developer in USD"
+    )
+
+
+def test_near_duplicate_in_another_currency_is_a_miss():
+    cache = AnswerCache(embed_fn=embed, similarity_threshold=0.92)
+    cache.put("What is the hourly rate of a senior developer in AED?", "AED 45 per hour")
+    assert cache.get("What is the hourly rate of a senior developer in USD?") is None
+    assert cache.stats()["semantic_hits"] == 0
+
+
+def test_near_duplicate_with_other_seniority_is_a_miss():
+    cache = AnswerCache(embed_fn=embed, similarity_threshold=0.92)
+    cache.put("hourly rate of a senior developer in AED", "AED 45 per hour")
+    assert cache.get("hourly rate of a junior developer in AED") is None
+
+
+def test_rephrased_question_is_a_semantic_hit():
+    cache = AnswerCache(embed_fn=embed, similarity_threshold=0.92)
+    cache.put("What is the hourly rate of a senior developer in AED?", "AED 45 per hour")
+    assert cache.get("senior developer hourly rate in AED") == "AED 45 per hour"
+    assert cache.stats()["semantic_hits"] == 1
@@ -0,0 +1,177 @@
+# test_async_llm_client.py
+
+import asyncio
+import json
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("langchain_groq")
+
+from llm.async_llm_client import AsyncGroqLLMClient
+
+BASE_URL = "http://groq.stub"
+
+
+def completion(content):
+    body = {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "Llama3-8b-8192",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+    return httpx.Response(200, json=body)
+
+
+def completion_stream(content):
+    """
+    Server-sent chat.completion.chunk events, one word per chunk.
+    """
+    events = []
+    for word in content.split(" "):
+        delta = {"role": "assistant", "content": word + " "}
+        chunk = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "Llama3-8b-8192",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return httpx.Response(200, headers={"content-type": "text/event-stream"}, content="".join(events).encode())
+
+
+class StubGroq:
+    """
+    OpenAI-compatible chat completions endpoint served through httpx.MockTransport.
+    """
+
+    def __init__(self, rate_limited=0, delay=0.0):
+        self.rate_limited = rate_limited
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"error": {"message": "rate limited"}})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            body = json.loads(request.content)
+            question = body["messages"][-1]["content"]
+            if body.get("stream"):
+                return completion_stream(f"answer to {question}")
+            return completion(f"answer to {question}")
+        finally:
+            self.in_flight -= 1
+
+
+def make_client(stub, **kwargs):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+    return AsyncGroqLLMClient(groq_api_key="test", base_url=BASE_URL, http_client=http_client, **kwargs)
+
+
+def test_retries_429_after_retry_after():
+    stub = StubGroq(rate_limited=2)
+
+    async def run():
+        client = make_client(stub, backoff_base=0.01)
+        try:
+            return await client.aget_response(None, "context", "What services do you offer?"), client.retries
+        finally:
+            await client.aclose()
+
+    answer, retries = asyncio.run(run())
+    assert answer == "answer to What services do you offer?"
+    assert retries == 2
+    assert stub.calls == 3
+
+
+def test_gives_up_after_max_retries():
+    stub = StubGroq(rate_limited=10)
+
+    async def run():
+        client = make_client(stub, max_retries=1, backoff_base=0.01)
+        try:
+            await client.aget_response(None, "context", "question")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(Exception):
+        asyncio.run(run())
+    assert stub.calls == 2
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    stub = StubGroq(delay=0.05)
+
+    async def run():
+        client = make_client(stub)
+        try:
+            answers = await asyncio.gather(*[client.aget_response(None, "context", "same question") for _ in range(5)])
+            return answers, client.coalesced
+        finally:
+            await client.aclose()
+
+    answers, coalesced = asyncio.run(run())
+    assert set(answers) == {"answer to same question"}
+    assert coalesced == 4
+    assert stub.calls == 1
+
+
+def test_max_in_flight_caps_concurrent_requests():
+    stub = StubGroq(delay=0.02)
+
+    async def run():
+        client = make_client(stub, max_in_flight=2)
+        try:
+            return await asyncio.gather(*[client.aget_response(None, "context", f"question {i}") for i in range(8)])
+        finally:
+            await client.aclose()
+
+    answers = asyncio.run(run())
+    assert len(set(answers)) == 8
+    assert stub.calls == 8
+    assert stub.max_in_flight <= 2
+
+
+def test_stream_retries_before_the_first_token():
+    stub = StubGroq(rate_limited=1)
+
+    async def run():
+        client = make_client(stub, backoff_base=0.01)
+        try:
+            return [token async for token in client.astream_response(None, "context", "question")], client.retries
+        finally:
+            await client.aclose()
+
+    tokens, retries = asyncio.run(run())
+    assert "".join(tokens).strip() == "answer to question"
+    assert retries == 1
+    assert stub.calls == 2
+
+
+def test_identical_concurrent_streams_share_the_leaders_answer():
+    stub = StubGroq(delay=0.05)
+
+    async def collect(client):
+        return "".join([token async for token in client.astream_response(None, "context", "same question")])
+
+    async def run():
+        client = make_client(stub)
+        try:
+            return await asyncio.gather(*[collect(client) for _ in range(3)]), client.coalesced
+        finally:
+            await client.aclose()
+
+    answers, coalesced = asyncio.run(run())
+    assert {answer.strip() for answer in answers} == {"answer to same question"}
+    assert coalesced == 2
+    assert stub.calls == 1
@@ -0,0 +1,24 @@
+# test_context_packer.py
+
+from orchestration import context_packer
+from orchestration.context_packer import ContextPacker, Tokenizer
+
+
+class OfflineTiktoken:
+    @staticmethod
+    def get_encoding(name):
+        raise ConnectionError("could not download the BPE file")
+
+
+def test_tokenizer_falls_back_when_the_encoding_cannot_be_loaded(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", OfflineTiktoken)
+    tokenizer = Tokenizer()
+    assert tokenizer.encoding is None
+    assert tokenizer.count("hourly rate, in AED") == 5
+
+
+def test_packer_starts_offline(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", OfflineTiktoken)
+    context, report = ContextPacker(max_tokens=50).pack("AED 45 per hour", [])
+    assert context.startswith("SQL Agent Answer: AED 45 per hour")
+    assert report["used_tokens"] <= 50
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("bs4")
+
+from Search.crawler import DUPLICATE, FETCHED, SKIPPED, UNCHANGED, SiteCrawler
+
+
+def page(title, *links, head=""):
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><head><title>{title}</title>{head}</head><body><h1>{title}</h1>{anchors}</body></html>"
+
+
+HOME = page("Home", "/a", "/b", "/c?utm_source=newsletter", "/private/secret", "/index.html", "/alias")
+SITE = {
+    "/robots.txt": ("text/plain", "User-agent: *\nDisallow: /private/\n"),
+    "/": ("text/html", HOME),
+    # Same content as the home page under another URL
+    "/index.html": ("text/html", HOME),
+    "/a": ("text/html", page("Services", "/a/deep")),
+    "/a/deep": ("text/html", page("Cloud migration", "/a/deep/deeper")),
+    "/a/deep/deeper": ("text/html", page("Migration checklist")),
+    "/b": ("text/html", page("About")),
+    "/c": ("text/html", page("Contact")),
+    "/private/secret": ("text/html", page("Secret")),
+    # Declares /a as its canonical address
+    "/alias": ("text/html", page("Services (print view)", head='<link rel="canonical" href="/a">')),
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        self.server.requests.append(path)
+        if path not in SITE:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content_type, body = SITE[path]
+        body = body.encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def by_path(results, base):
+    return {result["url"].removeprefix(base): result for result in results}
+
+
+def test_robots_txt_disallow_is_not_fetched(site):
+    server, base = site
+    results = by_path(SiteCrawler(max_depth=1).crawl_sync(f"{base}/"), base)
+    assert results["/private/secret"]["status"] == SKIPPED
+    assert results["/private/secret"]["reason"] == "robots.txt"
+    assert "/private/secret" not in server.requests
+
+
+def test_depth_limit(site):
+    _, base = site
+    shallow = by_path(SiteCrawler(max_depth=1).crawl_sync(f"{base}/"), base)
+    assert "/a" in shallow and "/a/deep" not in shallow
+    deeper = by_path(SiteCrawler(max_depth=2).crawl_sync(f"{base}/"), base)
+    assert "/a/deep" in deeper and "/a/deep/deeper" not in deeper
+
+
+def test_page_limit(site):
+    server, base = site
+    results = SiteCrawler(max_depth=3, max_pages=3).crawl_sync(f"{base}/")
+    assert len(results) == 3
+    assert len([path for path in server.requests if path != "/robots.txt"]) <= 3
+
+
+def test_canonical_and_content_hash_dedup(site):
+    _, base = site
+    results = by_path(SiteCrawler(max_depth=1).crawl_sync(f"{base}/"), base)
+    # Tracking parameters are stripped, so /c is crawled once
+    assert "/c" in results and not any(path.startswith("/c?") for path in results)
+    assert results["/alias"]["status"] == DUPLICATE
+    assert results["/alias"]["duplicate_of"] == f"{base}/a"
+    assert results["/index.html"]["status"] == DUPLICATE
+    assert results["/index.html"]["duplicate_of"] == f"{base}/"
+    assert results["/a"]["status"] == FETCHED
+
+
+def test_recrawl_sends_conditional_gets(site):
+    _, base = site
+    first = {result["url"]: result for result in SiteCrawler(max_depth=1).crawl_sync(f"{base}/")}
+    second = by_path(SiteCrawler(max_depth=1, previous=first.get).crawl_sync(f"{base}/"), base)
+    assert second["/"]["status"] == UNCHANGED
+    assert second["/"]["http_status"] == 304
+    # Links of a 304 page come from the previous crawl, so its children are still visited
+    assert second["/b"]["status"] == UNCHANGED
+    assert second["/b"]["http_status"] == 304
+
+
+def test_crawl_sync_refuses_to_run_inside_an_event_loop(site):
+    _, base = site
+
+    async def run():
+        with pytest.raises(RuntimeError, match="await crawl"):
+            SiteCrawler().crawl_sync(f"{base}/")
+
+    asyncio.run(run())
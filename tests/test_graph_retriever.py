@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+from retrieval.neo4j_retriever import GraphRetriever, RelationshipGraph
+
+SCHEMA = [
+    "CREATE TABLE DEPARTMENT (ID INTEGER PRIMARY KEY, NAME TEXT)",
+    "CREATE TABLE EMPLOYEE (ID INTEGER PRIMARY KEY, NAME TEXT, "
+    "DEPARTMENT_ID INTEGER REFERENCES DEPARTMENT(ID), MANAGER_ID INTEGER REFERENCES EMPLOYEE(ID))",
+    "CREATE TABLE RESOURCE_RATE_BY_CURRENCY (ROLE_KEY TEXT, CURRENCY TEXT, RATE REAL, PRIMARY KEY (ROLE_KEY, CURRENCY))",
+    "INSERT INTO DEPARTMENT VALUES (1, 'IT'), (2, 'HR')",
+    "INSERT INTO EMPLOYEE VALUES (1, 'Priya Sharma', 1, NULL), (2, 'Arjun Rao', 1, 1), "
+    "(3, 'Meera Nair', 1, 1), (4, 'Kiran Das', 2, 1)",
+    "INSERT INTO RESOURCE_RATE_BY_CURRENCY VALUES ('developer', 'USD', 40), ('developer', 'AED', 147)",
+]
+
+
+class SQLManager:
+    """
+    The parts of LangChainSQLManager the graph uses, over an in-memory SQLite engine.
+    """
+
+    def __init__(self):
+        self.engine = sqlalchemy.create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.exec_driver_sql(statement)
+        self.db = SimpleNamespace(engine=self.engine)
+
+    def iter_select_query(self, query, params=None):
+        with self.engine.connect() as conn:
+            yield from (dict(row._mapping) for row in conn.exec_driver_sql(query))
+
+    def data_version(self):
+        return 1
+
+
+def test_graph_only_holds_tables_with_foreign_keys():
+    graph = RelationshipGraph.from_sql_manager(SQLManager())
+    assert {table for table, _ in graph.nodes} == {"DEPARTMENT", "EMPLOYEE"}
+
+
+def test_not_covered_when_facts_are_truncated():
+    question = "Which employees under Priya Sharma work in IT?"
+    assert GraphRetriever(SQLManager(), max_facts=40).retrieve(question)["covered"]
+    truncated = GraphRetriever(SQLManager(), max_facts=2).retrieve(question)
+    assert len(truncated["facts"]) == 2
+    assert not truncated["covered"]
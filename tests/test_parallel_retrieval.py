@@ -0,0 +1,46 @@
+import threading
+import time
+
+from orchestration.parallel_retrieval import ParallelRetriever
+
+
+def slow(seconds, value):
+    def run(*args):
+        time.sleep(seconds)
+        return value
+
+    return run
+
+
+def test_slow_sql_calls_do_not_hold_faiss_threads():
+    retriever = ParallelRetriever(slow(0, ["doc"]), slow(0.5, "late"), faiss_timeout=0.2, sql_timeout=0.05,
+                                  max_concurrent=1)
+    try:
+        first = retriever.retrieve("q")
+        assert first["degraded"] == ["sql"]
+        # The abandoned SQL call is still running; FAISS has its own pool
+        second = retriever.retrieve("q", query_sql=False)
+        assert second["faiss_docs"] == ["doc"]
+        assert second["degraded"] == []
+    finally:
+        retriever.shutdown()
+
+
+def test_queue_time_does_not_count_against_the_branch_timeout():
+    retriever = ParallelRetriever(slow(0.2, ["doc"]), slow(0, "answer"), faiss_timeout=0.3, total_budget=2.0,
+                                  max_concurrent=1)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(retriever.retrieve("q", query_sql=False)))
+        for _ in range(2)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The second search waits ~0.2s for the only thread, then runs within its 0.3s
+        assert [result["degraded"] for result in results] == [[], []]
+        assert [result["faiss_docs"] for result in results] == [["doc"], ["doc"]]
+    finally:
+        retriever.shutdown()
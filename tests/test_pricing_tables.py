@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from retrieval.pricing_tables import PricingTables, parse_pricing_pages
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def parse_fixture(name):
+    return parse_pricing_pages([(FIXTURES / name).read_text(encoding="utf-8")])
+
+
+def test_one_cell_per_line():
+    rows = parse_fixture("price_list_cells.txt")
+    assert [row["name"] for row in rows] == ["Custom Website Development", "Ecommerce Store", "Logo Design"]
+    assert [row["prices"] for row in rows] == [
+        [(25000.0, None, "fixed", "INR")],
+        [(50000.0, None, "fixed", "INR")],
+        [(5000.0, None, "fixed", "INR")],
+    ]
+    # Wrapped description lines stay with their row
+    assert rows[0]["details"] == "Responsive design, CMS, hosting setup and training"
+    assert rows[1]["details"] is None
+    assert {row["category"] for row in rows} == {"Website Packages"}
+
+
+def test_whole_row_per_line_with_pipes():
+    rows = parse_fixture("rate_card_rows.txt")
+    assert [(row["name"], row["experience"]) for row in rows] == [
+        ("Senior Developer", "5+ years"),
+        ("Junior Developer", "1-2 years"),
+        ("Mobile App Developer", "3-5 years"),
+        ("QA Engineer", "2+ years"),
+    ]
+    # "$4,000+" does not pull the next row's name into this one
+    assert rows[2]["prices"] == [(500.0, None, "hour", "USD"), (4000.0, None, "month", "USD")]
+    assert rows[3]["prices"] == [(20.0, None, "hour", "USD"), (3000.0, None, "month", "USD")]
+
+
+def test_opening_the_tables_leaves_the_database_untouched(tmp_path):
+    db_path = tmp_path / "pricing.db"
+    tables = PricingTables(db_path)
+    tables.load_document(
+        "rate_card_usd.pdf", [(FIXTURES / "rate_card_rows.txt").read_text(encoding="utf-8")], doc_type="rate_card"
+    )
+    modified = db_path.stat().st_mtime_ns
+    PricingTables(db_path)
+    assert db_path.stat().st_mtime_ns == modified
+    rates = tables.resource_rates("Senior Developer", currency="AED", unit="hour")
+    assert [(row["RATE"], row["IS_PUBLISHED"]) for row in rates] == [(146.9, 0)]
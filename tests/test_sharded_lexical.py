@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from retrieval.sharded_faiss import SHARD_BY_HASH, ShardedFAISSManager
+
+# "migration" is common in most documents but rare in a few, so per-shard IDF differs
+CORPUS = {
+    f"doc{i}": " ".join(
+        ["cloud migration"] * (i % 3 + 1)
+        + ["kubernetes"] * (i % 5 == 0)
+        + ["filler text about services"] * (i % 4 + 1)
+    )
+    for i in range(30)
+}
+
+
+class Embedder:
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def lexical_top_k(tmp_path, num_shards, query, k=8):
+    manager = ShardedFAISSManager(
+        Embedder(),
+        num_shards=num_shards,
+        shard_by=SHARD_BY_HASH,
+        faiss_file=tmp_path / f"{num_shards}" / "index.bin",
+        docstore_file=tmp_path / f"{num_shards}" / "docs.pkl",
+        dimension=4,
+        initialize_new=True,
+        embedding_cache_file=None,
+    )
+    try:
+        manager.add_texts(list(CORPUS.values()), ids=list(CORPUS))
+        documents = manager.hybrid_search(query, k=k, mode="lexical")
+        return [document.page_content for document in documents]
+    finally:
+        manager.close()
+
+
+@pytest.mark.parametrize("query", ["cloud migration", "kubernetes migration", "services"])
+def test_lexical_top_k_does_not_depend_on_the_shard_count(tmp_path, query):
+    assert lexical_top_k(tmp_path, 3, query) == lexical_top_k(tmp_path, 1, query)
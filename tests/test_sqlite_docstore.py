@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+from retrieval.sqlite_docstore import SQLiteDocstore
+
+
+def faiss_id(doc_id):
+    return hash(doc_id) & 0x7FFFFFFF
+
+
+def test_deleted_rows_stay_readable_until_readers_move_on(tmp_path):
+    writer = SQLiteDocstore(tmp_path / "docs.sqlite", faiss_id_fn=faiss_id)
+    writer.add({"a": Document(page_content="alpha"), "b": Document(page_content="beta")})
+    writer.publish(1)
+    reader = SQLiteDocstore(tmp_path / "docs.sqlite", faiss_id_fn=faiss_id, read_only=True)
+
+    writer.delete(["a"])
+    writer.publish(2)
+    # Readers still on generation 1 resolve the hit; writers no longer see the id
+    assert reader.search("a").page_content == "alpha"
+    assert reader.doc_id_for(faiss_id("a")) == "a"
+    assert not reader.contains("a")
+    assert len(reader) == 1
+    assert reader.published_generation() == 2
+
+    writer.publish(3)
+    assert not isinstance(reader.search("a"), Document)
+
+
+def test_readding_a_deleted_id_replaces_its_tombstone(tmp_path):
+    docstore = SQLiteDocstore(tmp_path / "docs.sqlite", faiss_id_fn=faiss_id)
+    docstore.add({"a": Document(page_content="old")})
+    docstore.delete(["a"])
+    docstore.add({"a": Document(page_content="new")})
+    docstore.publish(1)
+    assert docstore.contains("a")
+    assert docstore.search("a").page_content == "new"
+    with pytest.raises(ValueError):
+        docstore.add({"a": Document(page_content="duplicate")})
+
+
+class Embedder:
+    def embed_query(self, text):
+        return [1.0 if text.startswith(letter) else 0.0 for letter in "abgd"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_readers_never_import_a_legacy_pickle(tmp_path):
+    pytest.importorskip("faiss")
+    from retrieval.faiss_retriever import LangChainFAISSManager
+
+    files = dict(faiss_file=tmp_path / "index.faiss", docstore_file=tmp_path / "docs.pkl", dimension=4)
+    legacy = LangChainFAISSManager(Embedder(), embedding_cache_file=None, docstore_backend="pickle", **files)
+    legacy.add_texts(["alpha", "beta"])
+    legacy.persist()
+
+    reader = LangChainFAISSManager(Embedder(), embedding_cache_file=None, load_mode="mmap", **files)
+    assert not (tmp_path / "docs.sqlite").exists()
+    assert reader.similarity_search("alpha", k=1)[0].page_content == "alpha"
+
+    # The writer imports the pickle; the reader switches over on its next publish
+    writer = LangChainFAISSManager(Embedder(), embedding_cache_file=None, **files)
+    writer.add_texts(["gamma"])
+    writer.persist()
+    assert reader.refresh()
+    assert isinstance(reader.docstore, SQLiteDocstore)
+    assert reader.similarity_search("gamma", k=1)[0].page_content == "gamma"